@@ -0,0 +1,103 @@
+"""对比下载完整 JSON 与通过 /api/ 查询接口按需获取单个指标的响应字节数和延迟
+
+用法：
+    python -m benchmarks.bench_api                     # 使用虚拟数据生成 500 家公司
+    python -m benchmarks.bench_api --synthetic 2000 --repeat 50
+"""
+import argparse
+import contextlib
+import gzip
+import http.client
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+import numpy as np
+
+from server import make_server
+
+
+def timed_get(port, path, headers, repeat):
+    """在长连接上重复请求，返回 (响应字节数, 解析后的 JSON, 延迟列表)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.request('GET', path, headers=headers)
+        response = conn.getresponse()
+        body = response.read()
+        if response.getheader('Content-Encoding') == 'gzip':
+            data = json.loads(gzip.decompress(body))
+        else:
+            data = json.loads(body)
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+    return len(body), data, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询接口基准测试")
+    parser.add_argument('--synthetic', type=int, default=500, help="虚拟数据的公司数")
+    parser.add_argument('--repeat', type=int, default=20, help="每个请求重复次数")
+    args = parser.parse_args()
+
+    import finance
+    from benchmarks.synthetic import synthetic_codes, stub_fetcher
+
+    with tempfile.TemporaryDirectory() as root:
+        data_dir = os.path.join(root, 'data')
+        os.makedirs(data_dir)
+        codes = synthetic_codes(args.synthetic)
+        with contextlib.redirect_stdout(io.StringIO()):
+            finance.process_financial_data(codes, fetcher=stub_fetcher(), rate=None, output_dir=data_dir)
+
+        httpd = make_server(0, directory=root, verbose=False)
+        port = httpd.server_address[1]
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        try:
+            metric = quote('营业收入')
+            requests = [
+                ('完整 JSON', '/data/merged_financial_data.json'),
+                ('公司列表', '/api/companies'),
+                ('2 家公司 1 个指标', f'/api/metrics?codes={codes[0]},{codes[1]}&sheet=profit_sheet&metric={metric}'),
+                ('2 家 1 指标 2018 起', f'/api/metrics?codes={codes[0]},{codes[1]}&sheet=profit_sheet'
+                                     f'&metric={metric}&from=2018'),
+                ('全部公司 1 个指标', f'/api/metrics?sheet=profit_sheet&metric={metric}'),
+            ]
+            print(f"公司数：{args.synthetic}，每个请求 {args.repeat} 次（含客户端解析）")
+            print(f"{'请求':<20}{'字节':>12}{'gzip 字节':>12}{'首次':>10}{'p50':>10}")
+            for label, path in requests:
+                raw, _, cold = timed_get(port, path, {}, 1)
+                raw, _, latencies = timed_get(port, path, {}, args.repeat)
+                compressed, _, _ = timed_get(port, path, {'Accept-Encoding': 'gzip'}, 1)
+                print(f"{label:<20}{raw:>12}{compressed:>12}{cold[0] * 1000:>8.1f}ms"
+                      f"{np.median(latencies) * 1000:>8.1f}ms")
+
+            # 数据文件更新后查询接口应返回新数据
+            data_path = os.path.join(data_dir, 'merged_financial_data.json')
+            with open(data_path, 'r', encoding='utf-8') as f:
+                full = json.load(f)
+            code = next(code for code, company in full['companies'].items()
+                        if '营业收入' in company['profit_sheet']['metrics'])
+            path = f'/api/metrics?codes={code}&sheet=profit_sheet&metric={metric}'
+            _, before, _ = timed_get(port, path, {}, 1)
+            full['companies'][code]['profit_sheet']['metrics']['营业收入'][-1] = 0.0
+            with open(data_path, 'w', encoding='utf-8') as f:
+                json.dump(full, f, ensure_ascii=False)
+            os.utime(data_path, ns=(time.time_ns(), time.time_ns() + 1))
+            start = time.perf_counter()
+            _, after, _ = timed_get(port, path, {}, 1)
+            reloaded = after['companies'][code]['metrics']['营业收入'][-1] == 0.0
+            print(f"修改数据文件后自动重新加载：{'是' if reloaded else '否'}"
+                  f"（{(time.perf_counter() - start) * 1000:.1f}ms）")
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""对比同时选中多家公司时，加载完整公司分片与预先生成的图表数据（批量接口）的传输字节数和解析耗时
+
+网页中的首个图表耗时可在浏览器中打开 index.html?ttfc=50 查看（控制台输出对比表）。
+用法：python -m benchmarks.bench_charts --synthetic 1000 --select 50
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+
+import finance
+from charts import update_charts
+from server import ChartPayloads, FileCache
+from benchmarks.synthetic import synthetic_codes, stub_fetcher
+
+
+def best_of(func, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预先生成的图表数据基准测试")
+    parser.add_argument('--synthetic', type=int, default=1000, help="虚拟公司数")
+    parser.add_argument('--select', type=int, default=50, help="同时选中的公司数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            finance.process_financial_data(synthetic_codes(args.synthetic), fetcher=stub_fetcher(), rate=None,
+                                           output_dir=output_dir, shards=True)
+        _, build_seconds = best_of(lambda: update_charts(output_dir), repeat=1)
+        with open(os.path.join(output_dir, 'charts', 'index.json'), 'rb') as f:
+            codes = [entry['code'] for entry in json.loads(f.read())['companies']][:args.select]
+
+        def read(*parts):
+            with open(os.path.join(output_dir, *parts), 'rb') as f:
+                return f.read()
+
+        shards = [read('companies', f"{code}.json") for code in codes]
+        payloads = ChartPayloads(os.path.join(output_dir, 'charts'), FileCache(max_entries=4096))
+        query = f"codes={','.join(codes)}"
+        response, _, _ = payloads.response('/api/charts', query, None)
+
+        def assemble():
+            payloads._responses.clear()
+            return payloads.response('/api/charts', query, None)
+
+        _, assemble_seconds = best_of(assemble)
+        _, shard_parse = best_of(lambda: [json.loads(body) for body in shards])
+        _, chart_parse = best_of(lambda: json.loads(response))
+
+    print(f"生成图表数据：{args.synthetic} 家公司 {build_seconds:.2f}s；批量接口拼接 {len(codes)} 家 "
+          f"{assemble_seconds * 1000:.2f}ms")
+    print(f"{'方式':<20}{'请求数':>8}{'字节':>12}{'gzip 字节':>12}{'解析耗时':>12}")
+    raw = sum(len(body) for body in shards)
+    compressed = sum(len(gzip.compress(body)) for body in shards)
+    print(f"{'完整公司分片':<20}{len(shards):>8}{raw:>12}{compressed:>12}{shard_parse * 1000:>10.2f}ms")
+    print(f"{'图表数据批量接口':<20}{1:>8}{len(response):>12}{len(gzip.compress(response)):>12}"
+          f"{chart_parse * 1000:>10.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
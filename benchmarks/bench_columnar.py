@@ -0,0 +1,69 @@
+"""对比合并 CSV 与列式存储的文件大小和读取耗时
+
+用法：
+    python -m benchmarks.bench_columnar                   # 使用 data/ 下已生成的文件
+    python -m benchmarks.bench_columnar --synthetic 1000  # 使用虚拟数据生成 1000 家公司
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from columnar import load_columnar
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def run(output_dir):
+    csv_path = os.path.join(output_dir, 'merged_financial_data.csv')
+    columnar_path = os.path.join(output_dir, 'columnar')
+    codes = load_columnar(columnar_path, columns=['股票代码'])['股票代码'].cat.categories[:2].tolist()
+
+    print(f"CSV 大小：{os.path.getsize(csv_path) / 1024:.0f} KB")
+    print(f"列式存储大小：{directory_size(columnar_path) / 1024:.0f} KB")
+    cases = [
+        ("读取 CSV", lambda: pd.read_csv(csv_path, dtype={'股票代码': str})),
+        ("读取列式存储（全部列）", lambda: load_columnar(columnar_path)),
+        ("读取列式存储（项目、报告期、金额）", lambda: load_columnar(columnar_path, columns=['项目', '报告期', '金额'])),
+        (f"读取列式存储（{len(codes)} 家公司）", lambda: load_columnar(columnar_path, stock_codes=codes)),
+    ]
+    for name, func in cases:
+        print(f"{name}：{best_of(func) * 1000:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列式存储读取基准测试")
+    parser.add_argument('--data-dir', default='data', help="包含合并 CSV 和 columnar 目录的数据目录")
+    parser.add_argument('--synthetic', type=int, help="改用虚拟数据生成指定数量的公司")
+    args = parser.parse_args()
+
+    if not args.synthetic:
+        run(args.data_dir)
+        return
+
+    import finance
+    from benchmarks.synthetic import synthetic_codes, stub_fetcher
+    with tempfile.TemporaryDirectory() as output_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            finance.process_financial_data(synthetic_codes(args.synthetic), fetcher=stub_fetcher(),
+                                           rate=None, output_dir=output_dir)
+        run(output_dir)
+
+
+if __name__ == '__main__':
+    main()
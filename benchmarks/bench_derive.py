@@ -0,0 +1,41 @@
+"""派生指标引擎在大规模公司集合上的计算耗时
+
+用法：python -m benchmarks.bench_derive --codes 5000 --years 10
+"""
+import argparse
+import time
+
+from transform import METRICS, reshape_universe, build_panel
+from derive import DERIVED_METRICS, compute_derived
+from fetch import to_symbol
+from benchmarks.synthetic import synthetic_codes, make_statement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="派生指标基准测试")
+    parser.add_argument('--codes', type=int, default=5000, help="公司数量")
+    parser.add_argument('--years', type=int, default=10, help="每家公司年数")
+    parser.add_argument('--repeat', type=int, default=5, help="重复次数")
+    args = parser.parse_args()
+
+    universe = {}
+    for code in synthetic_codes(args.codes):
+        symbol = to_symbol(code)
+        universe[code] = {statement: make_statement(symbol, statement, years=args.years)
+                          for statement in METRICS}
+    df = reshape_universe(universe)
+
+    start = time.perf_counter()
+    panel, _ = build_panel(df)
+    print(f"构建面板：{time.perf_counter() - start:.3f}s（{len(df)} 行）")
+
+    timings = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        compute_derived(panel)
+        timings.append(time.perf_counter() - start)
+    print(f"{args.codes} 家公司 × {len(DERIVED_METRICS)} 个派生指标：最快 {min(timings):.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""对比串行获取（原 2 秒固定等待的实现方式）与并发获取的耗时
+
+两种方式使用相同的令牌桶限流（每秒请求上限和突发数），加速比只来自并发本身；--rate 0 时均不限流。
+用法：python -m benchmarks.bench_fetch --codes 50 --latency 0.2
+"""
+import argparse
+import time
+
+from fetch import RateLimiter, fetch_statements, to_symbol
+from benchmarks.synthetic import synthetic_codes, stub_fetcher
+
+
+def run_serial(codes, fetcher, sleep, limiter=None):
+    # 原实现：逐只股票获取三张报表后固定等待；请求前同样经过限流
+    for code in codes:
+        symbol = to_symbol(code)
+        for statement in ('profit_yearly', 'balance_yearly', 'cashflow_yearly'):
+            if limiter is not None:
+                limiter.acquire()
+            fetcher(symbol, statement)
+        time.sleep(sleep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据获取阶段基准测试")
+    parser.add_argument('--codes', type=int, default=50, help="股票数量")
+    parser.add_argument('--latency', type=float, default=0.2, help="单次接口模拟延迟（秒）")
+    parser.add_argument('--sleep', type=float, default=2.0, help="串行模式下的固定等待（秒）")
+    parser.add_argument('--workers', type=int, default=8, help="并发线程数")
+    parser.add_argument('--rate', type=float, default=10.0, help="每秒请求上限，两种方式相同；0 为不限流")
+    parser.add_argument('--burst', type=int, default=None, help="允许的突发请求数，默认等于并发线程数")
+    args = parser.parse_args()
+
+    codes = synthetic_codes(args.codes)
+    fetcher = stub_fetcher(args.latency)
+    rate = args.rate or None
+    burst = args.burst or args.workers
+    if rate:
+        print(f"限流：每秒 {rate:g} 次请求，突发 {burst} 次（串行与并发相同）")
+    else:
+        print("限流：无")
+
+    start = time.perf_counter()
+    run_serial(codes, fetcher, args.sleep, RateLimiter(rate, burst) if rate else None)
+    serial = time.perf_counter() - start
+    print(f"串行：{serial:.2f}s（每只股票后等待 {args.sleep:g}s）")
+
+    start = time.perf_counter()
+    results, failures = fetch_statements(codes, fetcher=fetcher, max_workers=args.workers, rate=rate, burst=burst)
+    concurrent = time.perf_counter() - start
+    print(f"并发：{concurrent:.2f}s（{args.workers} 个线程，成功 {len(results)}，失败 {len(failures)}）")
+    print(f"加速比：{serial / concurrent:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""测量各入口模块的冷启动导入耗时（python -X importtime），并检查是否导入了 akshare
+
+每个模块在新的解释器中导入，耗时取多次运行中的最小值。
+用法：python -m benchmarks.bench_import --repeat 5
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('akshare', 'fetch', 'transform', 'finance', 'screen', 'charts', 'industry', 'server')
+
+# importtime 输出格式：import time: self [us] | cumulative | imported package
+LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def import_time(module):
+    """在新的解释器中导入 module，返回 (模块自身的累计导入耗时（秒）, 已导入的全部模块名)"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    cumulative = None
+    imported = set()
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            imported.add(match.group(4))
+            # 顶层导入的模块名前只有一个空格，嵌套导入按层级缩进
+            if match.group(4) == module and len(match.group(3)) == 1:
+                cumulative = int(match.group(2)) / 1e6
+    return cumulative, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入口模块冷启动导入耗时")
+    parser.add_argument('modules', nargs='*', default=MODULES, help="要测量的模块")
+    parser.add_argument('--repeat', type=int, default=5, help="重复次数，耗时取最小值")
+    args = parser.parse_args()
+
+    print(f"{'模块':<12}{'导入耗时':>10}{'模块数':>8}  akshare  pandas")
+    for module in args.modules:
+        seconds = []
+        for _ in range(args.repeat):
+            cumulative, imported = import_time(module)
+            seconds.append(cumulative)
+        loads_akshare = 'akshare' in imported and module != 'akshare'
+        print(f"{module:<12}{min(seconds) * 1000:>8.1f}ms{len(imported):>8}  "
+              f"{'是' if loads_akshare else '否':<7}  {'是' if 'pandas' in imported else '否'}")
+
+
+if __name__ == '__main__':
+    main()
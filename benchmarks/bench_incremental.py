@@ -0,0 +1,110 @@
+"""对比全量运行与增量更新（首次生成、无变化、一家公司变化、删除一家公司）的耗时，并检查输出一致
+
+用法：
+    python -m benchmarks.bench_incremental                    # 默认 2000 家虚拟公司
+    python -m benchmarks.bench_incremental --companies 500
+"""
+import argparse
+import contextlib
+import filecmp
+import io
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+import finance
+from columnar import load_columnar
+from benchmarks.synthetic import synthetic_codes, stub_fetcher
+
+OUTPUT_FILES = ['merged_financial_data.csv', 'merged_financial_data.json', 'index.json']
+
+
+def changed_fetcher(base, symbol_suffix, scale=1.1):
+    """在 base 的基础上修改一家公司的利润表，模拟该公司发布了更正后的数据"""
+    def fetcher(symbol, statement):
+        df = base(symbol, statement)
+        if symbol.endswith(symbol_suffix) and statement == 'profit_yearly':
+            df = df.copy()
+            df['TOTAL_OPERATE_INCOME'] = df['TOTAL_OPERATE_INCOME'] * scale
+        return df
+    return fetcher
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def full_run(codes, fetcher, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    _, seconds = timed(finance.process_financial_data, codes, fetcher=fetcher, rate=None,
+                       output_dir=output_dir, shards=True)
+    return seconds
+
+
+def check_same(full_dir, incremental_dir):
+    """增量输出与全量输出逐字节一致，列式存储读取结果一致"""
+    for name in OUTPUT_FILES:
+        assert filecmp.cmp(os.path.join(full_dir, name), os.path.join(incremental_dir, name), shallow=False), name
+    full_shards = sorted(os.listdir(os.path.join(full_dir, 'companies')))
+    assert full_shards == sorted(os.listdir(os.path.join(incremental_dir, 'companies')))
+    for name in full_shards:
+        assert filecmp.cmp(os.path.join(full_dir, 'companies', name),
+                           os.path.join(incremental_dir, 'companies', name), shallow=False), name
+    expected = load_columnar(os.path.join(full_dir, 'columnar')).astype(object)
+    actual = load_columnar(os.path.join(incremental_dir, 'columnar')).astype(object)
+    pd.testing.assert_frame_equal(expected, actual)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量更新基准测试")
+    parser.add_argument('--companies', type=int, default=2000, help="虚拟公司数")
+    args = parser.parse_args()
+
+    codes = synthetic_codes(args.companies)
+    base = stub_fetcher()
+    changed = changed_fetcher(base, codes[len(codes) // 2])
+
+    with tempfile.TemporaryDirectory() as root:
+        incremental_dir = os.path.join(root, 'incremental')
+
+        def update(fetcher, stock_codes):
+            return timed(finance.update_financial_data, stock_codes, fetcher=fetcher, rate=None,
+                         output_dir=incremental_dir, shards=True)
+
+        rows = []
+        full_seconds = full_run(codes, base, os.path.join(root, 'full'))
+        rows.append(("全量运行", full_seconds, len(codes)))
+
+        report, seconds = update(base, codes)
+        check_same(os.path.join(root, 'full'), incremental_dir)
+        rows.append(("增量：首次生成", seconds, report['changed']))
+
+        report, seconds = update(base, codes)
+        assert report['changed'] == 0
+        rows.append(("增量：无变化", seconds, report['changed']))
+
+        report, seconds = update(changed, codes)
+        assert report['changed'] == 1
+        full_run(codes, changed, os.path.join(root, 'full_changed'))
+        check_same(os.path.join(root, 'full_changed'), incremental_dir)
+        rows.append(("增量：一家公司变化", seconds, report['changed']))
+
+        report, seconds = update(changed, codes[1:])
+        assert report['removed'] == 1
+        full_run(codes[1:], changed, os.path.join(root, 'full_removed'))
+        check_same(os.path.join(root, 'full_removed'), incremental_dir)
+        rows.append(("增量：删除一家公司", seconds, report['changed']))
+
+    print(f"公司数：{len(codes)}（输出与全量运行逐字节一致）")
+    print(f"{'场景':<16}{'耗时':>10}{'重新计算':>10}{'相对全量':>10}")
+    for label, seconds, recomputed in rows:
+        print(f"{label:<16}{seconds:>9.2f}s{recomputed:>10}{full_seconds / seconds:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""行业统计的全量计算与增量更新耗时：修改一家公司的数据后只重新计算其所在行业
+
+用法：python -m benchmarks.bench_industry --codes 5000 --industries 30
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from transform import METRICS, reshape_universe
+from fetch import to_symbol
+from screen import build_cube
+from industry import compute_rollups, load_industry_map, write_rollups, read_rollups
+from benchmarks.synthetic import synthetic_codes, make_statement, synthetic_industry_map
+
+
+def main():
+    parser = argparse.ArgumentParser(description="行业统计基准测试")
+    parser.add_argument('--codes', type=int, default=5000, help="公司数量")
+    parser.add_argument('--years', type=int, default=10, help="每家公司年数")
+    parser.add_argument('--industries', type=int, default=30, help="行业数量")
+    args = parser.parse_args()
+
+    codes = synthetic_codes(args.codes)
+    universe = {code: {statement: make_statement(to_symbol(code), statement, years=args.years)
+                       for statement in METRICS} for code in codes}
+    cube = build_cube(reshape_universe(universe))
+
+    with tempfile.TemporaryDirectory() as root:
+        map_path = os.path.join(root, 'industry_map.csv')
+        rollups_path = os.path.join(root, 'industry_rollups.json')
+        synthetic_industry_map(codes, args.industries).to_csv(map_path, index=False, encoding='utf-8-sig')
+        mapping = load_industry_map(map_path)
+
+        start = time.perf_counter()
+        rollups, recomputed = compute_rollups(cube, mapping)
+        write_rollups(rollups_path, rollups)
+        print(f"全量计算：{time.perf_counter() - start:.3f}s，{len(recomputed)} 个行业 × "
+              f"{len(cube.periods)} 期 × {len(cube.metrics)} 个指标，"
+              f"文件 {os.path.getsize(rollups_path) / 1e6:.1f}MB")
+
+        # 校验：与 pandas 按行业分组的中位数一致
+        metric, period = '净资产收益率', len(cube.periods) - 1
+        expected = (mapping['行业'].reindex(cube.codes).to_frame()
+                    .assign(x=cube.values[:, period, cube.metric_index[metric]])
+                    .groupby('行业')['x'].median())
+        actual = {industry: group["metrics"][metric]["median"][period]
+                  for industry, group in rollups["industries"].items()}
+        # 没有数据的行业中位数记为 None，按 NaN 比较
+        assert all(np.isclose(np.nan if actual[i] is None else actual[i], round(v, 4), equal_nan=True)
+                   for i, v in expected.items())
+
+        start = time.perf_counter()
+        _, recomputed = compute_rollups(cube, mapping, read_rollups(rollups_path))
+        print(f"数据未变化：{time.perf_counter() - start:.3f}s，重新计算 {len(recomputed)} 个行业")
+
+        k = cube.metric_index['营业收入']
+        changed = next(i for i in range(len(cube.codes)) if not np.isnan(cube.values[i, -1, k]))
+        cube.values[changed, -1, k] *= 1.1
+        start = time.perf_counter()
+        rollups, recomputed = compute_rollups(cube, mapping, read_rollups(rollups_path))
+        write_rollups(rollups_path, rollups)
+        print(f"修改 1 家公司（{mapping['行业'][cube.codes[changed]]}）：{time.perf_counter() - start:.3f}s，"
+              f"重新计算 {recomputed}")
+
+
+if __name__ == '__main__':
+    main()
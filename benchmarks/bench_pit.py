@@ -0,0 +1,110 @@
+"""模拟多次运行中部分公司追溯调整历史数据，对比按时点版本库与每次保存完整快照的存储大小，并测量 as_of 查询耗时
+
+每次运行随机选取一部分公司，修改其部分单元格（追溯调整）并删除少量单元格，将完整长表写入版本库；
+最后检查每次运行时点的 as_of 结果与当时的完整快照一致。完整快照按列式存储（columnar）计算大小。
+用法：python -m benchmarks.bench_pit --companies 2000 --runs 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar import write_columnar
+from pointintime import PointInTimeStore
+from transform import reshape_universe
+from benchmarks.synthetic import synthetic_codes, synthetic_universe
+
+KEY_COLUMNS = ['股票代码', '报表', '项目', '报告期']
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def normalize(df):
+    """按单元格排序、类别列转为字符串，便于比较"""
+    df = df.astype({name: object for name in ('股票代码', '公司名称', '报表', '项目')})
+    df['报告期'] = pd.to_datetime(df['报告期']).astype('datetime64[ns]')
+    return df[KEY_COLUMNS[:1] + ['公司名称'] + KEY_COLUMNS[1:] + ['金额']].sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+
+def restate(df, rng, company_share, cell_share):
+    """随机选取 company_share 的公司，修改其 cell_share 的单元格，并删除每家公司的一个单元格"""
+    codes = df['股票代码'].unique()
+    chosen = rng.choice(codes, max(1, int(len(codes) * company_share)), replace=False)
+    rows = np.flatnonzero(df['股票代码'].isin(chosen).to_numpy())
+    changed = rng.choice(rows, max(1, int(len(rows) * cell_share)), replace=False)
+    df = df.copy()
+    df.loc[changed, '金额'] = df.loc[changed, '金额'] * rng.uniform(0.9, 1.1, len(changed))
+    dropped = df.loc[rows].groupby('股票代码', observed=True).head(1).index
+    return df.drop(index=dropped).reset_index(drop=True)
+
+
+def best_of(func, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    return result, min(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按时点版本库基准测试")
+    parser.add_argument('--companies', type=int, default=2000, help="虚拟公司数")
+    parser.add_argument('--runs', type=int, default=20, help="运行次数")
+    parser.add_argument('--company-share', type=float, default=0.05, help="每次运行追溯调整的公司比例")
+    parser.add_argument('--cell-share', type=float, default=0.1, help="被调整公司中修改的单元格比例")
+    parser.add_argument('--repeat', type=int, default=5, help="查询重复次数，耗时取最小值")
+    args = parser.parse_args()
+
+    codes = synthetic_codes(args.companies)
+    df = reshape_universe(synthetic_universe(codes)).drop_duplicates(KEY_COLUMNS).reset_index(drop=True)
+    rng = np.random.default_rng(0)
+    times = pd.date_range('2024-01-01', periods=args.runs, freq='D')
+
+    with tempfile.TemporaryDirectory() as root:
+        store = PointInTimeStore(os.path.join(root, 'pit'))
+        snapshots = []
+        ingest_seconds = []
+        for run, at in enumerate(times):
+            if run:
+                df = restate(df, rng, args.company_share, args.cell_share)
+            start = time.perf_counter()
+            store.ingest(df, at=at)
+            ingest_seconds.append(time.perf_counter() - start)
+            snapshots.append(normalize(df))
+        store.close()
+        write_columnar(df, os.path.join(root, 'snapshot'))
+        store_bytes = directory_size(os.path.join(root, 'pit'))
+        snapshot_bytes = directory_size(os.path.join(root, 'snapshot'))
+
+        # 重新打开，索引由文件映射读取
+        store = PointInTimeStore(os.path.join(root, 'pit'))
+        for at, snapshot in zip(times, snapshots):
+            pd.testing.assert_frame_equal(normalize(store.as_of(at + pd.Timedelta(hours=12))), snapshot)
+        middle = times[len(times) // 2]
+        full, full_seconds = best_of(lambda: store.as_of(middle), args.repeat)
+        subset = list(rng.choice(codes, 50, replace=False))
+        _, subset_seconds = best_of(lambda: store.as_of(middle, subset), args.repeat)
+        _, history_seconds = best_of(lambda: store.history(subset[0]), args.repeat)
+        ingests = store.meta["ingests"]
+        store.close()
+
+    snapshots_bytes = snapshot_bytes * args.runs
+    delta_cells = sum(ingest["added"] + ingest["changed"] + ingest["removed"] for ingest in ingests[1:])
+    print(f"{args.companies} 家公司、{len(full)} 个单元格，{args.runs} 次运行共变化 {delta_cells} 个单元格"
+          f"（各时点 as_of 与完整快照一致）")
+    print(f"{'存储方式':<20}{'大小':>12}")
+    print(f"{'每次一份列式快照':<20}{snapshots_bytes / 1e6:>10.1f}MB")
+    print(f"{'按时点版本库':<20}{store_bytes / 1e6:>10.1f}MB  ({snapshots_bytes / store_bytes:.1f}x)")
+    print(f"写入：首次 {ingest_seconds[0] * 1000:.0f}ms，之后平均 {np.mean(ingest_seconds[1:]) * 1000:.0f}ms")
+    print(f"as_of：全部公司 {full_seconds * 1000:.1f}ms，50 家公司 {subset_seconds * 1000:.2f}ms；"
+          f"单家公司历史 {history_seconds * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""对比逐行 iterrows 构建字典与向量化长表转换的耗时
+
+用法：python -m benchmarks.bench_reshape --codes 500 --years 10
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from transform import METRICS, reshape_universe
+from fetch import to_symbol
+from benchmarks.synthetic import synthetic_codes, make_statement
+
+
+def legacy_reshape(code, frames):
+    # 原实现：逐行、逐指标判断非空并追加字典
+    data = []
+    for statement, mapping in METRICS.items():
+        for _, row in frames[statement].iterrows():
+            if statement == 'balance_yearly':
+                contract_liab = row['CONTRACT_LIAB'] if pd.notna(row['CONTRACT_LIAB']) else 0
+                advance_rec = row['ADVANCE_RECEIVABLES'] if pd.notna(row['ADVANCE_RECEIVABLES']) else 0
+                combined_value = contract_liab + advance_rec
+                if combined_value != 0:
+                    data.append({'股票代码': code, '公司名称': row['SECURITY_NAME_ABBR'], '报表': statement,
+                                 '项目': '合同负债', '报告期': row['REPORT_DATE'], '金额': combined_value})
+            for en_name, cn_name in mapping.items():
+                if statement == 'balance_yearly' and en_name in ['CONTRACT_LIAB', 'ADVANCE_RECEIVABLES']:
+                    continue
+                if pd.notna(row[en_name]):
+                    data.append({'股票代码': code, '公司名称': row['SECURITY_NAME_ABBR'], '报表': statement,
+                                 '项目': cn_name, '报告期': row['REPORT_DATE'], '金额': row[en_name]})
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description="长表转换基准测试")
+    parser.add_argument('--codes', type=int, default=500, help="公司数量")
+    parser.add_argument('--years', type=int, default=10, help="每家公司年数")
+    args = parser.parse_args()
+
+    universe = {}
+    for code in synthetic_codes(args.codes):
+        symbol = to_symbol(code)
+        universe[code] = {statement: make_statement(symbol, statement, years=args.years)
+                          for statement in METRICS}
+    print(f"{args.codes} 家公司 × {args.years} 年 = {args.codes * args.years} 个公司年")
+
+    start = time.perf_counter()
+    rows = []
+    for code, frames in universe.items():
+        rows.extend(legacy_reshape(code, frames))
+    legacy = pd.DataFrame(rows)
+    legacy_time = time.perf_counter() - start
+    print(f"iterrows：{legacy_time:.3f}s")
+
+    start = time.perf_counter()
+    vectorized = reshape_universe(universe)
+    vectorized_time = time.perf_counter() - start
+    print(f"向量化：{vectorized_time:.3f}s")
+
+    # 两种实现的行顺序不同，按输出时的排序键排序后比较
+    keys = ['公司名称', '报表', '报告期']
+    legacy = legacy.sort_values(keys, kind='stable').reset_index(drop=True)
+    vectorized = vectorized.sort_values(keys, kind='stable').reset_index(drop=True)
+    pd.testing.assert_frame_equal(legacy, vectorized, check_dtype=False)
+    print(f"结果一致，加速比：{legacy_time / vectorized_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""用模拟时钟和离线的获取函数模拟刷新调度器运行一年，与每天全部重新获取比较上游调用次数和发现新报告的延迟
+
+每家公司每年的年报在次年 1 月中旬到 4 月 30 日之间的随机一天披露，少数公司延期到 6 月；
+获取函数只返回模拟时间之前已披露的报告期。模拟中途让一次输出写入失败（模拟进程崩溃），
+用同一个任务队列重新启动调度器，最后检查输出与全量运行逐字节一致。
+用法：python -m benchmarks.bench_scheduler --synthetic 60
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import sqlite3
+import tempfile
+import time
+
+import numpy as np
+
+import finance
+import scheduler
+from scheduler import RefreshScheduler, DAY
+from benchmarks.synthetic import make_statement, synthetic_codes
+
+START = datetime.date(2024, 1, 1)
+FIRST_YEAR = 2014
+LAST_YEAR = 2024
+
+
+class FakeClock:
+    """模拟时钟：sleep 只推进时间"""
+
+    def __init__(self, start):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class Crash(Exception):
+    pass
+
+
+class CrashingScheduler(RefreshScheduler):
+    """第 crash_at 次写入输出时抛出异常，模拟写入前进程中断"""
+
+    def __init__(self, *args, crash_at=2, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.writes = 0
+        self.crash_at = crash_at
+
+    def _update_outputs(self, updated, report):
+        self.writes += 1
+        if self.writes == self.crash_at:
+            raise Crash()
+        super()._update_outputs(updated, report)
+
+
+def publish_dates(codes, seed=0):
+    """{(股票代码, 年份): 年报披露时间戳}"""
+    rng = np.random.default_rng(seed)
+    dates = {}
+    for code in codes:
+        late = rng.random() < 0.05
+        for year in range(FIRST_YEAR, LAST_YEAR + 1):
+            day = int(rng.integers(130, 160)) if late else int(rng.integers(14, 120))
+            dates[code, year] = scheduler._timestamp(datetime.date(year + 1, 1, 1) + datetime.timedelta(days=day))
+    return dates
+
+
+def stub_fetcher(clock, published, calls):
+    """只返回模拟时间之前已披露的年报"""
+    frames = {}
+
+    def fetcher(symbol, statement):
+        calls.append(symbol)
+        if (symbol, statement) not in frames:
+            frames[symbol, statement] = make_statement(symbol, statement, years=LAST_YEAR - FIRST_YEAR + 1,
+                                                       last_year=LAST_YEAR)
+        df = frames[symbol, statement]
+        years = df['REPORT_DATE'].str[:4].astype(int)
+        visible = [published[symbol[2:], year] <= clock.now for year in years]
+        return df[visible].reset_index(drop=True)
+    return fetcher
+
+
+def running_jobs(db_path):
+    """任务队列中标记为进行中的任务数"""
+    with contextlib.closing(sqlite3.connect(db_path)) as db:
+        return db.execute("SELECT COUNT(*) FROM jobs WHERE running = 1").fetchone()[0]
+
+
+def latest_periods(sched):
+    return dict(sched.db.execute("SELECT code, latest_period FROM jobs"))
+
+
+def simulate(codes, days, work_dir):
+    """模拟运行 days 天，返回 (上游调用次数, 发现延迟列表（天）, 中断后恢复的公司数, 模拟时钟, 获取函数)"""
+    clock = FakeClock(scheduler._timestamp(START))
+    end = clock.now + days * DAY
+    published = publish_dates(codes)
+    calls = []
+    fetcher = stub_fetcher(clock, published, calls)
+    db_path = os.path.join(work_dir, 'scheduler.db')
+    kwargs = dict(fetcher=fetcher, output_dir=work_dir, shards=True, clock=clock.time, sleep=clock.sleep, rate=None)
+
+    sched = CrashingScheduler(db_path, crash_at=2, **kwargs)
+    sched.add(codes)
+    known = {}
+    delays = []
+    resumed = 0
+    while clock.now < end:
+        try:
+            sched.run(max_cycles=1)
+            sched.wait()
+        except Crash:
+            # 崩溃：丢弃调度器，用同一个任务队列重新启动
+            sched.close()
+            resumed = running_jobs(db_path)
+            sched = RefreshScheduler(db_path, **kwargs)
+        for code, latest in latest_periods(sched).items():
+            if latest is not None and latest != known.get(code):
+                year = int(latest[:4])
+                if code in known:
+                    delays.append((clock.now - published[code, year]) / DAY)
+                known[code] = latest
+    sched.close()
+    return len(calls), delays, resumed, clock, fetcher
+
+
+def read(*parts):
+    with open(os.path.join(*parts), 'rb') as f:
+        return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="刷新调度器模拟")
+    parser.add_argument('--synthetic', type=int, default=60, help="虚拟公司数")
+    parser.add_argument('--days', type=int, default=365, help="模拟天数")
+    args = parser.parse_args()
+
+    codes = synthetic_codes(args.synthetic)
+    with tempfile.TemporaryDirectory() as work_dir, tempfile.TemporaryDirectory() as full_dir:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            calls, delays, resumed, clock, fetcher = simulate(codes, args.days, work_dir)
+            # 用模拟结束时的数据做一次全量运行，与调度器的输出比较
+            finance.process_financial_data(codes, fetcher=fetcher, rate=None, output_dir=full_dir, shards=True)
+        elapsed = time.perf_counter() - start
+        identical = all(read(work_dir, name) == read(full_dir, name)
+                        for name in ('merged_financial_data.csv', 'merged_financial_data.json', 'index.json'))
+
+    statements = len(finance.STATEMENT_APIS)
+    naive = args.synthetic * statements * args.days
+    delays = np.array(delays)
+    print(f"模拟 {args.synthetic} 家公司 {args.days} 天，耗时 {elapsed:.1f}s；中断后恢复 {resumed} 家公司，"
+          f"输出与全量运行{'逐字节一致' if identical else '不一致'}")
+    print(f"{'方式':<24}{'上游调用':>10}{'平均延迟':>10}{'最大延迟':>10}")
+    print(f"{'每天全部重新获取':<24}{naive:>10}{'≤1.0 天':>10}{'≤1.0 天':>10}")
+    print(f"{'按披露日历调度':<24}{calls:>10}{delays.mean():>8.2f}天{delays.max():>8.2f}天")
+
+
+if __name__ == '__main__':
+    main()
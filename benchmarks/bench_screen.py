@@ -0,0 +1,59 @@
+"""横截面筛选在大规模公司集合上的耗时：构建 Cube 以及百分位、名次、标准分和组合筛选查询
+
+用法：python -m benchmarks.bench_screen --codes 5000 --years 10
+"""
+import argparse
+import time
+
+from transform import METRICS, reshape_universe
+from fetch import to_symbol
+from screen import build_cube
+from benchmarks.synthetic import synthetic_codes, make_statement
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="横截面筛选基准测试")
+    parser.add_argument('--codes', type=int, default=5000, help="公司数量")
+    parser.add_argument('--years', type=int, default=10, help="每家公司年数")
+    parser.add_argument('--repeat', type=int, default=20, help="每个查询的重复次数")
+    args = parser.parse_args()
+
+    universe = {}
+    for code in synthetic_codes(args.codes):
+        symbol = to_symbol(code)
+        universe[code] = {statement: make_statement(symbol, statement, years=args.years)
+                          for statement in METRICS}
+    df = reshape_universe(universe)
+
+    start = time.perf_counter()
+    cube = build_cube(df)
+    print(f"构建 Cube：{time.perf_counter() - start:.3f}s，形状 {cube.values.shape}"
+          f"（{cube.values.nbytes / 1e6:.0f}MB）")
+
+    conditions = [('净资产收益率', 'top', 0.1), ('资产负债率', '<', 50), ('营业收入增长率', '>', 20)]
+    queries = [
+        ('百分位 净资产收益率', lambda: cube.percentile('净资产收益率')),
+        ('名次 净资产收益率', lambda: cube.rank('净资产收益率')),
+        ('标准分 毛利率', lambda: cube.zscore('毛利率')),
+        ('组合条件掩码', lambda: cube.mask(conditions)),
+        ('筛选并排序', lambda: cube.screen(conditions, sort_by='净资产收益率')),
+    ]
+    print(f"{'查询':<16}{'最快耗时':>12}")
+    for label, query in queries:
+        seconds, result = best_of(query, args.repeat)
+        print(f"{label:<16}{seconds * 1000:>10.2f}ms")
+    print(f"\n最新报告期 ROE 前 10%、资产负债率 < 50%、营业收入增长率 > 20%：{len(result)} 家")
+    print(result.head(10).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""本地压测静态服务器：多个并发客户端反复下载完整 JSON，报告每秒请求数和 p50/p99 延迟
+
+对比原来的单线程 TCPServer（--legacy 模式）与多线程服务器在不压缩、gzip 和 ETag 验证（304）下的表现。
+
+用法：
+    python -m benchmarks.bench_server                        # 使用虚拟数据生成 200 家公司
+    python -m benchmarks.bench_server --synthetic 500 --clients 16 --requests 50
+"""
+import argparse
+import contextlib
+import http.client
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from server import make_server
+
+
+def run_clients(port, path, clients, requests, headers):
+    """启动 clients 个线程，每个线程在长连接上顺序发送 requests 个请求，返回 (总耗时, 延迟列表, 响应字节数)"""
+    latencies = [[] for _ in range(clients)]
+    sizes = [0] * clients
+    barrier = threading.Barrier(clients + 1)
+
+    def client(index):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        barrier.wait()
+        for _ in range(requests):
+            start = time.perf_counter()
+            conn.request('GET', path, headers=headers)
+            response = conn.getresponse()
+            body = response.read()
+            latencies[index].append(time.perf_counter() - start)
+            sizes[index] = len(body)
+            if response.getheader('Connection', '').lower() == 'close' or response.version == 10:
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        conn.close()
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return elapsed, np.concatenate([np.array(l) for l in latencies]), max(sizes)
+
+
+def probe(port, path, headers):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('ETag')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="静态服务器压测")
+    parser.add_argument('--input', help="要下载的 JSON 文件，默认用虚拟数据生成")
+    parser.add_argument('--synthetic', type=int, default=200, help="虚拟数据的公司数")
+    parser.add_argument('--clients', type=int, default=8, help="并发客户端数")
+    parser.add_argument('--requests', type=int, default=20, help="每个客户端的请求数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        data_dir = os.path.join(root, 'data')
+        os.makedirs(data_dir)
+        if args.input:
+            shutil.copy(args.input, os.path.join(data_dir, 'merged_financial_data.json'))
+        else:
+            import finance
+            from benchmarks.synthetic import synthetic_codes, stub_fetcher
+            with contextlib.redirect_stdout(io.StringIO()):
+                finance.process_financial_data(synthetic_codes(args.synthetic), fetcher=stub_fetcher(),
+                                               rate=None, output_dir=data_dir)
+        path = '/data/merged_financial_data.json'
+        size = os.path.getsize(os.path.join(data_dir, 'merged_financial_data.json'))
+        print(f"文件大小：{size / 1e6:.1f}MB，并发 {args.clients}，每客户端 {args.requests} 次请求")
+        print(f"{'场景':<24}{'RPS':>10}{'p50':>10}{'p99':>10}{'响应字节':>12}")
+
+        scenarios = [
+            ('单线程 TCPServer', True, {}),
+            ('多线程 不压缩', False, {}),
+            ('多线程 gzip', False, {'Accept-Encoding': 'gzip'}),
+            ('多线程 gzip + ETag 304', False, {'Accept-Encoding': 'gzip'}),
+        ]
+        for label, legacy, headers in scenarios:
+            httpd = make_server(0, directory=root, legacy=legacy, verbose=False)
+            port = httpd.server_address[1]
+            thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+            thread.start()
+            try:
+                headers = dict(headers)
+                etag = probe(port, path, headers)
+                if label.endswith('304'):
+                    headers['If-None-Match'] = etag
+                elapsed, latencies, body_size = run_clients(port, path, args.clients, args.requests, headers)
+            finally:
+                httpd.shutdown()
+                httpd.server_close()
+            rps = len(latencies) / elapsed
+            p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+            print(f"{label:<24}{rps:>10.1f}{p50:>8.1f}ms{p99:>8.1f}ms{body_size:>12}")
+
+
+if __name__ == '__main__':
+    main()
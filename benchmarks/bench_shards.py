@@ -0,0 +1,76 @@
+"""对比网页加载单一完整 JSON 与 "索引 + 选中公司分片" 两种方式的传输字节数和解析耗时
+
+用法：
+    python -m benchmarks.bench_shards                       # 使用 data/merged_financial_data.json
+    python -m benchmarks.bench_shards --synthetic 300       # 使用虚拟数据生成 300 家公司
+"""
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+
+from emit import ShardWriter
+
+
+def measure(texts, repeat=5):
+    """返回 (原始字节数, gzip 后字节数, 最快解析耗时)"""
+    raw = sum(len(text.encode('utf-8')) for text in texts)
+    compressed = sum(len(gzip.compress(text.encode('utf-8'))) for text in texts)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            json.loads(text)
+        timings.append(time.perf_counter() - start)
+    return raw, compressed, min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分片输出加载基准测试")
+    parser.add_argument('--input', default='data/merged_financial_data.json', help="完整 JSON 文件")
+    parser.add_argument('--synthetic', type=int, help="改用虚拟数据生成指定数量的公司")
+    parser.add_argument('--select', type=int, nargs='+', default=[1, 2, 5, 10], help="选中的公司数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        if args.synthetic:
+            import finance
+            from benchmarks.synthetic import synthetic_codes, stub_fetcher
+            with contextlib.redirect_stdout(io.StringIO()):
+                finance.process_financial_data(synthetic_codes(args.synthetic), fetcher=stub_fetcher(),
+                                               rate=None, output_dir=output_dir)
+            path = os.path.join(output_dir, 'merged_financial_data.json')
+        else:
+            path = args.input
+
+        with open(path, 'r', encoding='utf-8') as f:
+            full_text = f.read()
+        companies = json.loads(full_text)['companies']
+        with ShardWriter(output_dir) as writer:
+            for code, company in companies.items():
+                writer.write(code, company)
+
+        def read(*parts):
+            with open(os.path.join(output_dir, *parts), 'r', encoding='utf-8') as f:
+                return f.read()
+
+        index_text = read('index.json')
+        codes = list(companies)
+        print(f"公司数：{len(codes)}")
+        print(f"{'方式':<16}{'字节':>12}{'gzip 字节':>12}{'解析耗时':>12}")
+        raw, compressed, seconds = measure([full_text])
+        print(f"{'完整文件':<16}{raw:>12}{compressed:>12}{seconds * 1000:>10.2f}ms")
+        for count in args.select:
+            if count > len(codes):
+                continue
+            texts = [index_text] + [read('companies', f"{code}.json") for code in codes[:count]]
+            raw, compressed, seconds = measure(texts)
+            print(f"{f'索引 + {count} 家':<16}{raw:>12}{compressed:>12}{seconds * 1000:>10.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
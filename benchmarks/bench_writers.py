@@ -0,0 +1,52 @@
+"""对比全量输出与流式输出两种模式的耗时和峰值内存（RSS）
+
+每种模式在独立的子进程中运行，以便分别统计峰值内存。
+用法：python -m benchmarks.bench_writers --codes 2000
+"""
+import argparse
+import contextlib
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_child(mode, codes, output_dir):
+    import finance
+    from benchmarks.synthetic import synthetic_codes, stub_fetcher
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        finance.process_financial_data(synthetic_codes(codes), fetcher=stub_fetcher(), rate=None,
+                                       output_dir=output_dir, stream=(mode == 'stream'))
+    elapsed = time.perf_counter() - start
+    # Linux 下 ru_maxrss 的单位为 KB
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'mode': mode, 'seconds': elapsed, 'peak_rss_mb': peak}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输出阶段峰值内存基准测试")
+    parser.add_argument('--codes', type=int, default=2000, help="公司数量")
+    parser.add_argument('--child', choices=['full', 'stream'], help=argparse.SUPPRESS)
+    parser.add_argument('--output-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.codes, args.output_dir)
+        return
+
+    for mode in ('full', 'stream'):
+        with tempfile.TemporaryDirectory() as output_dir:
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.bench_writers', '--codes', str(args.codes),
+                                     '--child', mode, '--output-dir', output_dir],
+                                    capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:>6}：{result['seconds']:.2f}s，峰值 RSS {result['peak_rss_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
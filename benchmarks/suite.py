@@ -0,0 +1,234 @@
+"""可复现的性能基准测试：在多个规模下测量转换、JSON 构建、派生指标和各输出步骤的耗时与内存
+
+虚拟报表由 benchmarks.synthetic 按固定种子生成，结果只取决于代码和运行的机器。
+每个步骤的耗时取多次运行的中位数（比最小值更不容易被单次偶然的快速运行拉低）；
+计时运行前先回收垃圾并在运行中关闭垃圾回收（与 timeit 相同），否则回收停顿会计入碰巧触发回收的步骤；
+内存为单独一次运行中由 tracemalloc 统计的该步骤峰值增量。
+
+用法：
+    python -m benchmarks.suite                                # 默认规模 100x10、1000x10
+    python -m benchmarks.suite --scales 100x10 2000x10 --repeat 9
+    python -m benchmarks.suite --save-baseline                # 保存为基线 benchmarks/baseline.json
+    python -m benchmarks.suite --combine run1.json run2.json run3.json --save-baseline
+                                                              # 由多次 --output 的结果取中位数保存基线
+    python -m benchmarks.suite --check                        # 与基线比较，有步骤变慢时退出码为 1
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from transform import reshape_universe, build_json_data
+from columnar import write_columnar
+from emit import ShardWriter, encode_company, encode_shard, index_entry, write_json_fragments
+from instrument import StageTimer
+from benchmarks.synthetic import synthetic_codes, synthetic_universe
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+class StageMemory:
+    """按步骤记录 tracemalloc 统计的峰值内存增量（字节），用法与 StageTimer 相同"""
+
+    def __init__(self):
+        self.peak = {}
+
+    @contextmanager
+    def __call__(self, name):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            self.peak[name] = max(self.peak.get(name, 0), tracemalloc.get_traced_memory()[1] - base)
+
+
+def run_pipeline(universe, output_dir, timer):
+    """依次执行转换、排序、JSON 构建（含派生指标）、编码和各输出步骤，返回长表行数"""
+    with timer('reshape'):
+        df = reshape_universe(universe)
+    with timer('sort'):
+        df = df.sort_values(['公司名称', '报表', '报告期'], ascending=[True, True, True])
+    companies = build_json_data(df, timer)["companies"]
+    with timer('encode'):
+        fragments = {code: encode_company(company) for code, company in companies.items()}
+        shard_fragments = {code: (index_entry(code, company), encode_shard(company))
+                           for code, company in companies.items()}
+    codes = df['股票代码'].unique()
+    with timer('write_csv'):
+        df.to_csv(os.path.join(output_dir, 'merged_financial_data.csv'), index=False, encoding='utf-8-sig')
+    with timer('write_columnar'):
+        write_columnar(df, os.path.join(output_dir, 'columnar'))
+    with timer('write_json'):
+        write_json_fragments(os.path.join(output_dir, 'merged_financial_data.json'),
+                             ((code, fragments[code]) for code in codes))
+    with timer('write_shards'), ShardWriter(output_dir) as shard_writer:
+        for code in codes:
+            shard_writer.write_fragment(code, *shard_fragments[code])
+    return len(df)
+
+
+def run_scale(companies, years, repeat=5):
+    """在 companies 家公司 × years 年的虚拟数据上运行全部步骤"""
+    universe = synthetic_universe(synthetic_codes(companies), years)
+    seconds = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        for _ in range(repeat):
+            timer = StageTimer()
+            gc.collect()
+            gc.disable()
+            try:
+                rows = run_pipeline(universe, output_dir, timer)
+            finally:
+                gc.enable()
+            for name, value in timer.seconds.items():
+                seconds.setdefault(name, []).append(value)
+
+        memory = StageMemory()
+        tracemalloc.start()
+        try:
+            run_pipeline(universe, output_dir, memory)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "companies": companies,
+        "years": years,
+        "rows": rows,
+        "stages": {name: {"seconds": round(float(np.median(seconds[name])), 5), "peak_bytes": memory.peak.get(name)}
+                   for name in seconds}
+    }
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__
+    }
+
+
+def parse_scale(text):
+    """'1000x10' 转换为 (公司数, 年数)"""
+    companies, _, years = text.partition('x')
+    return int(companies), int(years or 10)
+
+
+def combine(reports):
+    """合并多次运行（--output 保存的结果）：每个步骤的耗时和峰值内存取各次的中位数
+
+    单核或共享的机器在不同时段的速度可相差 1.5 倍，同一进程内的多次重复无法覆盖这种差异，
+    基线应由分开运行的多个进程合并得到。
+    """
+    results = {}
+    for scale, result in reports[0]["results"].items():
+        runs = [report["results"][scale] for report in reports if scale in report["results"]]
+        stages = {}
+        for name in result["stages"]:
+            values = [run["stages"][name] for run in runs if name in run["stages"]]
+            peaks = [value["peak_bytes"] for value in values if value["peak_bytes"] is not None]
+            stages[name] = {"seconds": round(float(np.median([value["seconds"] for value in values])), 5),
+                            "peak_bytes": int(np.median(peaks)) if peaks else None}
+        results[scale] = {**result, "stages": stages, "runs": len(runs)}
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """与基线逐步骤比较耗时，返回变慢超过容差的 (规模, 步骤, 基线耗时, 本次耗时) 列表
+
+    耗时超过基线的 (1 + tolerance) 倍且绝对差值超过 min_delta 秒才视为变慢；
+    几十毫秒以内的步骤计时噪声常超过容差，只由 min_delta 判断。
+    基线中没有的步骤无法检查，同样作为失败返回，基线耗时为 None。
+    """
+    regressions = []
+    print(f"\n{'规模':<10}{'步骤':<16}{'基线':>10}{'本次':>10}{'比值':>8}")
+    for scale, result in results.items():
+        if scale not in baseline["results"]:
+            print(f"{scale:<10}基线中没有该规模，跳过")
+            continue
+        base_stages = baseline["results"][scale]["stages"]
+        for name, stage in result["stages"].items():
+            if name not in base_stages:
+                print(f"{scale:<10}{name:<16}{'—':>10}{stage['seconds'] * 1000:>8.1f}ms{'':>8}  基线中没有该步骤")
+                regressions.append((scale, name, None, stage["seconds"]))
+                continue
+            before, now = base_stages[name]["seconds"], stage["seconds"]
+            ratio = now / before if before else float('inf')
+            slower = now > before * (1 + tolerance) and now - before > min_delta
+            mark = '  变慢' if slower else ''
+            print(f"{scale:<10}{name:<16}{before * 1000:>8.1f}ms{now * 1000:>8.1f}ms{ratio:>8.2f}{mark}")
+            if slower:
+                regressions.append((scale, name, before, now))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多规模性能基准测试与回归检查")
+    parser.add_argument('--scales', nargs='+', default=['100x10', '1000x10'], help="规模，格式为 公司数x年数")
+    parser.add_argument('--repeat', type=int, default=5, help="每个规模的重复次数，耗时取中位数")
+    parser.add_argument('--output', help="将结果保存为 JSON")
+    parser.add_argument('--combine', nargs='+', help="不运行测试，合并多个 --output 保存的结果（各步骤取中位数）")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument('--save-baseline', action='store_true', help="将本次结果保存为基线")
+    parser.add_argument('--check', action='store_true', help="与基线比较，有步骤变慢时退出码为 1")
+    parser.add_argument('--tolerance', type=float, default=0.3, help="允许的变慢比例")
+    parser.add_argument('--min-delta', type=float, default=0.05,
+                        help="忽略的绝对耗时差（秒），低于该值的变化不视为变慢")
+    args = parser.parse_args(argv)
+
+    if args.combine:
+        reports = []
+        for path in args.combine:
+            with open(path, 'r', encoding='utf-8') as f:
+                reports.append(json.load(f))
+        results = combine(reports)
+    else:
+        results = {}
+        for text in args.scales:
+            companies, years = parse_scale(text)
+            scale = f"{companies}x{years}"
+            results[scale] = run_scale(companies, years, args.repeat)
+    for scale, result in results.items():
+        print(f"\n{scale}：{result['rows']} 行")
+        print(f"{'步骤':<16}{'耗时':>10}{'峰值内存':>12}")
+        for name, stage in result["stages"].items():
+            peak = stage["peak_bytes"]
+            print(f"{name:<16}{stage['seconds'] * 1000:>8.1f}ms{(peak or 0) / 2 ** 20:>10.1f}MB")
+
+    report = {"machine": machine_info(), "results": results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n基线已保存：{args.baseline}")
+
+    if args.check:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get("machine") != report["machine"]:
+            print("注意：基线来自不同的机器或依赖版本，耗时不一定可比")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        missing = [r for r in regressions if r[2] is None]
+        if missing:
+            print(f"\n{len(missing)} 个步骤在基线中没有记录，请用 --save-baseline 重新记录基线")
+        if len(regressions) > len(missing):
+            print(f"\n{len(regressions) - len(missing)} 个步骤比基线慢超过 {args.tolerance:.0%}")
+        if regressions:
+            sys.exit(1)
+        print("\n没有步骤比基线变慢")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from transform import METRICS, QUARTERLY_STATEMENTS
+from fetch import to_symbol
+
+
+def synthetic_codes(n):
+    """生成 n 个虚拟股票代码，沪深各半"""
+    return [f"{600000 + i}" if i % 2 == 0 else f"{i:06d}" for i in range(n)]
+
+
+# 会计准则调整后才出现的字段及其首次出现的年份，此前年度的报表中为空
+FIELD_INTRODUCED = {
+    'CONTRACT_LIAB': 2018,
+    'CREDIT_IMPAIRMENT_INCOME': 2018,
+    'LEASE_LIAB': 2019
+}
+
+
+def make_statement(symbol, statement, years=10, last_year=2023, seed=None):
+    """生成与 akshare 年报接口同结构的虚拟报表（按报告期倒序）
+
+    缺失值的分布与真实报表相近：零散缺失、整列缺失（公司没有该业务），
+    以及准则调整前尚不存在的字段（见 FIELD_INTRODUCED）。
+    """
+    if seed is None:
+        seed = zlib.crc32(f"{symbol}{statement}".encode())
+    rng = np.random.default_rng(seed)
+    columns = list(METRICS[statement])
+    period_years = np.arange(last_year, last_year - years, -1)
+    periods = [f"{year}-12-31 00:00:00" for year in period_years]
+
+    values = rng.normal(1e8, 5e7, size=(len(periods), len(columns)))
+    values[rng.random(values.shape) < 0.1] = np.nan  # 零散缺失
+    values[:, rng.random(len(columns)) < 0.05] = np.nan  # 整列缺失
+    for column, year in FIELD_INTRODUCED.items():
+        if column in columns:
+            values[period_years < year, columns.index(column)] = np.nan
+
+    df = pd.DataFrame(values, columns=columns)
+    df.insert(0, 'REPORT_DATE', periods)
+    df.insert(0, 'SECURITY_NAME_ABBR', f"公司{symbol[2:]}")
+    df.insert(0, 'SECURITY_CODE', symbol[2:])
+    return df
+
+
+def synthetic_universe(codes, years=10, last_year=2023, statements=tuple(METRICS), seed=0):
+    """生成 {股票代码: {报表类型: DataFrame}}，约 20% 的公司为近年上市、报告期少于 years 年"""
+    rng = np.random.default_rng(seed)
+    universe = {}
+    for code in codes:
+        history = int(rng.integers(1, years + 1)) if rng.random() < 0.2 else years
+        universe[code] = {statement: make_statement(to_symbol(code), statement, years=history, last_year=last_year)
+                          for statement in statements}
+    return universe
+
+
+def make_report_statement(symbol, statement, years=10, last_year=2023, seed=None):
+    """生成与 akshare 按报告期接口同结构的虚拟季报（按报告期倒序）
+
+    利润表和现金流量表为年初至报告期末的累计值，资产负债表为期末余额。
+    """
+    if seed is None:
+        seed = zlib.crc32(f"{symbol}{statement}".encode())
+    rng = np.random.default_rng(seed)
+    columns = list(METRICS[QUARTERLY_STATEMENTS[statement]])
+    periods = [f"{year}-{month:02d}-{day} 00:00:00" for year in range(last_year - years + 1, last_year + 1)
+               for month, day in ((3, 31), (6, 30), (9, 30), (12, 31))]
+
+    values = rng.normal(2.5e7, 1.2e7, size=(len(periods), len(columns)))
+    if statement != 'balance_report':
+        values = np.cumsum(values.reshape(years, 4, len(columns)), axis=1).reshape(len(periods), len(columns))
+    values[rng.random(values.shape) < 0.02] = np.nan  # 零散缺失
+    values[:, rng.random(len(columns)) < 0.05] = np.nan  # 整列缺失
+
+    df = pd.DataFrame(values[::-1], columns=columns)
+    df.insert(0, 'REPORT_DATE', periods[::-1])
+    df.insert(0, 'SECURITY_NAME_ABBR', f"公司{symbol[2:]}")
+    df.insert(0, 'SECURITY_CODE', symbol[2:])
+    return df
+
+
+def stub_fetcher(latency=0.0, years=10):
+    """带模拟延迟的离线数据获取函数，可直接传给 fetch / process_financial_data / process_quarterly_data"""
+    import time
+
+    def fetcher(symbol, statement):
+        if latency:
+            time.sleep(latency)
+        if statement in QUARTERLY_STATEMENTS:
+            return make_report_statement(symbol, statement, years=years)
+        return make_statement(symbol, statement, years=years)
+
+    return fetcher
+
+
+def synthetic_industry_map(codes, industries=30, seed=0):
+    """为虚拟股票代码生成行业映射（股票代码, 行业, 市值），市值约 10% 缺失"""
+    rng = np.random.default_rng(seed)
+    caps = rng.lognormal(23, 1.2, size=len(codes))
+    caps[rng.random(len(codes)) < 0.1] = np.nan
+    return pd.DataFrame({
+        '股票代码': list(codes),
+        '行业': [f"行业{i:02d}" for i in rng.integers(0, industries, size=len(codes))],
+        '市值': caps
+    })
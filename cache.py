@@ -0,0 +1,130 @@
+import os
+import json
+import time
+
+import pandas as pd
+
+from fetch import STATEMENT_APIS, iter_statements, akshare_fetcher, to_symbol
+
+# 默认缓存有效期：1 天
+DEFAULT_TTL = 24 * 3600
+
+
+class StatementCache:
+    """原始报表 DataFrame 的本地缓存
+
+    每个 (symbol, 报表类型) 存为 root/<报表类型>/<symbol>.pkl，
+    manifest.json 记录每条缓存的获取时间和最新报告期，超过 ttl 秒视为过期。
+    """
+
+    def __init__(self, root='data/cache', ttl=DEFAULT_TTL, clock=time.time):
+        self.root = root
+        self.ttl = ttl
+        self._clock = clock
+        self._manifest_path = os.path.join(root, 'manifest.json')
+        self._manifest = {}
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path, 'r', encoding='utf-8') as f:
+                self._manifest = json.load(f)
+
+    def _path(self, symbol, statement):
+        return os.path.join(self.root, statement, f"{symbol}.pkl")
+
+    def entry(self, symbol, statement):
+        """返回缓存记录 {'fetched_at', 'latest_period'}，不存在时返回 None"""
+        return self._manifest.get(symbol, {}).get(statement)
+
+    def latest_period(self, symbol):
+        """该股票已缓存报表中最新的报告期（字符串），无缓存时返回 None"""
+        periods = [e['latest_period'] for e in self._manifest.get(symbol, {}).values()
+                   if e.get('latest_period')]
+        return max(periods) if periods else None
+
+    def codes(self, statements):
+        """缓存中具有全部指定报表的股票代码"""
+        # 带交易所前缀的代码去掉前两位即为股票代码，见 fetch.to_symbol
+        return [symbol[2:] for symbol, entries in self._manifest.items()
+                if all(statement in entries for statement in statements)]
+
+    def has(self, symbol, statement):
+        """缓存中是否有该报表（不检查是否过期）"""
+        return self.entry(symbol, statement) is not None and os.path.exists(self._path(symbol, statement))
+
+    def is_fresh(self, symbol, statement):
+        if not self.has(symbol, statement):
+            return False
+        return self._clock() - self.entry(symbol, statement)['fetched_at'] < self.ttl
+
+    def get(self, symbol, statement):
+        """读取缓存的 DataFrame，不存在时返回 None（不检查是否过期）"""
+        path = self._path(symbol, statement)
+        if not os.path.exists(path):
+            return None
+        return pd.read_pickle(path)
+
+    def put(self, symbol, statement, df):
+        path = self._path(symbol, statement)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+
+        latest = None
+        if 'REPORT_DATE' in df.columns and len(df) > 0:
+            latest = str(df['REPORT_DATE'].max()).split()[0]
+        self._manifest.setdefault(symbol, {})[statement] = {
+            'fetched_at': self._clock(),
+            'latest_period': latest
+        }
+
+    def save(self):
+        """将 manifest 写回磁盘"""
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self._manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self._manifest_path)
+
+
+def iter_cached_statements(stock_codes, cache, fetcher=akshare_fetcher,
+                           statements=tuple(STATEMENT_APIS), **fetch_kwargs):
+    """优先从缓存读取报表，只对缺失或过期的股票调用上游接口
+
+    产出格式与 fetch.iter_statements 相同。新获取的报表写入缓存，
+    全部缓存命中时不会发生任何上游调用。
+    """
+    stale = []
+    for code in stock_codes:
+        symbol = to_symbol(code)
+        if all(cache.is_fresh(symbol, statement) for statement in statements):
+            yield code, {statement: cache.get(symbol, statement) for statement in statements}, None
+        else:
+            stale.append(code)
+
+    if not stale:
+        return
+
+    try:
+        for code, frames, error in iter_statements(stale, fetcher=fetcher, statements=statements,
+                                                   **fetch_kwargs):
+            if error is None:
+                symbol = to_symbol(code)
+                for statement, df in frames.items():
+                    cache.put(symbol, statement, df)
+            yield code, frames, error
+    finally:
+        cache.save()
+
+
+def iter_local_statements(stock_codes, cache, statements=tuple(STATEMENT_APIS)):
+    """只从缓存读取报表（不检查是否过期，不调用上游接口），产出格式与 fetch.iter_statements 相同
+
+    缓存中缺少任一报表的股票产出 FileNotFoundError。
+    """
+    for code in stock_codes:
+        symbol = to_symbol(code)
+        missing = [statement for statement in statements if not cache.has(symbol, statement)]
+        if missing:
+            yield code, None, FileNotFoundError(f"缓存中没有报表：{', '.join(missing)}")
+        else:
+            yield code, {statement: cache.get(symbol, statement) for statement in statements}, None
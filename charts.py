@@ -0,0 +1,104 @@
+import os
+import json
+import argparse
+
+import numpy as np
+
+from derive import DERIVED_METRICS, TTM_METRICS, Ratio, Yoy
+from screen import load_cube
+
+# 输出目录下的图表数据目录：index.json 为报告期轴、指标单位和公司列表，<代码>.json 为各公司的图表数据
+CHART_DIR = 'charts'
+INDEX_FILE = 'index.json'
+SHEETS = ('profit_sheet', 'balance_sheet', 'cash_flow')
+
+# 金额换算为亿元并保留 4 位小数（精确到万元），百分比保留 2 位小数
+AMOUNT_UNIT = '亿元'
+AMOUNT_SCALE = 1e8
+AMOUNT_DIGITS = 4
+PERCENT_UNIT = '%'
+PERCENT_DIGITS = 2
+
+
+def percent_metrics():
+    """以百分比表示的派生指标（比率和增长率）"""
+    return {name for _, name, expr, _ in DERIVED_METRICS + TTM_METRICS if isinstance(expr, (Ratio, Yoy))}
+
+
+def chart_units(metrics):
+    percent = percent_metrics()
+    return {metric: PERCENT_UNIT if metric in percent else AMOUNT_UNIT for metric in metrics}
+
+
+def chart_values(cube, units):
+    """按单位换算并取整后的 (公司, 报告期, 指标) 数组，公司不具有的指标整列为 NaN"""
+    amount = np.array([units[metric] == AMOUNT_UNIT for metric in cube.metrics])
+    values = cube.values.copy()
+    values[..., amount] = np.round(values[..., amount] / AMOUNT_SCALE, AMOUNT_DIGITS)
+    values[..., ~amount] = np.round(values[..., ~amount], PERCENT_DIGITS)
+    if cube.present is not None:
+        values = np.where(cube.present[:, None, :], values, np.nan)
+    return values
+
+
+def encode_payload(cube, index, values):
+    """一家公司的图表数据（紧凑 JSON）：名称、有数据的报告期范围和各报表的指标序列
+
+    序列与 index.json 的报告期轴对齐，span 为第一个和最后一个有数据的报告期在轴上的位置。
+    """
+    company = values[index]
+    present = cube.present[index] if cube.present is not None else ~np.isnan(company).all(axis=0)
+    reported = np.flatnonzero(~np.isnan(company).all(axis=1))
+    payload = {
+        "name": cube.names[index],
+        "span": [int(reported[0]), int(reported[-1])] if len(reported) else None
+    }
+    payload.update({sheet: {} for sheet in SHEETS})
+    for k, values_k in enumerate(company.T.tolist()):
+        if present[k]:
+            metric = cube.metrics[k]
+            payload[cube.sheets[metric]][metric] = [None if v != v else v for v in values_k]
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_charts(output_dir, cube):
+    """写出全部公司的图表数据，删除已不在数据中的公司，index.json 最后写出"""
+    chart_dir = os.path.join(output_dir, CHART_DIR)
+    os.makedirs(chart_dir, exist_ok=True)
+    units = chart_units(cube.metrics)
+    values = chart_values(cube, units)
+    for index, code in enumerate(cube.codes):
+        with open(os.path.join(chart_dir, f"{code}.json"), 'w', encoding='utf-8') as f:
+            f.write(encode_payload(cube, index, values))
+
+    codes = set(cube.codes)
+    for name in os.listdir(chart_dir):
+        if name.endswith('.json') and name != INDEX_FILE and name[:-len('.json')] not in codes:
+            os.remove(os.path.join(chart_dir, name))
+
+    index = {
+        "years": cube.periods,
+        "units": units,
+        "companies": [{"code": code, "name": name} for code, name in zip(cube.codes, cube.names)]
+    }
+    with open(os.path.join(chart_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def update_charts(output_dir):
+    """由输出目录中的列式存储生成网页使用的图表数据"""
+    cube = load_cube(os.path.join(output_dir, 'columnar'))
+    write_charts(output_dir, cube)
+    print(f"图表数据已生成：{len(cube.codes)} 家公司，{len(cube.periods)} 个报告期")
+    return cube
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成网页直接使用的图表数据：统一的报告期轴、换算为亿元并取整的数值")
+    parser.add_argument('--output-dir', default='data', help="finance.py 的输出目录")
+    args = parser.parse_args(argv)
+    update_charts(args.output_dir)
+
+
+if __name__ == "__main__":
+    main()
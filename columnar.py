@@ -0,0 +1,144 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+
+# 列名与存储类型：category 列存为 int32 编码 + 类别表，报告期存为 datetime64[ns]，金额存为 float64
+SCHEMA = {
+    '股票代码': 'category',
+    '公司名称': 'category',
+    '报表': 'category',
+    '项目': 'category',
+    '报告期': 'datetime64[ns]',
+    '金额': 'float64'
+}
+
+_STORAGE_DTYPES = {
+    'category': np.int32,
+    'datetime64[ns]': np.int64,
+    'float64': np.float64
+}
+
+
+class ColumnarWriter:
+    """以列式二进制格式追加写入长表
+
+    每列一个原始二进制文件 <列序号>.bin，meta.json 记录行数、列类型和类别表。
+    类别编码在追加过程中保持不变，因此可以逐块写入而不需要保留全部数据。
+    各列先写为 <列序号>.bin.tmp，正常关闭时才替换旧数据；写入中途出错时旧数据保持可读。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(os.path.join(path, f"{index}.bin.tmp"), 'wb')
+                       for index, name in enumerate(SCHEMA)}
+        self._categories = {name: {} for name, kind in SCHEMA.items() if kind == 'category'}
+        self._rows = 0
+
+    def _encode(self, name, values):
+        codes, uniques = pd.factorize(values)
+        lookup = self._categories[name]
+        mapping = np.array([lookup.setdefault(value, len(lookup)) for value in uniques], dtype=np.int32)
+        return mapping[codes] if len(codes) else np.empty(0, dtype=np.int32)
+
+    def write(self, df):
+        for name, kind in SCHEMA.items():
+            if kind == 'category':
+                values = self._encode(name, df[name].to_numpy(dtype=object))
+            elif kind == 'datetime64[ns]':
+                values = pd.to_datetime(df[name]).to_numpy(dtype='datetime64[ns]').view(np.int64)
+            else:
+                values = df[name].to_numpy(dtype=np.float64)
+            self._files[name].write(np.ascontiguousarray(values, dtype=_STORAGE_DTYPES[kind]).tobytes())
+        self._rows += len(df)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        # 先删除旧的 meta.json 再替换列文件，替换中途失败时不会留下新旧混合的可读取数据
+        meta_path = os.path.join(self.path, 'meta.json')
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for f in self._files.values():
+            os.replace(f.name, f.name[:-len('.tmp')])
+        # meta.json 最后写出
+        meta = {
+            "rows": self._rows,
+            "columns": [
+                {"name": name, "type": kind, "file": f"{index}.bin",
+                 "categories": list(self._categories[name]) if kind == 'category' else None}
+                for index, (name, kind) in enumerate(SCHEMA.items())
+            ]
+        }
+        with open(meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def abort(self):
+        """放弃本次写入，删除临时文件"""
+        for f in self._files.values():
+            f.close()
+            os.remove(f.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_columnar(df, path):
+    """将长表完整写入列式存储"""
+    with ColumnarWriter(path) as writer:
+        writer.write(df)
+
+
+def read_meta(path):
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_columnar(path, columns=None, stock_codes=None, mmap=True):
+    """读取列式存储为 DataFrame
+
+    columns 指定只读取的列；stock_codes 指定只读取的公司，先在股票代码列上过滤再读取其他列；
+    mmap 为 True 时以内存映射方式打开，只有实际访问的部分会从磁盘读入。
+    类别列返回 pandas Categorical，报告期为 datetime64[ns]，金额为 float64。
+    """
+    meta = read_meta(path)
+    specs = {spec['name']: spec for spec in meta['columns']}
+    rows = meta['rows']
+
+    def raw(name):
+        spec = specs[name]
+        file_path = os.path.join(path, spec['file'])
+        dtype = _STORAGE_DTYPES[spec['type']]
+        if rows == 0:
+            return np.empty(0, dtype=dtype)
+        if mmap:
+            return np.memmap(file_path, dtype=dtype, mode='r', shape=(rows,))
+        return np.fromfile(file_path, dtype=dtype, count=rows)
+
+    mask = None
+    if stock_codes is not None:
+        categories = specs['股票代码']['categories']
+        wanted = [categories.index(code) for code in stock_codes if code in categories]
+        mask = np.isin(raw('股票代码'), wanted)
+
+    data = {}
+    for name in (columns or list(specs)):
+        spec = specs[name]
+        values = raw(name)
+        if mask is not None:
+            values = values[mask]
+        if spec['type'] == 'category':
+            data[name] = pd.Categorical.from_codes(np.asarray(values), categories=spec['categories'])
+        elif spec['type'] == 'datetime64[ns]':
+            data[name] = np.asarray(values).view('datetime64[ns]')
+        else:
+            data[name] = np.asarray(values)
+    return pd.DataFrame(data)
@@ -0,0 +1,286 @@
+import numpy as np
+
+
+class Panel:
+    """公司 × 报告期 的对齐数据面板
+
+    years[i] 为第 i 家公司从早到晚的报告期列表；series[name] 为 (公司数, 最大期数) 的矩阵，
+    每家公司的数据按自身报告期左对齐，超出该公司期数的位置为 NaN；
+    present[name] 为各公司是否具有该指标；sheets[name] 为指标所属的报表键名。
+    """
+
+    def __init__(self, codes, names, years):
+        self.codes = list(codes)
+        self.names = list(names)
+        self.years = list(years)
+        self.lengths = np.array([len(y) for y in self.years], dtype=int)
+        self.width = int(self.lengths.max()) if len(self.lengths) else 0
+        self.series = {}
+        self.present = {}
+        self.sheets = {}
+        self._months = None
+
+    def add(self, sheet, name, values, present):
+        self.series[name] = values
+        self.present[name] = present
+        self.sheets[name] = sheet
+
+    def empty(self):
+        return (np.full((len(self.codes), self.width), np.nan),
+                np.zeros(len(self.codes), dtype=bool))
+
+    def months(self):
+        """各位置报告期的月份矩阵 (公司数, 最大期数)，超出该公司期数的位置为 0"""
+        if self._months is None:
+            self._months = np.zeros((len(self.codes), self.width), dtype=int)
+            for i, years in enumerate(self.years):
+                self._months[i, :len(years)] = [int(year[5:7]) for year in years]
+        return self._months
+
+
+class Expr:
+    """派生指标表达式，evaluate 返回 (数值矩阵, 各公司是否具有该指标)"""
+
+    def __add__(self, other):
+        return Binary(np.add, self, other)
+
+    def __sub__(self, other):
+        return Binary(np.subtract, self, other)
+
+    def evaluate(self, panel):
+        raise NotImplementedError
+
+
+class Col(Expr):
+    def __init__(self, name):
+        self.name = name
+
+    def evaluate(self, panel):
+        if self.name not in panel.series:
+            return panel.empty()
+        return panel.series[self.name], panel.present[self.name]
+
+
+class Binary(Expr):
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+
+    def evaluate(self, panel):
+        a, a_present = self.left.evaluate(panel)
+        b, b_present = self.right.evaluate(panel)
+        return self.op(a, b), a_present & b_present
+
+
+class FillSum(Expr):
+    def __init__(self, *exprs):
+        self.exprs = exprs
+
+    def evaluate(self, panel):
+        results = [expr.evaluate(panel) for expr in self.exprs]
+        values = sum(np.nan_to_num(v, nan=0.0) for v, _ in results)
+        present = np.logical_and.reduce([p for _, p in results])
+        return values, present
+
+
+class FirstPresent(Expr):
+    def __init__(self, *exprs):
+        self.exprs = exprs
+
+    def evaluate(self, panel):
+        values, present = self.exprs[-1].evaluate(panel)
+        for expr in reversed(self.exprs[:-1]):
+            v, p = expr.evaluate(panel)
+            values = np.where(p[:, None], v, values)
+            present = p | present
+        return values, present
+
+
+class Ratio(Expr):
+    def __init__(self, numerator, denominator):
+        self.numerator = numerator
+        self.denominator = denominator
+
+    def evaluate(self, panel):
+        a, a_present = self.numerator.evaluate(panel)
+        b, b_present = self.denominator.evaluate(panel)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(b != 0, a / b * 100, np.nan)
+        return np.round(values, 2), a_present & b_present
+
+
+def _shift(x, periods):
+    shifted = np.full_like(x, np.nan)
+    if periods < x.shape[1]:
+        shifted[:, periods:] = x[:, :x.shape[1] - periods]
+    return shifted
+
+
+class Yoy(Expr):
+    def __init__(self, expr, abs_base=False, periods=1):
+        self.expr = expr
+        self.abs_base = abs_base
+        self.periods = periods
+
+    def evaluate(self, panel):
+        x, present = self.expr.evaluate(panel)
+        previous = _shift(x, self.periods)
+        base = np.abs(previous) if self.abs_base else previous
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(previous != 0, (x - previous) / base * 100, np.nan)
+        return np.round(values, 2), present
+
+
+class Lag(Expr):
+    def __init__(self, expr, periods):
+        self.expr = expr
+        self.periods = periods
+
+    def evaluate(self, panel):
+        x, present = self.expr.evaluate(panel)
+        return _shift(x, self.periods), present
+
+
+class SingleQuarter(Expr):
+    def __init__(self, expr):
+        self.expr = expr
+
+    def evaluate(self, panel):
+        x, present = self.expr.evaluate(panel)
+        return np.where(panel.months() == 3, x, x - _shift(x, 1)), present
+
+
+class RollingSum(Expr):
+    def __init__(self, expr, window):
+        self.expr = expr
+        self.window = window
+
+    def evaluate(self, panel):
+        x, present = self.expr.evaluate(panel)
+        return sum(_shift(x, k) for k in range(1, self.window)) + x, present
+
+
+class Average(Expr):
+    def __init__(self, *exprs):
+        self.exprs = exprs
+
+    def evaluate(self, panel):
+        results = [expr.evaluate(panel) for expr in self.exprs]
+        values = sum(v for v, _ in results) / len(results)
+        return values, np.logical_and.reduce([p for _, p in results])
+
+
+def col(name):
+    """引用基础指标或已计算的派生指标"""
+    return Col(name)
+
+
+def ratio(numerator, denominator):
+    """百分比 numerator / denominator * 100，分母为 0 或任一为空时为空，保留 2 位小数"""
+    return Ratio(numerator, denominator)
+
+
+def yoy(expr, abs_base=False, periods=1):
+    """同比增长率（相对 periods 期之前），abs_base 为 True 时以上期绝对值为分母"""
+    return Yoy(expr, abs_base, periods)
+
+
+def fill_sum(*exprs):
+    """逐项相加，空值按 0 处理；所有输入指标都存在时才有结果"""
+    return FillSum(*exprs)
+
+
+def first_present(*exprs):
+    """按公司选择第一个存在的表达式"""
+    return FirstPresent(*exprs)
+
+
+def lag(expr, periods):
+    """periods 期之前的值"""
+    return Lag(expr, periods)
+
+
+def single_quarter(expr):
+    """由年初至今的累计值得到单季度值：一季度即累计值，其余季度减去上一季度的累计值"""
+    return SingleQuarter(expr)
+
+
+def rolling_sum(expr, window):
+    """最近 window 期之和，任一期缺失时为空"""
+    return RollingSum(expr, window)
+
+
+def average(*exprs):
+    """逐项平均，任一项为空时为空"""
+    return Average(*exprs)
+
+
+# 派生指标注册表：(报表, 指标名, 表达式, 额外依赖的指标)，按顺序计算，后面的指标可引用前面的结果
+DERIVED_METRICS = []
+
+# 季报的滚动十二个月（TTM）指标，要求面板为连续的季度轴（transform.build_panel(df, aligned=True)）
+TTM_METRICS = []
+
+
+def register(sheet, name, expr, requires=(), registry=DERIVED_METRICS):
+    registry.append((sheet, name, expr, tuple(requires)))
+
+
+register('profit_sheet', '毛利润', col('营业收入') - col('营业成本'))
+register('profit_sheet', '毛利率', ratio(col('毛利润'), col('营业收入')))
+register('profit_sheet', '净利润率', ratio(col('净利润'), col('营业收入')))
+register('profit_sheet', '净利润增长率', yoy(col('净利润')))
+register('profit_sheet', '营业收入增长率', yoy(col('营业收入')))
+register('profit_sheet', '销售费用占比', ratio(col('销售费用'), col('营业收入')))
+register('profit_sheet', '管理费用占比', ratio(col('管理费用'), col('营业收入')))
+register('profit_sheet', '研发费用占比', ratio(col('研发费用'), col('营业收入')))
+register('balance_sheet', '资产负债率', ratio(col('总负债'), col('总资产')))
+register('balance_sheet', '应收账款及应收票据',
+         first_present(col('应收票据及应收账款'), fill_sum(col('应收账款'), col('应收票据'))),
+         requires=['营业收入'])
+register('balance_sheet', '应收账款及应收票据占比', ratio(col('应收账款及应收票据'), col('营业收入')))
+register('balance_sheet', '存货占营业成本比', ratio(col('存货'), col('营业成本')))
+register('balance_sheet', '应付账款及应付票据',
+         first_present(col('应付票据及应付账款'), fill_sum(col('应付账款'), col('应付票据'))),
+         requires=['营业成本'])
+register('balance_sheet', '应付账款及应付票据占比', ratio(col('应付账款及应付票据'), col('营业成本')))
+register('balance_sheet', '合同负债占比', ratio(col('合同负债'), col('营业收入')))
+register('balance_sheet', '应付账款占营业成本与存货比',
+         ratio(col('应付账款及应付票据'), col('营业成本') + col('存货')))
+register('cash_flow', '经营活动现金流量净额增长率', yoy(col('经营活动现金流量净额'), abs_base=True))
+register('cash_flow', '销售现金率', ratio(col('销售收款'), col('营业收入')))
+register('cash_flow', '经营现金收入比', ratio(col('经营活动现金流量净额'), col('营业收入')))
+register('profit_sheet', '净资产收益率', ratio(col('净利润'), col('所有者权益')))
+register('profit_sheet', '总资产收益率', ratio(col('净利润'), col('总资产')))
+
+
+# 利润表和现金流量表为累计值：先还原单季度值，再取最近 4 个季度之和
+for sheet, name in (('profit_sheet', '营业收入'), ('profit_sheet', '营业成本'), ('profit_sheet', '净利润'),
+                    ('profit_sheet', '归属母公司净利润'), ('cash_flow', '销售收款'),
+                    ('cash_flow', '经营活动现金流量净额')):
+    register(sheet, f'{name}TTM', rolling_sum(single_quarter(col(name)), 4), registry=TTM_METRICS)
+register('profit_sheet', '毛利率TTM', ratio(col('营业收入TTM') - col('营业成本TTM'), col('营业收入TTM')),
+         registry=TTM_METRICS)
+register('profit_sheet', '净利润率TTM', ratio(col('净利润TTM'), col('营业收入TTM')), registry=TTM_METRICS)
+register('profit_sheet', '营业收入TTM增长率', yoy(col('营业收入TTM'), periods=4), registry=TTM_METRICS)
+register('profit_sheet', '净利润TTM增长率', yoy(col('净利润TTM'), periods=4), registry=TTM_METRICS)
+# 收益率以期初、期末余额的平均值为分母
+register('profit_sheet', '净资产收益率TTM',
+         ratio(col('净利润TTM'), average(col('所有者权益'), lag(col('所有者权益'), 4))), registry=TTM_METRICS)
+register('profit_sheet', '总资产收益率TTM',
+         ratio(col('净利润TTM'), average(col('总资产'), lag(col('总资产'), 4))), registry=TTM_METRICS)
+register('cash_flow', '经营现金收入比TTM', ratio(col('经营活动现金流量净额TTM'), col('营业收入TTM')),
+         registry=TTM_METRICS)
+
+
+def compute_derived(panel, metrics=None):
+    """对面板中的全部公司一次性计算派生指标，结果写回面板，返回计算的指标名列表"""
+    names = []
+    for sheet, name, expr, requires in (DERIVED_METRICS if metrics is None else metrics):
+        values, present = expr.evaluate(panel)
+        for required in requires:
+            present = present & Col(required).evaluate(panel)[1]
+        panel.add(sheet, name, values, present)
+        names.append(name)
+    return names
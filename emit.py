@@ -0,0 +1,152 @@
+import os
+import json
+
+
+def encode_company(company):
+    """将单家公司数据编码为 JSON 片段，缩进与完整文件中 companies 下的层级一致"""
+    # 字符串中的换行会被转义，直接替换换行符即可增加缩进
+    return json.dumps(company, ensure_ascii=False, indent=4).replace('\n', '\n        ')
+
+
+def encode_shard(company):
+    """将单家公司数据编码为无缩进的紧凑 JSON，用于按公司分片的输出"""
+    return json.dumps(company, ensure_ascii=False, separators=(',', ':'))
+
+
+def index_entry(code, company):
+    """公司索引中的一项：代码、名称和可用的报告期"""
+    return {"code": code, "name": company["company_name"], "years": company["profit_sheet"]["years"]}
+
+
+class CsvStreamWriter:
+    """逐块追加写入 CSV，第一次写入时输出表头
+
+    先写入同目录的 .tmp 文件，正常关闭时才替换原文件；写入中途出错时原文件保持不变。
+    """
+
+    def __init__(self, path, encoding='utf-8-sig'):
+        self.path = path
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'w', encoding=encoding, newline='')
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self._file, index=False, header=self._header)
+        self._header = False
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """放弃本次写入，删除临时文件"""
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class JsonStreamWriter:
+    """逐家公司写入 {"companies": {...}} 结构的 JSON 文件
+
+    输出格式与 json.dump(..., ensure_ascii=False, indent=4) 相同，
+    内存中只保留当前写入的一家公司。与 CsvStreamWriter 相同，正常关闭时才替换原文件。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp_path = path + '.tmp'
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+        self._file.write('{\n    "companies": {')
+        self._count = 0
+
+    def write_fragment(self, code, fragment):
+        """写入 encode_company 编码后的公司片段"""
+        separator = ',\n        ' if self._count else '\n        '
+        self._file.write(f'{separator}{json.dumps(code, ensure_ascii=False)}: {fragment}')
+        self._count += 1
+
+    def write(self, code, company):
+        self.write_fragment(code, encode_company(company))
+
+    def close(self):
+        self._file.write('\n    }\n}' if self._count else '}\n}')
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """放弃本次写入，删除临时文件"""
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def write_json_fragments(path, fragments):
+    """由 (股票代码, JSON 片段) 序列写出完整的 JSON 文件"""
+    with JsonStreamWriter(path) as writer:
+        for code, fragment in fragments:
+            writer.write_fragment(code, fragment)
+
+
+class ShardWriter:
+    """按公司写出 companies/<代码>.json 分片，关闭时写出公司索引 index.json
+
+    网页只需先加载体积很小的索引，再按需加载选中公司的分片。
+    分片先写为 <代码>.json.tmp，正常关闭时才替换原分片并写出索引；写入中途出错时删除临时文件，原有分片和索引保持不变。
+    """
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.company_dir = os.path.join(output_dir, 'companies')
+        os.makedirs(self.company_dir, exist_ok=True)
+        self._entries = []
+        self._written = []
+
+    def write_fragment(self, code, entry, fragment):
+        """写入 encode_shard 编码后的公司分片及其索引项"""
+        path = os.path.join(self.company_dir, f"{code}.json")
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(fragment)
+        self._written.append(path)
+        self._entries.append(entry)
+
+    def write(self, code, company):
+        self.write_fragment(code, index_entry(code, company), encode_shard(company))
+
+    def close(self):
+        for path in self._written:
+            os.replace(path + '.tmp', path)
+        # 索引最后替换，网页不会读到指向未写完分片的索引
+        index_path = os.path.join(self.output_dir, 'index.json')
+        with open(index_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({"companies": self._entries}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(index_path + '.tmp', index_path)
+
+    def abort(self):
+        """放弃本次写入，删除已写出的临时分片"""
+        for path in self._written:
+            os.remove(path + '.tmp')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,132 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# 报表类型与 akshare 接口的对应关系
+STATEMENT_APIS = {
+    'profit_yearly': 'stock_profit_sheet_by_yearly_em',
+    'balance_yearly': 'stock_balance_sheet_by_yearly_em',
+    'cashflow_yearly': 'stock_cash_flow_sheet_by_yearly_em'
+}
+
+# 按报告期的报表接口：每季度一期，利润表和现金流量表为年初至报告期末的累计值
+QUARTERLY_STATEMENT_APIS = {
+    'profit_report': 'stock_profit_sheet_by_report_em',
+    'balance_report': 'stock_balance_sheet_by_report_em',
+    'cashflow_report': 'stock_cash_flow_sheet_by_report_em'
+}
+
+
+def to_symbol(code):
+    """股票代码转换为东方财富接口使用的带交易所前缀的代码"""
+    if code.startswith('6'):
+        return f"SH{code}"
+    return f"SZ{code}"
+
+
+def akshare_fetcher(symbol, statement):
+    """默认的数据获取函数，调用 akshare 对应的报表接口"""
+    # akshare 导入耗时较长且依赖众多，只在实际调用上游接口时导入
+    import akshare as ak
+    api = STATEMENT_APIS.get(statement) or QUARTERLY_STATEMENT_APIS[statement]
+    return getattr(ak, api)(symbol=symbol)
+
+
+class RateLimiter:
+    """令牌桶限流器，线程安全
+
+    rate 为每秒补充的令牌数，capacity 为桶容量（允许的突发请求数）。
+    """
+
+    def __init__(self, rate, capacity=1, clock=time.monotonic, sleep=time.sleep):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.capacity)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，令牌不足时阻塞等待"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+def fetch_with_retry(fetcher, symbol, statement, limiter=None, retries=3, backoff=1.0, sleep=time.sleep):
+    """带重试的单次获取，失败后按指数退避（带随机抖动）重试"""
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            return fetcher(symbol, statement)
+        except Exception:
+            if attempt >= retries:
+                raise
+            sleep(backoff * (2 ** attempt) * (1 + random.random() * 0.5))
+            attempt += 1
+
+
+def iter_statements(stock_codes, fetcher=akshare_fetcher, statements=tuple(STATEMENT_APIS),
+                    max_workers=4, rate=3.0, burst=3, retries=3, backoff=1.0):
+    """并发获取每只股票的全部报表
+
+    每只股票的所有报表获取完成后产出 (code, frames, error)：
+    成功时 frames 为 {报表类型: DataFrame}，error 为 None；
+    任一报表在重试后仍失败时 frames 为 None，error 为异常对象。
+    rate 为每秒请求上限，传入 None 时不限流。
+    """
+    # 重复的代码只获取一次（例如同时出现在代码文件和命令行参数中），避免重复请求占用限流额度
+    stock_codes = list(dict.fromkeys(stock_codes))
+    limiter = RateLimiter(rate, burst) if rate else None
+    pending = {code: len(statements) for code in stock_codes}
+    frames = {code: {} for code in stock_codes}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for code in stock_codes:
+            symbol = to_symbol(code)
+            for statement in statements:
+                future = executor.submit(fetch_with_retry, fetcher, symbol, statement,
+                                         limiter, retries, backoff)
+                futures[future] = (code, statement)
+
+        for future in as_completed(futures):
+            # 取出后即释放对 future 的引用，避免已处理的报表一直留在内存中
+            code, statement = futures.pop(future)
+            try:
+                frames[code][statement] = future.result()
+            except Exception as e:
+                errors.setdefault(code, e)
+            pending[code] -= 1
+            if pending[code] == 0:
+                if code in errors:
+                    yield code, None, errors[code]
+                else:
+                    yield code, frames[code], None
+                del frames[code]
+
+
+def fetch_statements(stock_codes, fetcher=akshare_fetcher, **kwargs):
+    """并发获取全部股票的报表，返回 (结果字典, 失败字典)"""
+    results = {}
+    failures = {}
+    for code, frames, error in iter_statements(stock_codes, fetcher=fetcher, **kwargs):
+        if error is None:
+            results[code] = frames
+        else:
+            failures[code] = error
+    return results, failures
@@ -1,584 +1,492 @@
-import pandas as pd
-import akshare as ak
-import time
-import json
 import os
-import numpy as np
-
-def check_data_quality(df, column):
-    """检查数据列的质量"""
-    if column not in df.columns:
-        return False
-    null_count = df[column].isnull().sum()
-    total_count = len(df)
-    return bool(null_count == 0)  # 转换为 Python 原生布尔值
-
-def process_financial_data(stock_codes):
-    # 创建空列表存储所有公司的数据
-    all_companies_data = []
+import time
+import argparse
+import cProfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from contextlib import ExitStack
+from functools import partial
+
+import pandas as pd
+
+from fetch import STATEMENT_APIS, QUARTERLY_STATEMENT_APIS, iter_statements, akshare_fetcher
+from cache import DEFAULT_TTL, StatementCache, iter_cached_statements, iter_local_statements
+from transform import METRICS, missing_columns, reshape_universe, build_json_data, build_quarterly_json
+from columnar import ColumnarWriter, write_columnar
+from emit import (CsvStreamWriter, JsonStreamWriter, ShardWriter, encode_company, encode_shard, index_entry,
+                  write_json_fragments)
+from incremental import IncrementalManifest, company_hash, encode_blocks, write_outputs
+from instrument import RunReport, StageTimer
+from validate import write_quality_report
+
+QUALITY_REPORT = 'quality_report.json'
+# charts.py 生成的图表数据索引，网页存在此文件时直接使用预先生成的图表数据
+CHART_INDEX = os.path.join('charts', 'index.json')
+
+# 本模块只负责流程编排和命令行：获取见 fetch、cache，转换见 transform，派生指标见 derive，输出见 emit、columnar
+
+
+def _process_chunk(universe, shards=False):
+    """处理一组公司：转换为长表、构建 JSON（含派生指标）并编码，可在子进程中执行
+
+    返回 (长表, {股票代码: JSON 片段}, {股票代码: (索引项, 分片内容)}, {股票代码: 数据质量}, 各步骤耗时 StageTimer)，
+    不输出分片时第三项为空；数据质量为 {"name": 公司名称, "flags": 问题列表}。
+    """
+    timer = StageTimer()
+    with timer('reshape'):
+        df = reshape_universe(universe)
+    with timer('sort'):
+        df = df.sort_values(['公司名称', '报表', '报告期'], ascending=[True, True, True])
+    companies = build_json_data(df, timer)["companies"]
+    with timer('encode'):
+        fragments = {code: encode_company(company) for code, company in companies.items()}
+        shard_fragments = {}
+        if shards:
+            shard_fragments = {code: (index_entry(code, company), encode_shard(company))
+                               for code, company in companies.items()}
+    quality = {code: {"name": company["company_name"], "flags": company["quality_flags"]}
+               for code, company in companies.items()}
+    return df, fragments, shard_fragments, quality, timer
+
+def _invalidate_charts(output_dir):
+    """输出文件即将改写：先删除图表数据索引，网页在图表数据重新生成之前改为由合并数据转换，不使用过期的图表"""
+    path = os.path.join(output_dir, CHART_INDEX)
+    if os.path.exists(path):
+        os.remove(path)
+
+def _check_fetched(code, frames, error, report):
+    """检查一家公司的获取结果，失败时记录原因并返回 False"""
+    if error is not None:
+        report.fail(code, 'fetch', error)
+    elif missing_columns(frames):
+        report.fail(code, 'validate', f"缺少列：{', '.join(missing_columns(frames))}")
+    else:
+        report.company(code, status='ok')
+        return True
+    print(f"处理出错：{code}（{report.failures[-1]['reason']}）")
+    return False
+
+def _iter_chunks(fetched, chunk_size, report):
+    """将获取结果按 chunk_size 家公司分组，获取失败的公司在此输出、记入运行报告并跳过"""
+    chunk = {}
+    for code, frames, error in fetched:
+        if not _check_fetched(code, frames, error, report):
+            continue
+        chunk[code] = frames
+        names = [df['SECURITY_NAME_ABBR'].iloc[0] for df in frames.values() if len(df) > 0]
+        print(f"已处理：{names[0] if names else code}")
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = {}
+    if chunk:
+        yield chunk
+
+def _iter_results(chunks, workers, shards=False):
+    """依次产出各组的处理结果；多进程时最多同时提交 2 × workers 组，避免结果堆积占用内存"""
+    process = partial(_process_chunk, shards=shards)
+    if workers <= 1:
+        for chunk in chunks:
+            yield process(chunk)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for chunk in chunks:
+            pending.add(executor.submit(process, chunk))
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+def _record_chunks(results, report):
+    """将各组的步骤耗时、行数和有数据问题的公司数记入运行报告，产出 (长表, JSON 片段, 分片, 数据质量)"""
+    for df, fragments, shard_fragments, quality, timer in results:
+        report.add_timer(timer)
+        report.count('rows.long', len(df))
+        report.count('companies.processed', len(fragments))
+        report.count('companies.flagged', sum(1 for company in quality.values() if company["flags"]))
+        report.chunks.append({"companies": len(fragments), "rows": len(df),
+                              "seconds": {name: round(seconds, 4) for name, seconds in timer.seconds.items()}})
+        yield df, fragments, shard_fragments, quality
+
+def fetch_universe(stock_codes, statements, fetcher, cache, report, **fetch_kwargs):
+    """并发获取报表，由令牌桶限流代替固定的间隔等待；传入缓存时只获取缺失或过期的股票
+
+    上游调用的延迟和等待获取结果的时间记入运行报告。
+    """
+    fetch_kwargs.update(fetcher=report.timed_fetcher(fetcher), statements=statements)
+    if cache is not None:
+        fetched = iter_cached_statements(stock_codes, cache, **fetch_kwargs)
+    else:
+        fetched = iter_statements(stock_codes, **fetch_kwargs)
+    return report.timed_iter(fetched, 'fetch')
+
+def process_financial_data(stock_codes, fetcher=akshare_fetcher, max_workers=4, rate=3.0, burst=3,
+                           retries=3, backoff=1.0, cache=None, workers=1, chunk_size=200,
+                           output_dir='data', stream=False, shards=False, report=None, pit=None):
+    """获取报表并生成合并的 CSV、JSON 文件和列式存储（columnar.load_columnar 读取）
+
+    stream 为 True 时每组公司处理完成后立即追加写入输出文件，内存占用与公司总数无关；
+    此时公司按处理完成的顺序输出（各公司内部仍按报表类型和报告期排序），函数返回 None。
+    shards 为 True 时另外输出公司索引 index.json 和每家公司一个的紧凑 JSON 分片，供网页按需加载。
+    report 为 instrument.RunReport 时记录各阶段耗时、上游调用延迟、行数和失败原因。
+    pit 为 pointintime.PointInTimeStore 时同时记录本次数据的版本，见 build_outputs。
+    """
+    if report is None:
+        report = RunReport()
+    fetched = fetch_universe(stock_codes, tuple(STATEMENT_APIS), fetcher, cache, report, max_workers=max_workers,
+                             rate=rate, burst=burst, retries=retries, backoff=backoff)
+    return build_outputs(fetched, workers, chunk_size, output_dir, stream, shards, report, pit)
+
+def build_outputs(fetched, workers=1, chunk_size=200, output_dir='data', stream=False, shards=False, report=None,
+                  pit=None):
+    """由 (股票代码, 报表, 错误) 序列生成合并的 CSV、JSON 文件、列式存储和分片，参数含义见 process_financial_data
+
+    fetched 可以来自上游接口（fetch_universe）或本地缓存（cache.iter_local_statements）。
+    pit 为 pointintime.PointInTimeStore 时，同时将本次的长表写入按时点查询的版本库（只记录变化的单元格）。
+    """
+    if report is None:
+        report = RunReport()
+    # 按股票代码分组，转换和派生指标计算在多个进程中与数据获取同时进行
+    results = _iter_results(_iter_chunks(fetched, chunk_size, report), workers, shards)
+    results = _record_chunks(results, report)
+    merged_csv_path = os.path.join(output_dir, 'merged_financial_data.csv')
+    merged_json_path = os.path.join(output_dir, 'merged_financial_data.json')
+    columnar_path = os.path.join(output_dir, 'columnar')
+    quality_path = os.path.join(output_dir, QUALITY_REPORT)
     
-    for code in stock_codes:
-        if code.startswith('6'):
-            symbol = f"SH{code}"
-        else:
-            symbol = f"SZ{code}"
-            
-        try:
-            # 获取财务数据
-            profit_yearly = ak.stock_profit_sheet_by_yearly_em(symbol=symbol)
-            balance_yearly = ak.stock_balance_sheet_by_yearly_em(symbol=symbol)
-            cashflow_yearly = ak.stock_cash_flow_sheet_by_yearly_em(symbol=symbol)
-            
-            # 定义要提取的指标及其中文名称
-            metrics = {
-                'profit_yearly': {
-                    'TOTAL_OPERATE_INCOME': '营业收入',
-                    'TOTAL_OPERATE_COST': '营业成本',
-                    'OPERATE_COST': '主营业务成本',
-                    'RESEARCH_EXPENSE': '研发费用',
-                    'OPERATE_TAX_ADD': '附加税',
-                    'SALE_EXPENSE': '销售费用',
-                    'MANAGE_EXPENSE': '管理费用',
-                    'FINANCE_EXPENSE': '财务费用',
-                    'FAIRVALUE_CHANGE_INCOME': '公允价值变动损益',
-                    'INVEST_INCOME': '投资收益',
-                    'ASSET_IMPAIRMENT_INCOME': '资产减值损益',
-                    'CREDIT_IMPAIRMENT_INCOME': '信用减值损益',
-                    'OTHER_INCOME': '其他收入',
-                    'OPERATE_PROFIT': '营业利润',
-                    'NONBUSINESS_INCOME': '营业外收入',
-                    'NONBUSINESS_EXPENSE': '营业外支出',
-                    'TOTAL_PROFIT': '税前利润',
-                    'INCOME_TAX': '所得税',
-                    'NETPROFIT': '净利润',
-                    'CONTINUED_NETPROFIT': '经常性净利润',
-                    'PARENT_NETPROFIT': '归属母公司净利润',
-                    'MINORITY_INTEREST': '少数股东损益'
-                },
-                'balance_yearly': {
-                    'NOTE_ACCOUNTS_RECE': '应收票据及应收账款',
-                    'ACCOUNTS_RECE': '应收账款',
-                    'NOTE_RECE': '应收票据',
-                    'PREPAYMENT': '预付账款',
-                    'INVENTORY': '存货',
-                    'TOTAL_OTHER_RECE': '其他应收款',
-                    'TOTAL_CURRENT_ASSETS': '流动资产',
-                    'FIXED_ASSET': '固定资产',
-                    'INTANGIBLE_ASSET': '无形资产',
-                    'LONG_PREPAID_EXPENSE': '长期待摊费用',
-                    'TOTAL_ASSETS': '总资产',                    
-                    'SHORT_LOAN': '短期借款',
-                    'NOTE_ACCOUNTS_PAYABLE': '应付票据及应付账款',
-                    'ACCOUNTS_PAYABLE': '应付账款',
-                    'NOTE_PAYABLE': '应付票据',
-                    'STAFF_SALARY_PAYABLE': '应付职工薪酬',
-                    'TAX_PAYABLE': '应付税费',
-                    'CONTRACT_LIAB': '合同负债',
-                    'ADVANCE_RECEIVABLES': '预收账款',
-                    'TOTAL_OTHER_PAYABLE': '其他应付款',
-                    'TOTAL_CURRENT_LIAB': '流动负债',
-                    'LEASE_LIAB': '租赁负债',
-                    'LONG_LOAN': '长期借款',
-                    'LONG_PAYABLE': '长期应付款',
-                    'TOTAL_LIABILITIES': '总负债',
-                    'SHARE_CAPITAL': '实收资本',
-                    'MINORITY_EQUITY': '少数股东权益',
-                    'TOTAL_EQUITY': '所有者权益'
-                },
-                'cashflow_yearly': {
-                    'SALES_SERVICES': '销售收款',
-                    'RECEIVE_OTHER_OPERATE': '其他经营性流入',
-                    'TOTAL_OPERATE_INFLOW': '经营活动现金流入总额',
-                    'BUY_SERVICES': '采购支出',
-                    'PAY_STAFF_CASH': '人工支出',
-                    'PAY_ALL_TAX': '税费支出',
-                    'PAY_OTHER_OPERATE': '其他经营性流出',
-                    'TOTAL_OPERATE_OUTFLOW': '经营活动现金流出总额',
-                    'NETCASH_OPERATE': '经营活动现金流量净额',
-                    'CONSTRUCT_LONG_ASSET': '固定资产支出',
-                    'INVEST_PAY_CASH': '投资支出',
-                    'TOTAL_INVEST_OUTFLOW': '投资活动现金流出总额',
-                    'ACCEPT_INVEST_CASH': '吸收投资流入',
-                    'NETCASH_INVEST': '投资活动现金流量净额',
-                    'RECEIVE_LOAN_CASH': '借款流入',
-                    'TOTAL_FINANCE_INFLOW': '筹资活动现金流入总额',
-                    'PAY_DEBT_CASH': '还款流出',
-                    'ASSIGN_DIVIDEND_PORFIT': '分红支出',
-                    'TOTAL_FINANCE_OUTFLOW': '筹资活动现金流出总额',
-                    'NETCASH_FINANCE': '筹资活动现金流量净额',
-                    'CCE_ADD': '现金增加',
-                    'END_CCE': '期末现金',
-                    'INVENTORY_REDUCE': '存货余额减少',
-                    'OPERATE_RECE_REDUCE': '应收余额减少',
-                    'OPERATE_PAYABLE_ADD': '应付余额增加'
-                }
-            }
-            
-            # 处理利润表数据
-            for _, row in profit_yearly.iterrows():
-                company_name = row['SECURITY_NAME_ABBR']
-                report_date = row['REPORT_DATE']
-                for en_name, cn_name in metrics['profit_yearly'].items():
-                    if pd.notna(row[en_name]):  # 只添加非空值
-                        all_companies_data.append({
-                            '股票代码': code,
-                            '公司名称': company_name,
-                            '报表': 'profit_yearly',
-                            '项目': cn_name,
-                            '报告期': report_date,
-                            '金额': row[en_name]
-                        })
-            
-            # 处理资产负债表数据
-            for _, row in balance_yearly.iterrows():
-                company_name = row['SECURITY_NAME_ABBR']
-                report_date = row['REPORT_DATE']
-                
-                # 特殊处理合同负债和预收账款的合并
-                contract_liab = row['CONTRACT_LIAB'] if pd.notna(row['CONTRACT_LIAB']) else 0
-                advance_rec = row['ADVANCE_RECEIVABLES'] if pd.notna(row['ADVANCE_RECEIVABLES']) else 0
-                combined_value = contract_liab + advance_rec
-                
-                # 如果合并后的值不为0，添加到数据中
-                if combined_value != 0:
-                    all_companies_data.append({
-                        '股票代码': code,
-                        '公司名称': company_name,
-                        '报表': 'balance_yearly',
-                        '项目': '合同负债',
-                        '报告期': report_date,
-                        '金额': combined_value
-                    })
-                
-                # 处理其他资产负债表项目
-                for en_name, cn_name in metrics['balance_yearly'].items():
-                    # 跳过合同负债和预收账款的单独处理
-                    if en_name in ['CONTRACT_LIAB', 'ADVANCE_RECEIVABLES']:
-                        continue
-                    if pd.notna(row[en_name]):  # 只添加非空值
-                        all_companies_data.append({
-                            '股票代码': code,
-                            '公司名称': company_name,
-                            '报表': 'balance_yearly',
-                            '项目': cn_name,
-                            '报告期': report_date,
-                            '金额': row[en_name]
-                        })
-            
-            # 处理现金流量表数据
-            for _, row in cashflow_yearly.iterrows():
-                company_name = row['SECURITY_NAME_ABBR']
-                report_date = row['REPORT_DATE']
-                for en_name, cn_name in metrics['cashflow_yearly'].items():
-                    if pd.notna(row[en_name]):  # 只添加非空值
-                        all_companies_data.append({
-                            '股票代码': code,
-                            '公司名称': company_name,
-                            '报表': 'cashflow_yearly',
-                            '项目': cn_name,
-                            '报告期': report_date,
-                            '金额': row[en_name]
-                        })
-            
-            print(f"已处理：{company_name}")
-            
-        except Exception as e:
-            print(f"处理出错：{code}")
-        
-        time.sleep(2)
+    if stream:
+        # 流式输出：不保留全局的长表和 JSON 结构
+        _invalidate_charts(output_dir)
+        with ExitStack() as stack:
+            csv_writer = stack.enter_context(CsvStreamWriter(merged_csv_path))
+            json_writer = stack.enter_context(JsonStreamWriter(merged_json_path))
+            columnar_writer = stack.enter_context(ColumnarWriter(columnar_path))
+            shard_writer = stack.enter_context(ShardWriter(output_dir)) if shards else None
+            quality = {}
+            if pit is not None:
+                # 各组写入同一次 ingest，全部组写完后一起提交，as_of 不会得到只更新了部分公司的数据
+                pit.begin()
+            for chunk_df, fragments, shard_fragments, chunk_quality in results:
+                quality.update(chunk_quality)
+                with report.stage('write_csv'):
+                    csv_writer.write(chunk_df)
+                with report.stage('write_columnar'):
+                    columnar_writer.write(chunk_df)
+                with report.stage('write_json'):
+                    for code, fragment in fragments.items():
+                        json_writer.write_fragment(code, fragment)
+                with report.stage('write_shards'):
+                    for code, (entry, fragment) in shard_fragments.items():
+                        shard_writer.write_fragment(code, entry, fragment)
+                if pit is not None:
+                    with report.stage('write_pit'):
+                        pit.add(chunk_df)
+            if pit is not None:
+                pit.commit()
+        with report.stage('write_quality'):
+            write_quality_report(quality_path, quality)
+        print(f"\n数据文件已生成完成")
+        return None
     
-    # 将所有公司数据转换为DataFrame
-    df = pd.DataFrame(all_companies_data)
+    results = list(results)
+    if not results:
+        print("没有获取到任何数据")
+        return pd.DataFrame()
     
-    # 按公司名称、报表类型和报告期排序（报告期改为升序）
-    df = df.sort_values(['公司名称', '报表', '报告期'], ascending=[True, True, True])
+    # 合并各组结果，按公司名称、报表类型和报告期排序（报告期改为升序）
+    with report.stage('merge'):
+        df = pd.concat([chunk_df for chunk_df, _, _, _ in results], ignore_index=True)
+        df = df.sort_values(['公司名称', '报表', '报告期'], ascending=[True, True, True])
+        fragments = {}
+        shard_fragments = {}
+        quality = {}
+        for _, chunk_fragments, chunk_shards, chunk_quality in results:
+            fragments.update(chunk_fragments)
+            shard_fragments.update(chunk_shards)
+            quality.update(chunk_quality)
+        codes = df['股票代码'].unique()
+    _invalidate_charts(output_dir)
     
     # 保存合并后的CSV文件
-    merged_csv_path = 'data/merged_financial_data.csv'
-    df.to_csv(merged_csv_path, index=False, encoding='utf-8-sig')
+    with report.stage('write_csv'):
+        df.to_csv(merged_csv_path, index=False, encoding='utf-8-sig')
     
-    # 生成用于网页图表的JSON数据
-    json_data = {
-        "companies": {}
-    }
+    # 保存列式存储，供后续分析按列、按公司读取
+    with report.stage('write_columnar'):
+        write_columnar(df, columnar_path)
+    
+    # 保存用于网页图表的JSON文件，公司顺序与排序后的CSV一致
+    with report.stage('write_json'):
+        write_json_fragments(merged_json_path, ((code, fragments[code]) for code in codes))
+    
+    # 保存公司索引和按公司的分片
+    if shards:
+        with report.stage('write_shards'), ShardWriter(output_dir) as shard_writer:
+            for code in codes:
+                shard_writer.write_fragment(code, *shard_fragments[code])
     
-    # 按公司分组处理数据
-    for company_code in df['股票代码'].unique():
-        company_df = df[df['股票代码'] == company_code]
-        company_name = company_df['公司名称'].iloc[0]
-        
-        json_data["companies"][company_code] = {
-            "company_name": company_name,
-            "stock_code": company_code,
-            "profit_sheet": {
-                "years": [],
-                "metrics": {}
-            },
-            "balance_sheet": {
-                "years": [],
-                "metrics": {}
-            },
-            "cash_flow": {
-                "years": [],
-                "metrics": {}
-            }
-        }
-        
-        # 获取该公司所有报告期并按时间顺序排序（从早到晚）
-        report_dates = sorted(company_df['报告期'].unique())
-        years = [str(date).split()[0] for date in report_dates]
-        
-        # 为所有报表类型设置相同的年份数据
-        json_data["companies"][company_code]["profit_sheet"]["years"] = years
-        json_data["companies"][company_code]["balance_sheet"]["years"] = years
-        json_data["companies"][company_code]["cash_flow"]["years"] = years
-        
-        # 处理每种报表类型的数据
-        report_type_map = {
-            'profit_yearly': 'profit_sheet',
-            'balance_yearly': 'balance_sheet',
-            'cashflow_yearly': 'cash_flow'
-        }
-        
-        for report_type, json_key in report_type_map.items():
-            report_df = company_df[company_df['报表'] == report_type]
-            
-            # 处理每个指标的数据
-            for metric in report_df['项目'].unique():
-                metric_data = []
-                for date in report_dates:  # 使用按时间顺序排序的日期
-                    value = report_df[(report_df['项目'] == metric) & 
-                           (report_df['报告期'] == date)]['金额'].values
-                    if len(value) > 0:
-                        metric_data.append(float(value[0]))
-                    else:
-                        metric_data.append(None)
-                
-                json_data["companies"][company_code][json_key]["metrics"][metric] = metric_data
-        
-        # 计算毛利润和毛利率
-        if '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '营业成本' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            cost = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业成本']
-            gross_profit = []
-            gross_margin = []
-            for i in range(len(revenue)):
-                if revenue[i] is not None and cost[i] is not None:
-                    profit = revenue[i] - cost[i]
-                    gross_profit.append(profit)
-                    if revenue[i] != 0:
-                        margin = (profit / revenue[i]) * 100
-                        gross_margin.append(round(margin, 2))
-                    else:
-                        gross_margin.append(None)
-                else:
-                    gross_profit.append(None)
-                    gross_margin.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['毛利润'] = gross_profit
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['毛利率'] = gross_margin
-        
-        # 计算净利润率
-        if '净利润' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            net_profit = json_data["companies"][company_code]["profit_sheet"]["metrics"]['净利润']
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            net_margin = []
-            for i in range(len(net_profit)):
-                if net_profit[i] is not None and revenue[i] is not None and revenue[i] != 0:
-                    margin = (net_profit[i] / revenue[i]) * 100
-                    net_margin.append(round(margin, 2))
-                else:
-                    net_margin.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['净利润率'] = net_margin
-        
-        # 计算净利润增长率
-        if '净利润' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            net_profit = json_data["companies"][company_code]["profit_sheet"]["metrics"]['净利润']
-            growth_rates = []
-            for i in range(len(net_profit)):
-                if i > 0 and net_profit[i] is not None and net_profit[i-1] is not None and net_profit[i-1] != 0:
-                    growth_rate = (net_profit[i] - net_profit[i-1]) / net_profit[i-1] * 100
-                    growth_rates.append(round(growth_rate, 2))
-                else:
-                    growth_rates.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['净利润增长率'] = growth_rates
-        
-        # 计算营业收入增长率
-        if '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            revenue_growth_rates = []
-            for i in range(len(revenue)):
-                if i > 0 and revenue[i] is not None and revenue[i-1] is not None and revenue[i-1] != 0:
-                    growth_rate = (revenue[i] - revenue[i-1]) / revenue[i-1] * 100
-                    revenue_growth_rates.append(round(growth_rate, 2))
-                else:
-                    revenue_growth_rates.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入增长率'] = revenue_growth_rates
-        
-        # 计算销售费用占营业收入比例
-        if '销售费用' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            sales_expense = json_data["companies"][company_code]["profit_sheet"]["metrics"]['销售费用']
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            sales_expense_ratio = []
-            for i in range(len(sales_expense)):
-                if sales_expense[i] is not None and revenue[i] is not None and revenue[i] != 0:
-                    ratio = (sales_expense[i] / revenue[i]) * 100
-                    sales_expense_ratio.append(round(ratio, 2))
-                else:
-                    sales_expense_ratio.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['销售费用占比'] = sales_expense_ratio
-        
-        # 计算管理费用占营业收入比例
-        if '管理费用' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            admin_expense = json_data["companies"][company_code]["profit_sheet"]["metrics"]['管理费用']
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            admin_expense_ratio = []
-            for i in range(len(admin_expense)):
-                if admin_expense[i] is not None and revenue[i] is not None and revenue[i] != 0:
-                    ratio = (admin_expense[i] / revenue[i]) * 100
-                    admin_expense_ratio.append(round(ratio, 2))
-                else:
-                    admin_expense_ratio.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['管理费用占比'] = admin_expense_ratio
-        
-        # 计算研发费用占营业收入比例
-        if '研发费用' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            rd_expense = json_data["companies"][company_code]["profit_sheet"]["metrics"]['研发费用']
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            rd_expense_ratio = []
-            for i in range(len(rd_expense)):
-                if rd_expense[i] is not None and revenue[i] is not None and revenue[i] != 0:
-                    ratio = (rd_expense[i] / revenue[i]) * 100
-                    rd_expense_ratio.append(round(ratio, 2))
-                else:
-                    rd_expense_ratio.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['研发费用占比'] = rd_expense_ratio
-        
-        # 计算资产负债率
-        if '总资产' in json_data["companies"][company_code]["balance_sheet"]["metrics"] and \
-           '总负债' in json_data["companies"][company_code]["balance_sheet"]["metrics"]:
-            total_assets = json_data["companies"][company_code]["balance_sheet"]["metrics"]['总资产']
-            total_liabilities = json_data["companies"][company_code]["balance_sheet"]["metrics"]['总负债']
-            debt_to_assets_ratio = []
-            for i in range(len(total_assets)):
-                if total_assets[i] is not None and total_liabilities[i] is not None and total_assets[i] != 0:
-                    ratio = (total_liabilities[i] / total_assets[i]) * 100
-                    debt_to_assets_ratio.append(round(ratio, 2))
-                else:
-                    debt_to_assets_ratio.append(None)
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['资产负债率'] = debt_to_assets_ratio
-        
-        # 计算应收账款及应收票据占营业收入比例
-        if ('应收票据及应收账款' in json_data["companies"][company_code]["balance_sheet"]["metrics"] or \
-            ('应收账款' in json_data["companies"][company_code]["balance_sheet"]["metrics"] and \
-             '应收票据' in json_data["companies"][company_code]["balance_sheet"]["metrics"])) and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            
-            # 获取应收账款及应收票据总额
-            if '应收票据及应收账款' in json_data["companies"][company_code]["balance_sheet"]["metrics"]:
-                accounts_receivable = json_data["companies"][company_code]["balance_sheet"]["metrics"]['应收票据及应收账款']
-            else:
-                accounts = json_data["companies"][company_code]["balance_sheet"]["metrics"]['应收账款']
-                notes = json_data["companies"][company_code]["balance_sheet"]["metrics"]['应收票据']
-                accounts_receivable = []
-                for i in range(len(accounts)):
-                    acc = accounts[i] if accounts[i] is not None else 0
-                    note = notes[i] if i < len(notes) and notes[i] is not None else 0
-                    accounts_receivable.append(acc + note)
-            
-            # 如果没有应收账款及应收票据数据，则跳过计算
-            if len(accounts_receivable) == 0:
-                continue
-                
-            # 计算应收账款及应收票据占营业收入比例
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            receivables_ratio = []
-            for i in range(len(accounts_receivable)):
-                if i < len(revenue) and accounts_receivable[i] is not None and revenue[i] is not None and revenue[i] != 0:
-                    ratio = (accounts_receivable[i] / revenue[i]) * 100
-                    receivables_ratio.append(round(ratio, 2))
-                else:
-                    receivables_ratio.append(None)
-            
-            # 保存计算结果
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['应收账款及应收票据'] = accounts_receivable
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['应收账款及应收票据占比'] = receivables_ratio
-        
-        # 计算存货占营业成本比例
-        if '存货' in json_data["companies"][company_code]["balance_sheet"]["metrics"] and \
-           '营业成本' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            inventory = json_data["companies"][company_code]["balance_sheet"]["metrics"]['存货']
-            cost = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业成本']
-            inventory_ratio = []
-            for i in range(len(inventory)):
-                if i < len(cost) and inventory[i] is not None and cost[i] is not None and cost[i] != 0:
-                    ratio = (inventory[i] / cost[i]) * 100
-                    inventory_ratio.append(round(ratio, 2))
-                else:
-                    inventory_ratio.append(None)
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['存货占营业成本比'] = inventory_ratio
-        
-        # 计算应付账款及应付票据占营业成本比例
-        if ('应付票据及应付账款' in json_data["companies"][company_code]["balance_sheet"]["metrics"] or \
-            ('应付账款' in json_data["companies"][company_code]["balance_sheet"]["metrics"] and \
-             '应付票据' in json_data["companies"][company_code]["balance_sheet"]["metrics"])) and \
-           '营业成本' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            
-            # 获取应付账款及应付票据总额
-            if '应付票据及应付账款' in json_data["companies"][company_code]["balance_sheet"]["metrics"]:
-                accounts_payable = json_data["companies"][company_code]["balance_sheet"]["metrics"]['应付票据及应付账款']
-            else:
-                accounts = json_data["companies"][company_code]["balance_sheet"]["metrics"]['应付账款']
-                notes = json_data["companies"][company_code]["balance_sheet"]["metrics"]['应付票据']
-                accounts_payable = []
-                for i in range(len(accounts)):
-                    acc = accounts[i] if accounts[i] is not None else 0
-                    note = notes[i] if i < len(notes) and notes[i] is not None else 0
-                    accounts_payable.append(acc + note)
-            
-            # 如果没有应付账款及应付票据数据，则跳过计算
-            if len(accounts_payable) == 0:
-                continue
-                
-            # 计算应付账款及应付票据占营业成本比例
-            cost = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业成本']
-            payables_ratio = []
-            for i in range(len(accounts_payable)):
-                if i < len(cost) and accounts_payable[i] is not None and cost[i] is not None and cost[i] != 0:
-                    ratio = (accounts_payable[i] / cost[i]) * 100
-                    payables_ratio.append(round(ratio, 2))
-                else:
-                    payables_ratio.append(None)
-            
-            # 保存计算结果
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['应付账款及应付票据'] = accounts_payable
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['应付账款及应付票据占比'] = payables_ratio
-        
-        # 计算并添加合同负债占营业收入的比例
-        if '合同负债' in json_data["companies"][company_code]["balance_sheet"]["metrics"] and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            liabilities = json_data["companies"][company_code]["balance_sheet"]["metrics"]['合同负债']
-            income = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            liability_ratios = []
-            for i in range(len(liabilities)):
-                if liabilities[i] is not None and income[i] is not None and income[i] != 0:
-                    ratio = (liabilities[i] / income[i] * 100)
-                    liability_ratios.append(round(ratio, 2))
-                else:
-                    liability_ratios.append(None)
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['合同负债占比'] = liability_ratios
-        
-        # 计算应付账款及应付票据占(营业成本+存货)比
-        if '应付账款及应付票据' in json_data["companies"][company_code]["balance_sheet"]["metrics"] and \
-           '营业成本' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '存货' in json_data["companies"][company_code]["balance_sheet"]["metrics"]:
-            
-            payables = json_data["companies"][company_code]["balance_sheet"]["metrics"]['应付账款及应付票据']
-            cost = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业成本']
-            inventory = json_data["companies"][company_code]["balance_sheet"]["metrics"]['存货']
-            
-            payables_to_cost_inventory_ratio = []
-            for i in range(len(payables)):
-                if payables[i] is not None and cost[i] is not None and inventory[i] is not None:
-                    denominator = cost[i] + inventory[i]
-                    if denominator != 0:
-                        ratio = (payables[i] / denominator) * 100
-                        payables_to_cost_inventory_ratio.append(round(ratio, 2))
-                    else:
-                        payables_to_cost_inventory_ratio.append(None)
-                else:
-                    payables_to_cost_inventory_ratio.append(None)
-            
-            json_data["companies"][company_code]["balance_sheet"]["metrics"]['应付账款占营业成本与存货比'] = payables_to_cost_inventory_ratio
-        
-        # 计算经营活动现金流量净额增长率
-        if '经营活动现金流量净额' in json_data["companies"][company_code]["cash_flow"]["metrics"]:
-            operating_cash_flow = json_data["companies"][company_code]["cash_flow"]["metrics"]['经营活动现金流量净额']
-            growth_rates = []
-            for i in range(len(operating_cash_flow)):
-                if i > 0 and operating_cash_flow[i] is not None and operating_cash_flow[i-1] is not None and operating_cash_flow[i-1] != 0:
-                    growth_rate = (operating_cash_flow[i] - operating_cash_flow[i-1]) / abs(operating_cash_flow[i-1]) * 100
-                    growth_rates.append(round(growth_rate, 2))
-                else:
-                    growth_rates.append(None)
-            json_data["companies"][company_code]["cash_flow"]["metrics"]['经营活动现金流量净额增长率'] = growth_rates
-
-        # 计算销售现金率（销售收款/营业收入）
-        if '销售收款' in json_data["companies"][company_code]["cash_flow"]["metrics"] and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            sales_cash = json_data["companies"][company_code]["cash_flow"]["metrics"]['销售收款']
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            sales_cash_ratio = []
-            for i in range(len(sales_cash)):
-                if sales_cash[i] is not None and revenue[i] is not None and revenue[i] != 0:
-                    ratio = (sales_cash[i] / revenue[i]) * 100
-                    sales_cash_ratio.append(round(ratio, 2))
-                else:
-                    sales_cash_ratio.append(None)
-            json_data["companies"][company_code]["cash_flow"]["metrics"]['销售现金率'] = sales_cash_ratio
-
-        # 计算经营现金收入比（经营活动现金流量净额/营业收入）
-        if '经营活动现金流量净额' in json_data["companies"][company_code]["cash_flow"]["metrics"] and \
-           '营业收入' in json_data["companies"][company_code]["profit_sheet"]["metrics"]:
-            operating_cash_flow = json_data["companies"][company_code]["cash_flow"]["metrics"]['经营活动现金流量净额']
-            revenue = json_data["companies"][company_code]["profit_sheet"]["metrics"]['营业收入']
-            operating_cash_ratio = []
-            for i in range(len(operating_cash_flow)):
-                if operating_cash_flow[i] is not None and revenue[i] is not None and revenue[i] != 0:
-                    ratio = (operating_cash_flow[i] / revenue[i]) * 100
-                    operating_cash_ratio.append(round(ratio, 2))
-                else:
-                    operating_cash_ratio.append(None)
-            json_data["companies"][company_code]["cash_flow"]["metrics"]['经营现金收入比'] = operating_cash_ratio
-
-        # 计算净资产收益率（ROE）
-        if '净利润' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '所有者权益' in json_data["companies"][company_code]["balance_sheet"]["metrics"]:
-            net_profit = json_data["companies"][company_code]["profit_sheet"]["metrics"]['净利润']
-            equity = json_data["companies"][company_code]["balance_sheet"]["metrics"]['所有者权益']
-            roe = []
-            for i in range(len(net_profit)):
-                if net_profit[i] is not None and equity[i] is not None and equity[i] != 0:
-                    ratio = (net_profit[i] / equity[i]) * 100
-                    roe.append(round(ratio, 2))
-                else:
-                    roe.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['净资产收益率'] = roe
-
-        # 计算总资产收益率（ROA）
-        if '净利润' in json_data["companies"][company_code]["profit_sheet"]["metrics"] and \
-           '总资产' in json_data["companies"][company_code]["balance_sheet"]["metrics"]:
-            net_profit = json_data["companies"][company_code]["profit_sheet"]["metrics"]['净利润']
-            total_assets = json_data["companies"][company_code]["balance_sheet"]["metrics"]['总资产']
-            roa = []
-            for i in range(len(net_profit)):
-                if net_profit[i] is not None and total_assets[i] is not None and total_assets[i] != 0:
-                    ratio = (net_profit[i] / total_assets[i]) * 100
-                    roa.append(round(ratio, 2))
-                else:
-                    roa.append(None)
-            json_data["companies"][company_code]["profit_sheet"]["metrics"]['总资产收益率'] = roa
-
-    # 保存JSON文件
-    merged_json_path = 'data/merged_financial_data.json'
-    with open(merged_json_path, 'w', encoding='utf-8') as f:
-        json.dump(json_data, f, ensure_ascii=False, indent=4)
+    # 记录本次数据的版本，供按时点查询
+    if pit is not None:
+        with report.stage('write_pit'):
+            pit.ingest(df)
+    
+    # 保存数据质量报告，公司顺序与 JSON 文件一致
+    with report.stage('write_quality'):
+        summary = write_quality_report(quality_path, {code: quality[code] for code in codes})
+    print(f"数据质量：{summary['flagged']}/{summary['companies']} 家公司存在问题，详见 {QUALITY_REPORT}")
     
     print(f"\n数据文件已生成完成")
     
     return df  # 返回DataFrame以便进行后续分析
 
-if __name__ == "__main__":
-    # 确保data目录存在
-    if not os.path.exists('data'):
-        os.makedirs('data')
-        
-    stock_codes = ['688596', '603690']  # 正帆科技在前，至纯科技在后
-    process_financial_data(stock_codes)
+def update_financial_data(stock_codes, fetcher=akshare_fetcher, max_workers=4, rate=3.0, burst=3,
+                          retries=3, backoff=1.0, cache=None, output_dir='data', shards=False, report=None,
+                          pit=None):
+    """增量更新输出文件：只重新计算原始报表发生变化的公司，其余公司沿用上次输出中的数据块
+
+    每家公司原始报表的内容指纹记录在 output_dir/incremental.json 中。指纹不变的公司不做转换和派生计算，
+    其在合并 CSV、JSON 和列式存储中的数据块按字节原样复制；分片只改写变化的公司。
+    不在 stock_codes 中的公司从输出中删除；本次获取失败的公司保留上次的结果。
+    输出内容与 process_financial_data 的全量运行相同。返回本次更新的统计信息。
+    """
+    if report is None:
+        report = RunReport()
+    fetched = fetch_universe(stock_codes, tuple(STATEMENT_APIS), fetcher, cache, report, max_workers=max_workers,
+                             rate=rate, burst=burst, retries=retries, backoff=backoff)
+    return update_outputs(fetched, stock_codes, output_dir, shards, report, pit)
+
+def update_outputs(fetched, stock_codes, output_dir='data', shards=False, report=None, pit=None):
+    """由 (股票代码, 报表, 错误) 序列增量更新输出文件，参数含义见 update_financial_data
+
+    pit 为 pointintime.PointInTimeStore 时，将变化公司的长表写入版本库；删除的公司在版本库中保留最后的数据。
+    清单失效（不存在或输出已被全量运行等改写）时没有可沿用的数据块，fetched 必须包含 stock_codes 中的全部公司，
+    否则抛出 ValueError 且不改写任何输出。
+    """
+    if report is None:
+        report = RunReport()
+    start = time.perf_counter()
+    manifest = IncrementalManifest(output_dir, shards=shards)
+
+    # 计算内容指纹，找出变化的公司
+    columns = {statement: (['SECURITY_NAME_ABBR', 'REPORT_DATE'], list(METRICS[statement]))
+               for statement in STATEMENT_APIS}
+    universe = {}
+    hashes = {}
+    failed = []
+    supplied = set()
+    for code, frames, error in fetched:
+        supplied.add(code)
+        if not _check_fetched(code, frames, error, report):
+            failed.append(code)
+            continue
+        with report.stage('hash'):
+            digest = company_hash(frames, columns)
+        previous = manifest.companies.get(code)
+        # 旧版本的清单没有记录数据质量问题，其输出中也没有 quality_flags，按变化处理
+        if previous is None or previous["hash"] != digest or "flags" not in previous:
+            universe[code] = frames
+            hashes[code] = digest
+    if not manifest.files:
+        # 只提供部分公司时，其余公司会从输出中消失
+        unsupplied = [code for code in stock_codes if code not in supplied]
+        if unsupplied:
+            raise ValueError(f"增量清单不存在或已失效，需要提供全部公司的报表，缺少 {len(unsupplied)} 家："
+                             f"{', '.join(unsupplied[:10])}")
+    scanned = time.perf_counter()
+
+    # 只对变化的公司做转换、派生计算和编码
+    changed = {}
+    empty = []
+    if universe:
+        df, fragments, shard_fragments, quality = next(_record_chunks([_process_chunk(universe, shards)], report))
+        names = df.drop_duplicates('股票代码').set_index('股票代码')['公司名称']
+        with report.stage('encode_blocks'):
+            blocks_by_code = encode_blocks(df, fragments, manifest)
+        for code, blocks in blocks_by_code.items():
+            entry, shard = shard_fragments.get(code, (None, None))
+            changed[code] = {"hash": hashes[code], "name": names[code], "entry": entry, "blocks": blocks,
+                             "shard": shard, "flags": quality[code]["flags"]}
+            print(f"已更新：{names[code]}")
+        # 报表中没有任何非空指标值的公司不产生数据块，与全量运行一样不出现在输出中
+        empty = [code for code in universe if code not in blocks_by_code]
+        for code in empty:
+            report.fail(code, 'reshape', "报表中没有非空的指标值")
+            print(f"处理出错：{code}（报表中没有非空的指标值，已从输出中删除）")
+        if pit is not None:
+            with report.stage('write_pit'):
+                pit.ingest(df)
+    computed = time.perf_counter()
+
+    wanted = set(stock_codes)
+    kept = [code for code in manifest.companies if code in wanted and code not in universe]
+    removed = [code for code in manifest.companies if code not in wanted]
+    order = sorted(kept + list(changed),
+                   key=lambda code: ((changed.get(code) or manifest.companies[code])["name"], code))
+    if changed or removed or not manifest.files:
+        _invalidate_charts(output_dir)
+        with report.stage('write'):
+            write_outputs(output_dir, manifest, order, changed)
+            manifest.save()
+        with report.stage('write_quality'):
+            write_quality_report(os.path.join(output_dir, QUALITY_REPORT),
+                                 {code: {"name": manifest.companies[code]["name"],
+                                         "flags": manifest.companies[code]["flags"]} for code in order})
+    written = time.perf_counter()
+
+    stats = {
+        "companies": len(order),
+        "changed": len(changed),
+        "removed": len(removed),
+        "failed": len(failed),
+        "empty": len(empty),
+        "scan_seconds": round(scanned - start, 3),
+        "compute_seconds": round(computed - scanned, 3),
+        "write_seconds": round(written - computed, 3)
+    }
+    report.count('incremental.changed', stats['changed'])
+    report.count('incremental.removed', stats['removed'])
+    print(f"\n增量更新完成：共 {stats['companies']} 家公司，变化 {stats['changed']} 家，"
+          f"删除 {stats['removed']} 家，获取失败 {stats['failed']} 家，没有数据 {stats['empty']} 家；"
+          f"读取与比对 {stats['scan_seconds']:.3f}s，计算 {stats['compute_seconds']:.3f}s，"
+          f"写入 {stats['write_seconds']:.3f}s")
+    return stats
+
+def process_quarterly_data(stock_codes, fetcher=akshare_fetcher, max_workers=4, rate=3.0, burst=3,
+                           retries=3, backoff=1.0, cache=None, output_dir='data', report=None):
+    """获取按报告期（季度）的报表，生成季报长表 CSV 和 TTM 指标 JSON
+
+    季度数约为年报的 4 倍，全部公司一次性在向量化路径上处理。
+    """
+    if report is None:
+        report = RunReport()
+    fetched = fetch_universe(stock_codes, tuple(QUARTERLY_STATEMENT_APIS), fetcher, cache, report,
+                             max_workers=max_workers, rate=rate, burst=burst, retries=retries, backoff=backoff)
+    return build_quarterly_outputs(fetched, output_dir, report)
+
+def build_quarterly_outputs(fetched, output_dir='data', report=None):
+    """由 (股票代码, 报表, 错误) 序列生成季报长表 CSV 和 TTM 指标 JSON"""
+    if report is None:
+        report = RunReport()
+    universe = {}
+    # 全部公司作为一组
+    for chunk in _iter_chunks(fetched, float('inf'), report):
+        universe.update(chunk)
+    if not universe:
+        print("没有获取到任何数据")
+        return pd.DataFrame()
 
+    with report.stage('reshape'):
+        df = reshape_universe(universe)
+    with report.stage('sort'):
+        df = df.sort_values(['公司名称', '报表', '报告期'], ascending=[True, True, True])
+    report.count('rows.long', len(df))
+    with report.stage('write_csv'):
+        df.to_csv(os.path.join(output_dir, 'quarterly_financial_data.csv'), index=False, encoding='utf-8-sig')
+    with report.stage('build_json'):
+        companies = build_quarterly_json(df)["companies"]
+    with report.stage('write_json'):
+        write_json_fragments(os.path.join(output_dir, 'quarterly_financial_data.json'),
+                             ((code, encode_company(companies[code])) for code in df['股票代码'].unique()))
 
+    print(f"\n季报数据文件已生成完成")
+    return df
 
+def load_codes(path):
+    """从文件读取股票代码，每行一个，忽略空行和 # 开头的注释"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith('#')]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="下载财务报表并生成合并的 CSV 和 JSON 数据")
+    parser.add_argument('codes', nargs='*', help="股票代码，未指定时使用默认的示例代码")
+    parser.add_argument('--codes-file', help="股票代码文件，每行一个")
+    parser.add_argument('--workers', type=int, default=1, help="处理进程数，默认 1（不使用子进程）")
+    parser.add_argument('--chunk-size', type=int, default=200, help="每个处理任务包含的公司数")
+    parser.add_argument('--fetch-workers', type=int, default=4, help="数据获取线程数")
+    parser.add_argument('--rate', type=float, default=3.0, help="每秒请求上限")
+    parser.add_argument('--retries', type=int, default=3, help="单次请求失败后的重试次数")
+    parser.add_argument('--cache-dir', default='data/cache', help="原始报表缓存目录")
+    parser.add_argument('--ttl', type=float, default=DEFAULT_TTL, help="缓存有效期（秒）")
+    parser.add_argument('--no-cache', action='store_true', help="不使用缓存，全部重新获取")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="不获取数据，由缓存中的原始报表重新生成输出；未指定股票代码时使用缓存中的全部股票")
+    parser.add_argument('--output-dir', default='data', help="输出目录")
+    parser.add_argument('--stream', action='store_true', help="流式输出，内存占用与公司总数无关")
+    parser.add_argument('--shards', action='store_true', help="另外输出公司索引和按公司的 JSON 分片")
+    parser.add_argument('--incremental', action='store_true',
+                        help="增量更新：只重新计算原始报表发生变化的公司")
+    parser.add_argument('--quarterly', action='store_true',
+                        help="改为获取季报，输出季报长表和滚动十二个月（TTM）指标")
+    parser.add_argument('--industry-map', help="行业映射 CSV，指定时另外输出按行业和报告期的统计 industry_rollups.json")
+    parser.add_argument('--charts', action='store_true',
+                        help="另外输出网页直接使用的图表数据 charts/（统一的报告期轴、换算为亿元并取整）；"
+                             "输出目录中已有图表数据时总是重新生成")
+    parser.add_argument('--pit', action='store_true',
+                        help="同时写入按时点查询的版本库（输出目录下的 pit，年报），查询见 pointintime.py")
+    parser.add_argument('--report', help="运行报告（JSON）路径，默认为输出目录下的 run_report.json")
+    parser.add_argument('--profile', help="将主线程的 cProfile 结果保存到指定文件（python -m pstats 查看）")
+    args = parser.parse_args(argv)
+
+    stock_codes = list(args.codes)
+    if args.codes_file:
+        stock_codes += load_codes(args.codes_file)
+    statements = tuple(QUARTERLY_STATEMENT_APIS if args.quarterly else STATEMENT_APIS)
+
+    # 确保输出目录存在
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    report = RunReport()
+    # 已生成过图表数据时，输出改写后重新生成，否则网页只能退回由合并数据转换
+    charts = args.charts or os.path.exists(os.path.join(args.output_dir, CHART_INDEX))
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler is not None:
+        profiler.enable()
+
+    if args.rebuild:
+        # 只读取本地缓存（忽略有效期），不调用上游接口
+        cache = StatementCache(args.cache_dir)
+        stock_codes = stock_codes or cache.codes(statements)
+        fetched = report.timed_iter(iter_local_statements(stock_codes, cache, statements), 'load_cache')
+    else:
+        stock_codes = stock_codes or ['688596', '603690']  # 正帆科技在前，至纯科技在后
+        cache = None if args.no_cache else StatementCache(args.cache_dir, ttl=args.ttl)
+        fetched = fetch_universe(stock_codes, statements, akshare_fetcher, cache, report,
+                                 max_workers=args.fetch_workers, rate=args.rate, retries=args.retries)
+
+    pit = None
+    if args.pit and not args.quarterly:
+        from pointintime import PointInTimeStore
+        pit = PointInTimeStore(os.path.join(args.output_dir, 'pit'))
+
+    if args.quarterly:
+        build_quarterly_outputs(fetched, args.output_dir, report)
+    elif args.incremental:
+        update_outputs(fetched, stock_codes, args.output_dir, args.shards, report, pit)
+    else:
+        build_outputs(fetched, args.workers, args.chunk_size, args.output_dir, args.stream, args.shards, report, pit)
+    if pit is not None:
+        with report.stage('write_pit'):
+            pit.close()
+
+    if args.industry_map and not args.quarterly:
+        # 行业统计和图表数据只在需要时导入，不增加命令行的启动耗时
+        from industry import update_rollups
+        with report.stage('industry_rollups'):
+            update_rollups(args.output_dir, args.industry_map)
+
+    if charts and not args.quarterly:
+        from charts import update_charts
+        with report.stage('charts'):
+            update_charts(args.output_dir)
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"性能分析结果已保存：{args.profile}")
+    report.finish()
+    report.write(args.report or os.path.join(args.output_dir, 'run_report.json'))
+    report.print_summary()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from columnar import SCHEMA, _STORAGE_DTYPES
+
+MANIFEST_NAME = 'incremental.json'
+
+# 按公司拼接的输出文件（相对于输出目录）
+CSV_FILE = 'merged_financial_data.csv'
+JSON_FILE = 'merged_financial_data.json'
+COLUMNAR_FILES = [os.path.join('columnar', f"{index}.bin") for index in range(len(SCHEMA))]
+
+# 合并 JSON 文件的固定部分，与 emit.JsonStreamWriter 的输出一致
+JSON_HEADER = '{\n    "companies": {'.encode('utf-8')
+JSON_FOOTER = '\n    }\n}'.encode('utf-8')
+JSON_EMPTY_FOOTER = '}\n}'.encode('utf-8')
+
+
+def company_hash(frames, columns):
+    """一家公司原始报表的内容指纹，只包含会用到的列
+
+    frames 为 {报表类型: DataFrame}，columns 为 {报表类型: (文本列, 数值列)}；上游新增无关的列不会改变指纹。
+    数值列按与转换时相同的方式取为 float 矩阵后整体计算，不逐列处理。
+    """
+    digest = hashlib.sha1()
+    for statement in sorted(frames):
+        df = frames[statement]
+        text, numeric = columns[statement]
+        digest.update(json.dumps([statement, df[text].astype(str).to_numpy().tolist()],
+                                 ensure_ascii=False).encode('utf-8'))
+        digest.update(np.ascontiguousarray(df[numeric].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+class IncrementalManifest:
+    """增量更新的清单：每家公司的内容指纹、名称、索引项、数据质量问题，以及其在各输出文件中的字节范围
+
+    清单同时记录各输出文件写入后的大小和修改时间，输出文件被其他方式改写（例如一次全量运行）后，
+    清单视为失效，下次运行会重新生成全部公司。列式存储的类别表只追加不删除，保证已写入的编码不变。
+    """
+
+    def __init__(self, output_dir, shards=False):
+        self.output_dir = output_dir
+        self.shards = shards
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.companies = {}
+        self.categories = {name: [] for name, kind in SCHEMA.items() if kind == 'category'}
+        self.files = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # 上次未输出分片而本次需要时，同样重新生成全部公司
+            if self._files_unchanged(data.get('files', {})) and (data.get('shards') or not shards):
+                self.companies = data['companies']
+                self.categories = data['categories']
+                self.files = data['files']
+        self._lookup = {name: {value: i for i, value in enumerate(values)}
+                        for name, values in self.categories.items()}
+
+    def _files_unchanged(self, files):
+        for relative, (size, mtime_ns) in files.items():
+            path = os.path.join(self.output_dir, relative)
+            if not os.path.exists(path):
+                return False
+            stat = os.stat(path)
+            if stat.st_size != size or stat.st_mtime_ns != mtime_ns:
+                return False
+        return bool(files)
+
+    def encode_category(self, name, values):
+        """按清单中的类别表编码，新出现的类别追加到末尾"""
+        codes, uniques = pd.factorize(values)
+        lookup = self._lookup[name]
+        for value in uniques:
+            if value not in lookup:
+                lookup[value] = len(self.categories[name])
+                self.categories[name].append(value)
+        mapping = np.array([lookup[value] for value in uniques], dtype=np.int32)
+        return mapping[codes] if len(codes) else np.empty(0, dtype=np.int32)
+
+    def record_file(self, relative):
+        stat = os.stat(os.path.join(self.output_dir, relative))
+        self.files[relative] = [stat.st_size, stat.st_mtime_ns]
+
+    def save(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"companies": self.companies, "categories": self.categories, "files": self.files,
+                       "shards": self.shards}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, self.path)
+
+
+def splice_file(path, pieces, header=b'', footer=b'', separator=b'', empty_footer=None):
+    """按顺序拼接各公司的数据块写出文件，返回 {代码: [偏移, 长度]}
+
+    pieces 为 (代码, 数据块) 列表，数据块为新的 bytes，或 (偏移, 长度) 表示沿用原文件中的该段内容，
+    未变化的公司只做字节复制，不需要解析原文件。
+    """
+    blocks = {}
+    tmp_path = path + '.tmp'
+    old = open(path, 'rb') if os.path.exists(path) else None
+    try:
+        with open(tmp_path, 'wb') as out:
+            out.write(header)
+            for index, (code, piece) in enumerate(pieces):
+                if index:
+                    out.write(separator)
+                if isinstance(piece, bytes):
+                    data = piece
+                else:
+                    old.seek(piece[0])
+                    data = old.read(piece[1])
+                blocks[code] = [out.tell(), len(data)]
+                out.write(data)
+            out.write(footer if pieces or empty_footer is None else empty_footer)
+    finally:
+        if old is not None:
+            old.close()
+    os.replace(tmp_path, path)
+    return blocks
+
+
+def encode_blocks(df, fragments, manifest):
+    """将变化公司的长表和 JSON 片段编码为各输出文件中的数据块
+
+    返回 {代码: {输出文件相对路径: bytes}}。df 需已按公司名称、报表、报告期排序。
+    """
+    blocks = {}
+    for code, block in df.groupby('股票代码', sort=False):
+        encoded = {
+            CSV_FILE: block.to_csv(index=False, header=False).encode('utf-8'),
+            JSON_FILE: ('\n        ' + json.dumps(code, ensure_ascii=False) + ': ' + fragments[code]).encode('utf-8')
+        }
+        for index, (name, kind) in enumerate(SCHEMA.items()):
+            if kind == 'category':
+                values = manifest.encode_category(name, block[name].to_numpy(dtype=object))
+            elif kind == 'datetime64[ns]':
+                values = pd.to_datetime(block[name]).to_numpy(dtype='datetime64[ns]').view(np.int64)
+            else:
+                values = block[name].to_numpy(dtype=np.float64)
+            encoded[COLUMNAR_FILES[index]] = np.ascontiguousarray(values, dtype=_STORAGE_DTYPES[kind]).tobytes()
+        blocks[code] = encoded
+    return blocks
+
+
+def write_outputs(output_dir, manifest, order, changed):
+    """将未变化公司的原有数据块与变化公司的新数据块拼接，写出合并的 CSV、JSON、列式存储和分片
+
+    order 为全部公司按输出顺序排列的代码；changed 为 {代码: {"hash", "name", "entry", "blocks", "shard", "flags"}}，
+    其中 blocks 由 encode_blocks 生成，shard 为分片内容（不输出分片时为 None），flags 为数据质量问题列表。
+    """
+    os.makedirs(os.path.join(output_dir, 'columnar'), exist_ok=True)
+    csv_header = ('\ufeff' + ','.join(SCHEMA) + '\n').encode('utf-8')
+    outputs = [(CSV_FILE, csv_header, b'', b'', None),
+               (JSON_FILE, JSON_HEADER, JSON_FOOTER, b',', JSON_EMPTY_FOOTER)]
+    outputs += [(relative, b'', b'', b'', None) for relative in COLUMNAR_FILES]
+
+    companies = {}
+    for code in order:
+        source = changed.get(code) or manifest.companies[code]
+        companies[code] = {"hash": source["hash"], "name": source["name"], "entry": source["entry"],
+                           "flags": source["flags"], "blocks": {}}
+
+    # 先删除 meta.json，写入中途失败时不会留下可读取的不完整列式存储
+    meta_path = os.path.join(output_dir, 'columnar', 'meta.json')
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+    for relative, header, footer, separator, empty_footer in outputs:
+        pieces = [(code, changed[code]["blocks"][relative] if code in changed
+                   else tuple(manifest.companies[code]["blocks"][relative])) for code in order]
+        offsets = splice_file(os.path.join(output_dir, relative), pieces, header, footer, separator, empty_footer)
+        for code, block in offsets.items():
+            companies[code]["blocks"][relative] = block
+        manifest.record_file(relative)
+
+    amount_file = COLUMNAR_FILES[list(SCHEMA).index('金额')]
+    meta = {
+        "rows": sum(companies[code]["blocks"][amount_file][1] // 8 for code in order),
+        "columns": [
+            {"name": name, "type": kind, "file": f"{index}.bin",
+             "categories": manifest.categories[name] if kind == 'category' else None}
+            for index, (name, kind) in enumerate(SCHEMA.items())
+        ]
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+
+    if manifest.shards:
+        company_dir = os.path.join(output_dir, 'companies')
+        os.makedirs(company_dir, exist_ok=True)
+        for code, company in changed.items():
+            if code in companies:
+                with open(os.path.join(company_dir, f"{code}.json"), 'w', encoding='utf-8') as f:
+                    f.write(company["shard"])
+        for code in set(manifest.companies) - set(order):
+            path = os.path.join(company_dir, f"{code}.json")
+            if os.path.exists(path):
+                os.remove(path)
+        with open(os.path.join(output_dir, 'index.json'), 'w', encoding='utf-8') as f:
+            json.dump({"companies": [companies[code]["entry"] for code in order]}, f,
+                      ensure_ascii=False, separators=(',', ':'))
+
+    manifest.companies = companies
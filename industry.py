@@ -0,0 +1,141 @@
+import os
+import json
+import hashlib
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from screen import load_cube
+
+# 每个 (行业, 报告期, 指标) 预先计算的统计量
+ROLLUP_STATS = ('count', 'q1', 'median', 'q3', 'mean', 'weighted_mean')
+
+
+def load_industry_map(path):
+    """读取行业映射 CSV，列为 股票代码、行业，可选 市值（用于加权平均）
+
+    返回以股票代码为索引、包含 行业 和 市值 两列的 DataFrame，缺少市值时为 NaN。
+    """
+    df = pd.read_csv(path, dtype={'股票代码': str}, encoding='utf-8-sig')
+    if '市值' not in df.columns:
+        df['市值'] = np.nan
+    df['市值'] = pd.to_numeric(df['市值'], errors='coerce')
+    return df.dropna(subset=['行业']).drop_duplicates('股票代码').set_index('股票代码')[['行业', '市值']]
+
+
+def group_signature(cube, members, caps):
+    """行业组的内容指纹：成员、市值和成员的全部数据都不变时，统计结果也不变"""
+    digest = hashlib.sha1()
+    digest.update(json.dumps([cube.periods, cube.metrics, [cube.codes[i] for i in members]],
+                             ensure_ascii=False).encode('utf-8'))
+    digest.update(np.ascontiguousarray(caps, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(cube.values[members]).tobytes())
+    return digest.hexdigest()
+
+
+def summarize(values, caps):
+    """对 (公司数, 报告期数, 指标数) 的组内数据计算各统计量，每项结果为 (报告期数, 指标数) 的数组
+
+    分位数和均值忽略缺失值；weighted_mean 以市值加权，只使用指标和市值都有值的公司。
+    """
+    valid = ~np.isnan(values)
+    with warnings.catch_warnings():
+        # 全部缺失的 (报告期, 指标) 结果为 NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        q1, median, q3 = np.nanpercentile(values, [25, 50, 75], axis=0)
+        mean = np.nanmean(values, axis=0)
+
+    weights = caps[:, None, None]
+    weighted = valid & ~np.isnan(weights)
+    total = np.where(weighted, weights, 0.0).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weighted_mean = np.where(total > 0, np.where(weighted, values * weights, 0.0).sum(axis=0) / total, np.nan)
+
+    return {
+        'count': valid.sum(axis=0).astype(float),
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'mean': mean,
+        'weighted_mean': weighted_mean
+    }
+
+
+def _encode_group(cube, members, signature, stats):
+    metrics = {}
+    for k, metric in enumerate(cube.metrics):
+        metrics[metric] = {name: [None if v != v else round(v, 4) for v in stats[name][:, k].tolist()]
+                           for name in ROLLUP_STATS}
+    return {
+        "signature": signature,
+        "members": [cube.codes[i] for i in members],
+        "metrics": metrics
+    }
+
+
+def compute_rollups(cube, mapping, previous=None):
+    """按 (行业, 报告期) 计算全部指标的统计量
+
+    previous 为上次的结果（read_rollups 读取），指纹未变化的行业组直接沿用，
+    只有成员数据发生变化的行业组重新计算。返回 (结果, 重新计算的行业列表)。
+    """
+    mapping = mapping.reindex([code for code in cube.codes if code in mapping.index])
+    previous_groups = (previous or {}).get("industries", {})
+    rollups = {"periods": cube.periods, "stats": list(ROLLUP_STATS), "industries": {}}
+    recomputed = []
+
+    for industry, group in mapping.groupby('行业', sort=False):
+        members = np.array([cube.code_index[code] for code in group.index])
+        caps = group['市值'].to_numpy(dtype=float)
+        signature = group_signature(cube, members, caps)
+        cached = previous_groups.get(industry)
+        if cached is not None and cached.get("signature") == signature:
+            rollups["industries"][industry] = cached
+            continue
+        stats = summarize(cube.values[members], caps)
+        rollups["industries"][industry] = _encode_group(cube, members, signature, stats)
+        recomputed.append(industry)
+    return rollups, recomputed
+
+
+def read_rollups(path):
+    """读取已保存的行业统计，不存在时返回 None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_rollups(path, rollups):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(rollups, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+
+def update_rollups(output_dir, map_path):
+    """由输出目录中的列式存储和行业映射更新 industry_rollups.json，只重新计算发生变化的行业"""
+    rollups_path = os.path.join(output_dir, 'industry_rollups.json')
+    cube = load_cube(os.path.join(output_dir, 'columnar'))
+    mapping = load_industry_map(map_path)
+    unmapped = [code for code in cube.codes if code not in mapping.index]
+    if unmapped:
+        print(f"{len(unmapped)} 家公司没有行业分类，不参与行业统计")
+    rollups, recomputed = compute_rollups(cube, mapping, read_rollups(rollups_path))
+    write_rollups(rollups_path, rollups)
+    print(f"行业统计已更新：{len(rollups['industries'])} 个行业，重新计算 {len(recomputed)} 个")
+    return rollups, recomputed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按行业和报告期预先计算各指标的中位数、四分位数和市值加权平均")
+    parser.add_argument('--industry-map', default='data/industry_map.csv', help="行业映射 CSV（股票代码, 行业, 市值）")
+    parser.add_argument('--output-dir', default='data', help="finance.py 的输出目录")
+    args = parser.parse_args(argv)
+    update_rollups(args.output_dir, args.industry_map)
+
+
+if __name__ == "__main__":
+    main()
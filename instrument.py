@@ -0,0 +1,200 @@
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块，不统计峰值内存
+    resource = None
+
+# 延迟直方图各桶的上界（毫秒），超过最后一个上界的计入溢出桶
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+def peak_memory():
+    """本进程和已结束子进程的峰值常驻内存（字节），不支持的平台返回 None"""
+    if resource is None:
+        return None
+    # Linux 上 ru_maxrss 单位为 KB，macOS 上为字节
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    }
+
+
+def summarize_latencies(seconds, bounds=LATENCY_BUCKETS_MS):
+    """延迟样本的次数、合计、分位数和按桶计数，时间单位为毫秒"""
+    ms = np.sort(np.asarray(seconds, dtype=float)) * 1000
+    if not len(ms):
+        return {"count": 0}
+    counts = np.bincount(np.searchsorted(bounds, ms, side='left'), minlength=len(bounds) + 1)
+    labels = [f"<={bound}ms" for bound in bounds] + [f">{bounds[-1]}ms"]
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        "count": len(ms),
+        "total_ms": round(float(ms.sum()), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p90_ms": round(float(p90), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(ms[-1]), 3),
+        "buckets": {label: int(n) for label, n in zip(labels, counts) if n}
+    }
+
+
+class StageTimer:
+    """按阶段累计耗时，可在子进程中使用并随处理结果返回（可 pickle）"""
+
+    def __init__(self):
+        self.seconds = {}
+
+    @contextmanager
+    def __call__(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = self.seconds.get(name, 0.0) + time.perf_counter() - start
+
+
+class RunReport:
+    """一次运行的结构化记录：各阶段耗时、计数、上游调用延迟、每家公司的获取情况、失败原因和峰值内存
+
+    各方法线程安全，数据获取线程可以直接记录。阶段之间可能重叠（获取与处理同时进行），
+    多进程处理时各阶段为所有子进程耗时之和，整体耗时见 wall_seconds。
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.latencies = {}
+        self.companies = {}
+        self.chunks = []
+        self.failures = []
+        self.wall_seconds = None
+        self.memory = None
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, seconds, calls=1):
+        with self._lock:
+            stage = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            stage["seconds"] += seconds
+            stage["calls"] += calls
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage(name, time.perf_counter() - start)
+
+    def add_timer(self, timer):
+        """合并子进程返回的 StageTimer"""
+        for name, seconds in timer.seconds.items():
+            self.add_stage(name, seconds)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def company(self, code, **fields):
+        """记录一家公司的信息，数值字段累加，其他字段覆盖"""
+        with self._lock:
+            record = self.companies.setdefault(code, {})
+            for key, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    record[key] = record.get(key, 0) + value
+                else:
+                    record[key] = value
+
+    def fail(self, code, stage, reason):
+        """记录失败的公司及原因，reason 为异常对象或说明文字"""
+        if isinstance(reason, BaseException):
+            reason = f"{type(reason).__name__}: {reason}"
+        with self._lock:
+            self.failures.append({"code": code, "stage": stage, "reason": str(reason)})
+            self.companies.setdefault(code, {})["status"] = "failed"
+        self.count(f"failed.{stage}")
+
+    def timed_fetcher(self, fetcher):
+        """包装数据获取函数，记录每次上游调用的延迟、行数和异常（含随后重试成功的调用）"""
+        def timed(symbol, statement):
+            # 带交易所前缀的代码去掉前两位即为股票代码，见 fetch.to_symbol
+            code = symbol[2:]
+            start = time.perf_counter()
+            try:
+                df = fetcher(symbol, statement)
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                self.observe(f"fetch.{statement}", elapsed)
+                self.count("fetch.errors")
+                self.count(f"fetch.errors.{type(e).__name__}")
+                self.company(code, fetch_calls=1, fetch_seconds=elapsed, fetch_errors=1)
+                raise
+            elapsed = time.perf_counter() - start
+            self.observe(f"fetch.{statement}", elapsed)
+            self.count("fetch.calls")
+            self.count("rows.fetched", len(df))
+            self.company(code, fetch_calls=1, fetch_seconds=elapsed, fetch_rows=len(df))
+            return df
+        return timed
+
+    def timed_iter(self, iterable, name):
+        """逐项产出 iterable 的内容，并将等待下一项的时间计入阶段 name"""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_stage(name, time.perf_counter() - start, calls=0)
+                return
+            self.add_stage(name, time.perf_counter() - start)
+            yield item
+
+    def finish(self):
+        """记录整体耗时和峰值内存，返回自身"""
+        self.wall_seconds = time.perf_counter() - self._start
+        self.memory = peak_memory()
+        return self
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "started": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                "wall_seconds": None if self.wall_seconds is None else round(self.wall_seconds, 3),
+                "peak_memory_bytes": self.memory,
+                "stages": {name: {"seconds": round(stage["seconds"], 4), "calls": stage["calls"]}
+                           for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "latencies": {name: summarize_latencies(values) for name, values in self.latencies.items()},
+                "chunks": list(self.chunks),
+                "failures": list(self.failures),
+                "companies": {code: {key: round(value, 4) if isinstance(value, float) else value
+                                     for key, value in record.items()}
+                              for code, record in self.companies.items()}
+            }
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def print_summary(self):
+        """输出各阶段耗时的简要汇总"""
+        print(f"\n运行耗时 {self.wall_seconds or 0:.2f}s，各阶段：")
+        for name, stage in sorted(self.stages.items(), key=lambda item: -item[1]["seconds"]):
+            print(f"  {name:<16}{stage['seconds']:>10.3f}s{stage['calls']:>8} 次")
+        if self.failures:
+            print(f"失败 {len(self.failures)} 家公司，原因见运行报告")
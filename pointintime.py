@@ -0,0 +1,334 @@
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# 单元格键：(股票代码, 报表, 项目, 报告期) 编码为一个 int64，按键排序即按公司、报表、项目、报告期排序
+# 各字段的位数：股票代码 23 位、报表 8 位、项目 12 位、报告期（1970-01-01 起的天数）20 位
+_PERIOD_BITS = 20
+_ITEM_BITS = 12
+_STATEMENT_BITS = 8
+_ITEM_SHIFT = _PERIOD_BITS
+_STATEMENT_SHIFT = _ITEM_SHIFT + _ITEM_BITS
+_CODE_SHIFT = _STATEMENT_SHIFT + _STATEMENT_BITS
+
+# 变更日志（只追加）和按 (键, 写入序号) 排序的索引，每列一个原始二进制文件
+LOG_FILES = {'key': ('log_key.bin', np.int64), 'ingest': ('log_ingest.bin', np.int32),
+             'value': ('log_value.bin', np.float64)}
+INDEX_FILES = {'key': ('index_key.bin', np.int64), 'ingest': ('index_ingest.bin', np.int32),
+               'value': ('index_value.bin', np.float64)}
+CATEGORY_COLUMNS = ('股票代码', '报表', '项目')
+
+
+class PointInTimeStore:
+    """按时点查询的财务数据版本库：只追加记录发生变化的单元格
+
+    每次写入（ingest）一份长表，与各公司当前已知的值比较，只将新增、改变（如追溯调整）和消失的单元格
+    追加到变更日志中，消失的单元格记为 NaN。日志的每一行为 (单元格键, 写入序号, 金额)，
+    写入时间和公司名称记录在 meta.json 中。另外维护一份按 (键, 写入序号) 排序的索引，
+    as_of 在索引上一次线性扫描即可得到任意时点已知的全部数据，不需要回放历次写入。
+    日志在写入时提交（meta.json 最后写出），索引在 flush / close 时写出，缺失或不完整时由日志重建。
+    clock 为未指定写入时间时使用的时钟，可替换为模拟时钟。
+    """
+
+    def __init__(self, path='data/pit', clock=time.time):
+        self.path = path
+        self.clock = clock
+        os.makedirs(path, exist_ok=True)
+        self._meta_path = os.path.join(path, 'meta.json')
+        self.meta = {"rows": 0, "ingests": [], "categories": {name: [] for name in CATEGORY_COLUMNS},
+                     "names": {}}
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+        self._lookup = {name: {value: i for i, value in enumerate(values)}
+                        for name, values in self.meta["categories"].items()}
+        self._index = None
+        self._index_dirty = False
+        self._pending = None
+
+    # ---- 键的编码与解码 ----
+
+    def _encode_category(self, name, values):
+        # 先在本次数据内编码，再将少量的不重复值映射到版本库中只追加的类别编号
+        codes, uniques = pd.factorize(values)
+        lookup = self._lookup[name]
+        categories = self.meta["categories"][name]
+        for value in uniques:
+            if value not in lookup:
+                lookup[value] = len(categories)
+                categories.append(str(value))
+        return np.array([lookup[value] for value in uniques], dtype=np.int64)[codes]
+
+    def _encode_keys(self, df):
+        codes = self._encode_category('股票代码', df['股票代码'].to_numpy(dtype=object))
+        statements = self._encode_category('报表', df['报表'].to_numpy(dtype=object))
+        items = self._encode_category('项目', df['项目'].to_numpy(dtype=object))
+        period_codes, periods = pd.factorize(df['报告期'])
+        days = pd.to_datetime(periods).to_numpy(dtype='datetime64[D]').view(np.int64)[period_codes]
+        if len(self.meta["categories"]['项目']) > 1 << _ITEM_BITS or \
+                len(self.meta["categories"]['报表']) > 1 << _STATEMENT_BITS:
+            raise ValueError("项目或报表种类超出单元格键的编码范围")
+        return (codes << _CODE_SHIFT) | (statements << _STATEMENT_SHIFT) | (items << _ITEM_SHIFT) | days
+
+    def _code_rows(self, keys, code_ids):
+        """索引中各公司的行号（键按公司连续排列，每家公司为一段连续的行）"""
+        code_ids = np.asarray(code_ids, dtype=np.int64)
+        starts = np.searchsorted(keys, code_ids << _CODE_SHIFT)
+        ends = np.searchsorted(keys, (code_ids + 1) << _CODE_SHIFT)
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)] + [np.empty(0, dtype=int)])
+
+    # ---- 日志与索引文件 ----
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read(self, files, rows, mmap=True):
+        arrays = {}
+        for column, (name, dtype) in files.items():
+            if rows == 0:
+                arrays[column] = np.empty(0, dtype=dtype)
+            elif mmap:
+                arrays[column] = np.memmap(self._file(name), dtype=dtype, mode='r', shape=(rows,))
+            else:
+                arrays[column] = np.fromfile(self._file(name), dtype=dtype, count=rows)
+        return arrays
+
+    def _index_complete(self):
+        rows = self.meta["rows"]
+        return all(os.path.exists(self._file(name)) and os.path.getsize(self._file(name)) == rows * np.dtype(dtype).itemsize
+                   for name, dtype in INDEX_FILES.values())
+
+    def _load_index(self):
+        """按 (键, 写入序号) 排序的 (键, 写入序号, 金额) 数组；索引文件不完整时由日志重建"""
+        if self._index is None:
+            rows = self.meta["rows"]
+            if self._index_complete():
+                self._index = self._read(INDEX_FILES, rows)
+            else:
+                log = self._read(LOG_FILES, rows, mmap=False)
+                # 日志按写入顺序追加，稳定排序后同一键的各版本按写入先后排列
+                order = np.argsort(log['key'], kind='stable')
+                self._index = {column: values[order] for column, values in log.items()}
+                self._index_dirty = True
+        return self._index
+
+    def _append_log(self, rows):
+        # 截去上次写入中途失败时留在日志末尾、未被 meta.json 记录的数据
+        for column, (name, dtype) in LOG_FILES.items():
+            with open(self._file(name), 'ab') as f:
+                f.truncate(self.meta["rows"] * np.dtype(dtype).itemsize)
+                f.write(np.ascontiguousarray(rows[column], dtype=dtype).tobytes())
+
+    def _save_meta(self):
+        tmp_path = self._meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+        os.replace(tmp_path, self._meta_path)
+
+    def flush(self):
+        """写出索引，下次打开时不需要由日志重建"""
+        if not self._index_dirty:
+            return
+        for column, (name, dtype) in INDEX_FILES.items():
+            tmp_path = self._file(name) + '.tmp'
+            np.ascontiguousarray(self._index[column], dtype=dtype).tofile(tmp_path)
+            os.replace(tmp_path, self._file(name))
+        self._index_dirty = False
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+    # ---- 写入与查询 ----
+
+    def ingest(self, df, at=None):
+        """写入一份长表（股票代码、公司名称、报表、项目、报告期、金额），只记录发生变化的单元格
+
+        长表中出现的公司视为完整的快照：其已知但不在长表中的单元格记为消失；未出现的公司不变。
+        at 为写入时间（时间戳秒数或 pandas 可解析的时间，默认为 clock 的当前时间），不能早于上次写入。
+        返回 {"added", "changed", "removed"} 各类变化的单元格数。
+        """
+        self.begin(at)
+        stats = self.add(df)
+        self.commit()
+        return stats
+
+    def begin(self, at=None):
+        """开始一次分多组写入的 ingest：之后的各次 add 使用同一个写入序号和写入时间，commit 时一起生效
+
+        用于流式输出等分组处理的场景，as_of 不会得到只包含部分公司的新数据。提交前中断时，已追加的数据在下次写入时截去。
+        """
+        if self._pending is not None:
+            raise ValueError("上一次写入尚未提交")
+        if at is None:
+            at = self.clock()
+        at = pd.Timestamp.fromtimestamp(at) if isinstance(at, (int, float)) else pd.Timestamp(at)
+        ingests = self.meta["ingests"]
+        if ingests and at < pd.Timestamp(ingests[-1]["at"]):
+            raise ValueError(f"写入时间 {at} 早于上次写入 {ingests[-1]['at']}")
+        self._pending = {"at": at.isoformat(), "companies": 0, "cells": 0, "added": 0, "changed": 0, "removed": 0}
+
+    def add(self, df):
+        """在 begin 开始的写入中加入一组公司的长表，参数含义见 ingest"""
+        if self._pending is None:
+            raise ValueError("没有进行中的写入，请先调用 begin")
+        number = len(self.meta["ingests"])
+
+        # 空值不是有效的金额；同一单元格出现多次时取第一条记录，与 transform.build_panel 一致
+        df = df[df['金额'].notna()]
+        keys = self._encode_keys(df)
+        keys, first = np.unique(keys, return_index=True)
+        values = df['金额'].to_numpy(dtype=float)[first]
+        code_ids, code_rows = np.unique(keys >> _CODE_SHIFT, return_index=True)
+
+        # 这些公司当前已知的值：索引中各键的最后一个版本
+        index = self._load_index()
+        rows = self._code_rows(index['key'], code_ids)
+        known_keys = np.asarray(index['key'][rows])
+        latest = np.ones(len(rows), dtype=bool)
+        latest[:-1] = known_keys[1:] != known_keys[:-1]
+        known_keys = known_keys[latest]
+        known_values = np.asarray(index['value'][rows])[latest]
+        known_keys, known_values = known_keys[~np.isnan(known_values)], known_values[~np.isnan(known_values)]
+
+        found = np.zeros(len(keys), dtype=bool)
+        changed = np.zeros(len(keys), dtype=bool)
+        if len(known_keys):
+            position = np.minimum(np.searchsorted(known_keys, keys), len(known_keys) - 1)
+            found = known_keys[position] == keys
+            changed = found & (known_values[position] != values)
+        added = ~found
+        removed = ~np.isin(known_keys, keys, assume_unique=True)
+
+        delta_keys = np.concatenate([keys[added | changed], known_keys[removed]])
+        delta_values = np.concatenate([values[added | changed], np.full(int(removed.sum()), np.nan)])
+        order = np.argsort(delta_keys)
+        delta = {'key': delta_keys[order], 'ingest': np.full(len(order), number, dtype=np.int32),
+                 'value': delta_values[order]}
+
+        # 公司名称只在改变时记录
+        codes = self.meta["categories"]['股票代码']
+        names = df['公司名称'].iloc[first[code_rows]]
+        for code, name in zip((codes[code_id] for code_id in code_ids), names):
+            history = self.meta["names"].setdefault(code, [])
+            if not history or history[-1][1] != name:
+                history.append([number, name])
+
+        stats = {"added": int(added.sum()), "changed": int(changed.sum()), "removed": int(removed.sum())}
+        self._append_log(delta)
+        self.meta["rows"] += len(order)
+        for name, n in dict(stats, companies=len(code_ids), cells=len(keys)).items():
+            self._pending[name] += n
+
+        # 新版本的写入序号最大，插入到各键已有版本之后
+        positions = np.searchsorted(index['key'], delta['key'], side='right')
+        self._index = {column: np.insert(np.asarray(index[column]), positions, delta[column]) for column in index}
+        self._index_dirty = True
+        return stats
+
+    def commit(self):
+        """提交 begin 开始的写入：写出 meta.json 后，本次写入的全部数据一起对 as_of 可见"""
+        self.meta["ingests"].append(self._pending)
+        self._pending = None
+        self._save_meta()
+
+    def _ingest_number(self, when):
+        """时点 when 之前（含）最后一次写入的序号，之前没有写入时返回 -1"""
+        times = pd.to_datetime([ingest["at"] for ingest in self.meta["ingests"]])
+        if when is None:
+            return len(times) - 1
+        return int(np.searchsorted(times, pd.Timestamp(when), side='right')) - 1
+
+    def as_of(self, when=None, stock_codes=None):
+        """时点 when（pandas 可解析的时间，只给日期时为当天 0 点；默认最新）已知的全部数据，格式与长表相同
+
+        stock_codes 指定只取部分公司。结果按股票代码、报表、项目、报告期排序，
+        类别列为 pandas Categorical，报告期为 datetime64[ns]。
+        """
+        number = self._ingest_number(when)
+        index = self._load_index()
+        keys, ingest, values = index['key'], index['ingest'], index['value']
+        if stock_codes is not None:
+            lookup = self._lookup['股票代码']
+            rows = self._code_rows(keys, sorted(lookup[code] for code in stock_codes if code in lookup))
+            keys, ingest, values = keys[rows], ingest[rows], values[rows]
+        keys, ingest, values = np.asarray(keys), np.asarray(ingest), np.asarray(values)
+
+        # 同一键的各版本按写入先后排列，时点之前的版本构成前缀，取前缀的最后一个
+        known = ingest <= number
+        last = known.copy()
+        last[:-1] &= ~((keys[1:] == keys[:-1]) & known[1:])
+        last &= ~np.isnan(values)
+        keys, values = keys[last], values[last]
+        return self._decode(keys, values, number)
+
+    def _decode(self, keys, values, number):
+        categories = self.meta["categories"]
+        code_ids = keys >> _CODE_SHIFT
+        names = [self._name_as_of(code, number) for code in categories['股票代码']]
+        name_codes, name_uniques = pd.factorize(np.asarray(names, dtype=object))
+        return pd.DataFrame({
+            '股票代码': pd.Categorical.from_codes(code_ids, categories=categories['股票代码']),
+            '公司名称': pd.Categorical.from_codes(name_codes[code_ids], categories=name_uniques),
+            '报表': pd.Categorical.from_codes((keys >> _STATEMENT_SHIFT) & ((1 << _STATEMENT_BITS) - 1),
+                                            categories=categories['报表']),
+            '项目': pd.Categorical.from_codes((keys >> _ITEM_SHIFT) & ((1 << _ITEM_BITS) - 1),
+                                            categories=categories['项目']),
+            '报告期': (keys & ((1 << _PERIOD_BITS) - 1)).astype('datetime64[D]').astype('datetime64[ns]'),
+            '金额': values
+        })
+
+    def _name_as_of(self, code, number):
+        name = None
+        for ingest, value in self.meta["names"].get(code, []):
+            if ingest > number:
+                break
+            name = value
+        return name if name is not None else code
+
+    def history(self, stock_code):
+        """一家公司全部单元格的各个版本：长表各列加上写入时间，金额为 NaN 表示该单元格消失"""
+        lookup = self._lookup['股票代码']
+        if stock_code not in lookup:
+            return self._decode(np.empty(0, dtype=np.int64), np.empty(0), -1).assign(写入时间=pd.Series(dtype='datetime64[ns]'))
+        index = self._load_index()
+        rows = self._code_rows(index['key'], [lookup[stock_code]])
+        df = self._decode(np.asarray(index['key'][rows]), np.asarray(index['value'][rows]),
+                          len(self.meta["ingests"]) - 1)
+        times = pd.to_datetime([ingest["at"] for ingest in self.meta["ingests"]])
+        df['写入时间'] = times[np.asarray(index['ingest'][rows])]
+        return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查询按时点的财务数据版本库（finance.py --pit 写入）")
+    parser.add_argument('--path', default='data/pit', help="版本库目录")
+    parser.add_argument('--as-of', help="时点，如 2024-05-01 或 2024-05-01T18:00；默认最新")
+    parser.add_argument('--codes', nargs='*', help="只取部分公司")
+    parser.add_argument('--history', help="输出一家公司全部单元格的各个版本")
+    parser.add_argument('--output', help="将结果保存为 CSV，未指定时只显示概况")
+    args = parser.parse_args(argv)
+
+    store = PointInTimeStore(args.path)
+    for number, ingest in enumerate(store.meta["ingests"]):
+        print(f"#{number} {ingest['at']}：{ingest['companies']} 家公司，新增 {ingest['added']}，"
+              f"改变 {ingest['changed']}，消失 {ingest['removed']}")
+    df = store.history(args.history) if args.history else store.as_of(args.as_of, args.codes)
+    print(f"\n{len(df)} 行，{df['股票代码'].nunique()} 家公司")
+    if args.output:
+        df.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"已保存：{args.output}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
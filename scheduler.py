@@ -0,0 +1,323 @@
+import os
+import time
+import sqlite3
+import argparse
+import datetime
+
+from fetch import STATEMENT_APIS, QUARTERLY_STATEMENT_APIS, iter_statements, akshare_fetcher, to_symbol
+from cache import StatementCache, iter_local_statements
+from finance import load_codes, update_outputs, build_quarterly_outputs
+from incremental import IncrementalManifest
+from instrument import RunReport
+
+DAY = 24 * 3600
+
+# 任务优先级：数值小的先处理
+PRIORITY_DUE = 0      # 下一期报告可能已经披露（披露窗口内）或从未检查过
+PRIORITY_ROUTINE = 1  # 已过披露截止日仍没有新报告的例行检查
+
+# 定期报告的披露截止日：报告期的 (月, 日) -> (相对报告期的年份, 月, 日)
+# 一季报 4 月 30 日、半年报 8 月 31 日、三季报 10 月 31 日、年报次年 4 月 30 日
+DISCLOSURE_DEADLINES = {
+    (3, 31): (0, 4, 30),
+    (6, 30): (0, 8, 31),
+    (9, 30): (0, 10, 31),
+    (12, 31): (1, 4, 30)
+}
+QUARTER_ENDS = ((3, 31), (6, 30), (9, 30), (12, 31))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    code TEXT PRIMARY KEY,
+    latest_period TEXT,
+    due REAL NOT NULL,
+    priority INTEGER NOT NULL,
+    idle INTEGER NOT NULL DEFAULT 0,
+    errors INTEGER NOT NULL DEFAULT 0,
+    running INTEGER NOT NULL DEFAULT 0,
+    checked_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_due ON jobs (running, priority, due);
+"""
+
+
+def _date(text):
+    return datetime.date.fromisoformat(str(text)[:10])
+
+
+def _timestamp(date):
+    """日期当天 0 点（本地时间）的时间戳"""
+    return time.mktime(date.timetuple())
+
+
+def next_report(latest_period, quarterly=False):
+    """最新报告期之后的下一期报告：(报告期, 披露截止日)"""
+    latest = _date(latest_period)
+    if quarterly:
+        ends = [datetime.date(year, month, day) for year in (latest.year, latest.year + 1)
+                for month, day in QUARTER_ENDS]
+        period = next(end for end in ends if end > latest)
+    else:
+        period = datetime.date(latest.year + 1, 12, 31)
+    offset, month, day = DISCLOSURE_DEADLINES[(period.month, period.day)]
+    return period, datetime.date(period.year + offset, month, day)
+
+
+def next_check(latest_period, now, idle=0, quarterly=False, check_interval=DAY, window_interval=3 * DAY,
+               max_interval=7 * DAY):
+    """根据最新报告期和连续没有新报告的检查次数 idle，计算下次检查的时间戳和优先级
+
+    报告期结束前不可能披露，在披露窗口打开时检查；窗口内按 check_interval 起指数退避，
+    间隔不超过 window_interval，且不晚于截止日的次日；过了截止日仍没有新报告时退避到最长 max_interval。
+    """
+    backoff = check_interval * 2 ** idle
+    if latest_period is None:
+        # 上游没有任何报告期的公司（如尚未上市）
+        return now + min(backoff, max_interval), PRIORITY_ROUTINE
+    period, deadline = next_report(latest_period, quarterly)
+    opens = _timestamp(period + datetime.timedelta(days=1))
+    if now < opens:
+        return opens, PRIORITY_DUE
+    closes = _timestamp(deadline + datetime.timedelta(days=1))
+    if now < closes:
+        return min(now + min(backoff, window_interval), closes), PRIORITY_DUE
+    return now + min(backoff, max_interval), PRIORITY_ROUTINE
+
+
+def latest_period(frames):
+    """各报表中最新的报告期（YYYY-MM-DD），没有数据时返回 None"""
+    periods = [str(df['REPORT_DATE'].max()).split()[0] for df in frames.values() if len(df) > 0]
+    return max(periods) if periods else None
+
+
+class RefreshScheduler:
+    """按定期报告披露日历刷新报表的调度器，任务队列保存在 SQLite 数据库中
+
+    每家公司一个任务，记录最新报告期、下次检查时间和优先级。每轮取出到期的任务（披露窗口内的优先），
+    获取报表后与已知的最新报告期比较：有新报告期的公司增量更新输出文件（finance.update_outputs），
+    没有新报告的公司按 next_check 退避。任务在获取前标记为进行中，新报告期在输出写入后才记录，
+    进程中断后重新启动时，进行中的任务立即重新检查，不会遗漏输出。
+    clock 和 sleep 可替换为模拟时钟，fetcher 可替换为离线的获取函数。
+    pit 为 pointintime.PointInTimeStore 时，更新的年报同时写入按时点查询的版本库（每次写入后写出索引）。
+    """
+
+    def __init__(self, db_path, fetcher=akshare_fetcher, output_dir='data', shards=False, cache=None,
+                 quarterly=False, batch_size=200, clock=time.time, sleep=time.sleep, check_interval=DAY,
+                 window_interval=3 * DAY, max_interval=7 * DAY, error_interval=600, poll_interval=3600,
+                 pit=None, **fetch_kwargs):
+        self.fetcher = fetcher
+        self.output_dir = output_dir
+        self.shards = shards
+        self.cache = cache
+        self.quarterly = quarterly
+        self.statements = tuple(QUARTERLY_STATEMENT_APIS if quarterly else STATEMENT_APIS)
+        self.batch_size = batch_size
+        self.clock = clock
+        self.sleep = sleep
+        self.intervals = dict(check_interval=check_interval, window_interval=window_interval,
+                              max_interval=max_interval)
+        self.error_interval = error_interval
+        self.poll_interval = poll_interval
+        self.pit = pit
+        self.fetch_kwargs = fetch_kwargs
+        if quarterly and cache is None:
+            raise ValueError("季报模式需要缓存：季报输出由缓存中的全部公司重新生成")
+
+        self.db = sqlite3.connect(db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        # 上次运行中断时进行中的任务，其新数据可能尚未写入输出，立即重新检查
+        with self.db:
+            resumed = self.db.execute("UPDATE jobs SET running = 0, due = ?, priority = ? WHERE running = 1",
+                                      (clock(), PRIORITY_DUE)).rowcount
+        if resumed:
+            print(f"恢复上次中断的任务：{resumed} 家公司")
+
+    def close(self):
+        self.db.close()
+        if self.pit is not None:
+            self.pit.close()
+
+    def codes(self):
+        return [code for code, in self.db.execute("SELECT code FROM jobs ORDER BY code")]
+
+    def add(self, codes):
+        """加入新的公司，首次检查立即进行；已有的公司不变"""
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO jobs (code, due, priority) VALUES (?, ?, ?)",
+                                [(code, self.clock(), PRIORITY_DUE) for code in codes])
+
+    def sync(self, codes):
+        """使任务队列与 codes 一致：加入新的公司，删除不在其中的公司（下次更新输出时一并删除）"""
+        self.add(codes)
+        wanted = set(codes)
+        with self.db:
+            self.db.executemany("DELETE FROM jobs WHERE code = ?",
+                                [(code,) for code in self.codes() if code not in wanted])
+
+    def due_jobs(self, now):
+        rows = self.db.execute("SELECT code, latest_period, idle, errors FROM jobs "
+                               "WHERE running = 0 AND due <= ? ORDER BY priority, due, code LIMIT ?",
+                               (now, self.batch_size))
+        return {code: {"latest_period": latest, "idle": idle, "errors": errors}
+                for code, latest, idle, errors in rows}
+
+    def next_due(self):
+        due, = self.db.execute("SELECT MIN(due) FROM jobs WHERE running = 0").fetchone()
+        return due
+
+    def _reschedule(self, code, latest, idle, errors=0, error=None):
+        now = self.clock()
+        if error is not None:
+            due = now + min(self.error_interval * 2 ** (errors - 1), self.intervals['max_interval'])
+            priority = PRIORITY_ROUTINE
+        else:
+            due, priority = next_check(latest, now, idle, self.quarterly, **self.intervals)
+        self.db.execute("UPDATE jobs SET latest_period = ?, due = ?, priority = ?, idle = ?, errors = ?, "
+                        "running = 0, checked_at = ?, last_error = ? WHERE code = ?",
+                        (latest, due, priority, idle, errors, now, error, code))
+
+    def run_once(self, report=None):
+        """处理一批到期的任务，返回本轮的统计信息"""
+        if report is None:
+            report = RunReport()
+        jobs = self.due_jobs(self.clock())
+        summary = {"checked": len(jobs), "updated": 0, "unchanged": 0, "failed": 0}
+        if not jobs:
+            return summary
+        with self.db:
+            self.db.executemany("UPDATE jobs SET running = 1 WHERE code = ?", [(code,) for code in jobs])
+
+        fetched = iter_statements(list(jobs), fetcher=report.timed_fetcher(self.fetcher),
+                                  statements=self.statements, **self.fetch_kwargs)
+        updated = {}
+        for code, frames, error in report.timed_iter(fetched, 'fetch'):
+            job = jobs[code]
+            if error is not None:
+                summary["failed"] += 1
+                report.fail(code, 'fetch', error)
+                print(f"处理出错：{code}（{report.failures[-1]['reason']}）")
+                with self.db:
+                    self._reschedule(code, job["latest_period"], job["idle"], job["errors"] + 1,
+                                     f"{type(error).__name__}: {error}")
+                continue
+            if self.cache is not None:
+                for statement, df in frames.items():
+                    self.cache.put(to_symbol(code), statement, df)
+            latest = latest_period(frames)
+            if latest is not None and (job["latest_period"] is None or latest > job["latest_period"]):
+                # 新报告期在输出写入后才记录，写入前中断时下次启动会重新检查
+                updated[code] = (frames, latest)
+            else:
+                summary["unchanged"] += 1
+                with self.db:
+                    self._reschedule(code, job["latest_period"], job["idle"] + 1)
+        if self.cache is not None:
+            self.cache.save()
+
+        if updated:
+            with report.stage('update_outputs'):
+                self._update_outputs(updated, report)
+            with self.db:
+                for code, (_, latest) in updated.items():
+                    self._reschedule(code, latest, 0)
+            summary["updated"] = len(updated)
+        return summary
+
+    def _update_outputs(self, updated, report):
+        """只为有新报告期的公司重新生成输出"""
+        if self.quarterly:
+            # 季报输出不支持增量更新，由缓存中的全部公司重新生成
+            build_quarterly_outputs(iter_local_statements(self.codes(), self.cache, self.statements),
+                                    self.output_dir, report)
+        elif not IncrementalManifest(self.output_dir, shards=self.shards).files and self.cache is not None:
+            # 增量清单不存在或已失效（例如期间有过一次全量运行），没有可沿用的数据块，
+            # 由缓存中的全部公司重新生成；本轮获取的报表已写入缓存，尚未获取过的公司暂不输出
+            cached = set(self.cache.codes(self.statements))
+            codes = [code for code in self.codes() if code in cached]
+            print(f"增量清单已失效，由缓存重新生成全部 {len(codes)} 家公司的输出")
+            update_outputs(iter_local_statements(codes, self.cache, self.statements), codes,
+                           self.output_dir, self.shards, report, self.pit)
+        else:
+            # 没有缓存且清单失效时 update_outputs 抛出 ValueError，不会只输出本轮的公司
+            update_outputs(((code, frames, None) for code, (frames, _) in updated.items()), self.codes(),
+                           self.output_dir, self.shards, report, self.pit)
+        if self.pit is not None:
+            self.pit.flush()
+
+    def wait(self):
+        """等待到下一个任务到期，最长 poll_interval 秒"""
+        due = self.next_due()
+        wait = self.poll_interval if due is None else min(max(due - self.clock(), 0), self.poll_interval)
+        if wait > 0:
+            self.sleep(wait)
+
+    def run(self, max_cycles=None):
+        """持续运行：处理到期的任务，然后等待下一个任务到期；max_cycles 为处理的轮数上限"""
+        cycles = 0
+        while True:
+            summary = self.run_once()
+            cycles += 1
+            if summary["checked"]:
+                stamp = time.strftime('%Y-%m-%d %H:%M', time.localtime(self.clock()))
+                print(f"{stamp} 检查 {summary['checked']} 家公司：有新报告期 {summary['updated']} 家，"
+                      f"无新数据 {summary['unchanged']} 家，获取失败 {summary['failed']} 家")
+            if max_cycles is not None and cycles >= max_cycles:
+                return cycles
+            self.wait()
+
+    def status(self):
+        """各优先级的任务数和最早的下次检查时间"""
+        rows = self.db.execute("SELECT priority, COUNT(*), MIN(due), SUM(errors > 0) FROM jobs GROUP BY priority")
+        return {priority: {"jobs": count, "next_due": due, "failing": failing}
+                for priority, count, due, failing in rows}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按定期报告披露日历持续刷新报表，只为有新报告期的公司更新输出")
+    parser.add_argument('codes', nargs='*', help="股票代码")
+    parser.add_argument('--codes-file', help="股票代码文件，每行一个；指定后任务队列与文件保持一致")
+    parser.add_argument('--db', default='data/scheduler.db', help="任务队列数据库路径")
+    parser.add_argument('--output-dir', default='data', help="输出目录")
+    parser.add_argument('--shards', action='store_true', help="另外输出公司索引和按公司的 JSON 分片")
+    parser.add_argument('--cache-dir', default='data/cache', help="原始报表缓存目录，获取的报表同时写入缓存")
+    parser.add_argument('--quarterly', action='store_true', help="改为刷新季报（按季度的披露日历）")
+    parser.add_argument('--batch-size', type=int, default=200, help="每轮最多检查的公司数")
+    parser.add_argument('--fetch-workers', type=int, default=4, help="数据获取线程数")
+    parser.add_argument('--rate', type=float, default=3.0, help="每秒请求上限")
+    parser.add_argument('--once', action='store_true', help="只处理一轮到期的任务后退出")
+    parser.add_argument('--status', action='store_true', help="只显示任务队列的状态")
+    parser.add_argument('--pit', action='store_true',
+                        help="同时写入按时点查询的版本库（输出目录下的 pit，年报），查询见 pointintime.py")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+    pit = None
+    if args.pit and not args.quarterly:
+        from pointintime import PointInTimeStore
+        pit = PointInTimeStore(os.path.join(args.output_dir, 'pit'))
+    scheduler = RefreshScheduler(args.db, output_dir=args.output_dir, shards=args.shards,
+                                 cache=StatementCache(args.cache_dir), quarterly=args.quarterly,
+                                 batch_size=args.batch_size, pit=pit, max_workers=args.fetch_workers,
+                                 rate=args.rate)
+    try:
+        if args.codes_file:
+            scheduler.sync(load_codes(args.codes_file) + list(args.codes))
+        elif args.codes:
+            scheduler.add(args.codes)
+        if args.status:
+            for priority, info in sorted(scheduler.status().items()):
+                label = "披露窗口内" if priority == PRIORITY_DUE else "例行检查"
+                due = time.strftime('%Y-%m-%d %H:%M', time.localtime(info["next_due"]))
+                print(f"{label}：{info['jobs']} 家公司，最早 {due} 检查，获取失败 {info['failing']} 家")
+            return
+        scheduler.run(max_cycles=1 if args.once else None)
+    except KeyboardInterrupt:
+        print("已停止，进行中的任务将在下次启动时重新检查")
+    finally:
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    main()
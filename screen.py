@@ -0,0 +1,142 @@
+import operator
+
+import numpy as np
+import pandas as pd
+
+from derive import compute_derived
+from transform import build_panel
+from columnar import load_columnar
+
+# 筛选条件支持的比较运算；top / bottom 表示全体公司中排名前（后）多少比例
+_COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '==': operator.eq,
+    '!=': operator.ne
+}
+
+
+class Cube:
+    """公司 × 报告期 × 指标 的三维数组，用于全市场横截面比较
+
+    values[i, j, k] 为第 i 家公司在报告期 periods[j] 的指标 metrics[k]，缺失为 NaN；
+    present[i, k] 为第 i 家公司是否具有指标 metrics[k]（与 JSON 输出中是否包含该指标一致），可为 None；
+    code_index、period_index、metric_index 为代码、报告期、指标到下标的映射。
+    """
+
+    def __init__(self, codes, names, periods, metrics, sheets, values, present=None):
+        self.codes = list(codes)
+        self.names = list(names)
+        self.periods = list(periods)
+        self.metrics = list(metrics)
+        self.sheets = dict(sheets)
+        self.values = values
+        self.present = present
+        self.code_index = {code: i for i, code in enumerate(self.codes)}
+        self.period_index = {period: j for j, period in enumerate(self.periods)}
+        self.metric_index = {metric: k for k, metric in enumerate(self.metrics)}
+
+    def resolve_period(self, period=None):
+        """period 为 None 时取最新报告期，为年份（int）时取该年最后一个报告期，否则按报告期字符串查找"""
+        if period is None:
+            return len(self.periods) - 1
+        if isinstance(period, (int, np.integer)):
+            prefix = f"{int(period)}-"
+            matches = [j for j, p in enumerate(self.periods) if p.startswith(prefix)]
+            if not matches:
+                raise KeyError(f"没有 {period} 年的报告期")
+            return matches[-1]
+        return self.period_index[period]
+
+    def cross_section(self, metric, period=None):
+        """某一报告期全部公司的指标值"""
+        return self.values[:, self.resolve_period(period), self.metric_index[metric]]
+
+    def series(self, code, metric):
+        """一家公司某指标的完整序列"""
+        return self.values[self.code_index[code], :, self.metric_index[metric]]
+
+    def percentile(self, metric, period=None):
+        """全部公司中的百分位（0~100，越大越靠前），并列取平均名次，缺失为 NaN"""
+        return pd.Series(self.cross_section(metric, period)).rank(pct=True).to_numpy() * 100
+
+    def rank(self, metric, period=None, ascending=False):
+        """全部公司中的名次（1 为第一），ascending 为 False 时数值越大名次越靠前，缺失为 NaN"""
+        return pd.Series(self.cross_section(metric, period)).rank(ascending=ascending, method='min').to_numpy()
+
+    def zscore(self, metric, period=None):
+        """相对全部公司均值的标准分，缺失为 NaN"""
+        x = self.cross_section(metric, period)
+        std = np.nanstd(x)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (x - np.nanmean(x)) / std
+
+    def mask(self, conditions, period=None):
+        """按条件筛选公司，返回布尔数组
+
+        conditions 为 (指标, 运算, 数值) 列表，运算为比较符号或 top / bottom，
+        例如 ('资产负债率', '<', 50)、('净资产收益率', 'top', 0.1)。缺失值不满足任何条件。
+        """
+        selected = np.ones(len(self.codes), dtype=bool)
+        for metric, op, value in conditions:
+            if op in ('top', 'bottom'):
+                pct = self.percentile(metric, period)
+                passed = pct > (1 - value) * 100 if op == 'top' else pct <= value * 100
+            elif op in _COMPARISONS:
+                with np.errstate(invalid='ignore'):
+                    passed = _COMPARISONS[op](self.cross_section(metric, period), value)
+            else:
+                raise ValueError(f"不支持的筛选运算：{op}")
+            selected &= passed
+        return selected
+
+    def screen(self, conditions=(), period=None, sort_by=None, ascending=False, columns=()):
+        """筛选公司并返回 DataFrame（索引为股票代码），包含公司名称、条件和排序涉及的指标
+
+        sort_by 指定排序指标，结果中同时给出该指标在全部公司中的名次和百分位。
+        """
+        selected = np.flatnonzero(self.mask(conditions, period))
+        metrics = list(dict.fromkeys([m for m, _, _ in conditions] + ([sort_by] if sort_by else []) +
+                                     list(columns)))
+        j = self.resolve_period(period)
+        result = pd.DataFrame(
+            {metric: self.values[selected, j, self.metric_index[metric]] for metric in metrics},
+            index=pd.Index(np.asarray(self.codes, dtype=object)[selected], name='股票代码'))
+        result.insert(0, '公司名称', np.asarray(self.names, dtype=object)[selected])
+        if sort_by:
+            result['名次'] = self.rank(sort_by, period, ascending)[selected]
+            result['百分位'] = np.round(self.percentile(sort_by, period)[selected], 2)
+            result = result.sort_values(sort_by, ascending=ascending, na_position='last')
+        return result
+
+
+def build_cube(df, derived=True):
+    """由 process_financial_data 返回的长表构建 Cube，derived 为 True 时包含派生指标"""
+    panel, _ = build_panel(df)
+    if derived:
+        compute_derived(panel)
+    metrics = list(panel.series)
+
+    # 各公司左对齐的报告期映射到全体公司统一的报告期轴
+    periods = np.array(sorted({year for years in panel.years for year in years}), dtype=object)
+    companies = np.repeat(np.arange(len(panel.codes)), panel.lengths)
+    local = np.arange(len(companies)) - np.repeat(np.cumsum(panel.lengths) - panel.lengths, panel.lengths)
+    flat_years = np.array([year for years in panel.years for year in years], dtype=object)
+    positions = np.searchsorted(periods, flat_years)
+
+    stacked = np.stack([panel.series[metric] for metric in metrics], axis=-1)
+    values = np.full((len(panel.codes), len(periods), len(metrics)), np.nan)
+    values[companies, positions] = stacked[companies, local]
+    present = np.stack([panel.present[metric] for metric in metrics], axis=-1)
+    # 公司不具有的指标（如 FillSum、FirstPresent 在输入全部缺失时得到的 0）整列为 NaN，与 JSON 输出一致
+    values = np.where(present[:, None, :], values, np.nan)
+    return Cube(panel.codes, panel.names, periods.tolist(), metrics, panel.sheets, values, present)
+
+
+def load_cube(path='data/columnar', stock_codes=None, derived=True):
+    """由列式存储（process_financial_data 的输出）构建 Cube"""
+    df = load_columnar(path, stock_codes=stock_codes)
+    df = df.astype({name: object for name in ('股票代码', '公司名称', '报表', '项目')})
+    return build_cube(df, derived)
@@ -1,6 +1,19 @@
 import http.server
 import socketserver
 import os
+import gzip
+import json
+import hashlib
+import argparse
+import threading
+import email.utils
+from functools import partial
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    import brotli  # 可选依赖，安装后支持 br 压缩
+except ImportError:
+    brotli = None
 
 # 设置端口号
 PORT = 8000
@@ -8,18 +21,420 @@ PORT = 8000
 # 获取当前文件所在目录的绝对路径
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# 切换到项目根目录
-os.chdir(BASE_DIR)
+# 默认缓存策略：浏览器可以缓存，但每次使用前需用 ETag 验证
+DEFAULT_CACHE_CONTROL = 'no-cache'
+
+# 需要压缩的文件类型，以及小于该大小的文件不压缩
+COMPRESSIBLE_EXTENSIONS = ('.json', '.csv', '.html', '.js', '.css', '.txt')
+MIN_COMPRESS_SIZE = 1024
+
+# 查询接口使用的数据文件（相对于服务目录）
+DEFAULT_DATA_FILE = os.path.join('data', 'merged_financial_data.json')
+SHEETS = ('profit_sheet', 'balance_sheet', 'cash_flow')
+
+# charts.py 输出的图表数据目录（相对于服务目录）
+DEFAULT_CHART_DIR = os.path.join('data', 'charts')
+
+
+class QueryError(Exception):
+    """查询参数错误，对应 HTTP 状态码"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _compress(body, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    if encoding == 'br':
+        return brotli.compress(body)
+    return body
+
+
+def _etag(body, encoding):
+    digest = hashlib.sha1(body).hexdigest()
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+class FileCache:
+    """按 (路径, 修改时间, 大小) 缓存文件内容、ETag 和压缩后的内容，线程安全
+
+    文件发生变化后旧的缓存项自然失效。
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, path, encoding):
+        """返回 (内容, ETag, 最后修改时间)，encoding 为 None、'gzip' 或 'br'"""
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, encoding)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        body = self._read(path, stat, encoding)
+        entry = (body, _etag(body, encoding), stat.st_mtime)
+        with self._lock:
+            # 删除同一文件的过期缓存项
+            for old_key in [k for k in self._entries if k[0] == path and k[1:3] != key[1:3]]:
+                del self._entries[old_key]
+            if len(self._entries) >= self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+        return entry
+
+    def _read(self, path, stat, encoding):
+        # 优先使用预压缩的 .gz / .br 文件（需比源文件新）
+        sidecar = {'gzip': path + '.gz', 'br': path + '.br'}.get(encoding)
+        if sidecar and os.path.exists(sidecar) and os.stat(sidecar).st_mtime_ns >= stat.st_mtime_ns:
+            with open(sidecar, 'rb') as f:
+                return f.read()
+        with open(path, 'rb') as f:
+            return _compress(f.read(), encoding)
+
+
+class MetricsIndex:
+    """查询接口使用的内存索引，由 merged_financial_data.json 构建
+
+    每次查询前检查文件修改时间，文件更新后自动重新加载；
+    编码后的响应按 (查询, 压缩方式) 缓存，重新加载时清空。
+    """
+
+    def __init__(self, path, max_responses=1024):
+        self.path = path
+        self.max_responses = max_responses
+        self.mtime = None
+        self._companies = {}
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """文件修改时间变化时重新加载，返回数据文件是否存在"""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self.mtime:
+            return mtime is not None
+        with self._lock:
+            if mtime != self.mtime:
+                companies = {}
+                if mtime is not None:
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        companies = json.load(f)['companies']
+                self._companies = companies
+                self._responses = {}
+                self.mtime = mtime
+        return mtime is not None
+
+    def response(self, route, query, encoding):
+        """返回 (内容, ETag, 最后修改时间)，查询参数错误时抛出 QueryError"""
+        if not self.refresh():
+            raise QueryError(404, "数据文件不存在")
+        key = (route, query, encoding)
+        entry = self._responses.get(key)
+        if entry is not None:
+            return entry
+
+        if route == '/api/companies':
+            result = self.companies()
+        elif route == '/api/metrics':
+            result = self.metrics(**_parse_metrics_query(query))
+        else:
+            raise QueryError(404, f"未知接口 {route}")
+        body = _compress(json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), encoding)
+        entry = (body, _etag(body, encoding), self.mtime / 1e9)
+        with self._lock:
+            if len(self._responses) >= self.max_responses:
+                self._responses.pop(next(iter(self._responses)))
+            self._responses[key] = entry
+        return entry
+
+    def companies(self):
+        """公司列表：代码、名称和可用的报告期"""
+        return {"companies": [
+            {"code": code, "name": company["company_name"], "years": company["profit_sheet"]["years"]}
+            for code, company in self._companies.items()
+        ]}
+
+    def metrics(self, codes, sheet, metrics, start=None, end=None):
+        """按公司截取某张报表中指定指标的序列，start/end 为起止年份（含）"""
+        result = {}
+        missing = []
+        for code in (self._companies if codes is None else codes):
+            company = self._companies.get(code)
+            if company is None:
+                missing.append(code)
+                continue
+            data = company[sheet]
+            keep = [i for i, year in enumerate(data["years"])
+                    if (start is None or int(year[:4]) >= start) and (end is None or int(year[:4]) <= end)]
+            result[code] = {
+                "name": company["company_name"],
+                "years": [data["years"][i] for i in keep],
+                "metrics": {name: [data["metrics"][name][i] for i in keep]
+                            for name in metrics if name in data["metrics"]}
+            }
+        return {"sheet": sheet, "companies": result, "missing": missing}
+
+
+class ChartPayloads:
+    """批量图表数据接口：将多家公司预先编码的图表数据直接拼接为一个响应，不重新解析和编码
+
+    响应为 {"companies": {代码: 图表数据, ...}, "missing": [...]}；各公司文件通过 FileCache 缓存，
+    拼接后的响应按 (查询, 压缩方式) 缓存，index.json 更新（charts.py 重新生成）后清空。
+    """
+
+    def __init__(self, directory, file_cache, max_responses=256):
+        self.directory = directory
+        self.file_cache = file_cache
+        self.max_responses = max_responses
+        self.mtime = None
+        self._responses = {}
+        self._lock = threading.Lock()
+
+    def response(self, route, query, encoding):
+        try:
+            mtime = os.stat(os.path.join(self.directory, 'index.json')).st_mtime_ns
+        except FileNotFoundError:
+            raise QueryError(404, "图表数据不存在，请先运行 charts.py")
+        if mtime != self.mtime:
+            with self._lock:
+                self._responses = {}
+                self.mtime = mtime
+        key = (query, encoding)
+        entry = self._responses.get(key)
+        if entry is not None:
+            return entry
+
+        codes = parse_qs(query).get('codes', [''])[-1]
+        codes = [code.strip() for code in codes.split(',') if code.strip()]
+        if not codes:
+            raise QueryError(400, "缺少参数 codes")
+        parts = []
+        missing = []
+        for code in dict.fromkeys(codes):
+            path = os.path.join(self.directory, f"{code}.json")
+            if not code.isalnum() or not os.path.isfile(path):
+                missing.append(code)
+                continue
+            body, _, _ = self.file_cache.get(path, None)
+            parts.append(json.dumps(code).encode('utf-8') + b':' + body)
+        body = (b'{"companies":{' + b','.join(parts) + b'},"missing":' +
+                json.dumps(missing, ensure_ascii=False).encode('utf-8') + b'}')
+        body = _compress(body, encoding)
+        entry = (body, _etag(body, encoding), mtime / 1e9)
+        with self._lock:
+            if len(self._responses) >= self.max_responses:
+                self._responses.pop(next(iter(self._responses)))
+            self._responses[key] = entry
+        return entry
+
+
+def _parse_metrics_query(query):
+    params = parse_qs(query)
+
+    def single(name):
+        values = params.get(name)
+        return values[-1].strip() if values else None
+
+    def split(name):
+        value = single(name)
+        return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+    def year(name):
+        value = single(name)
+        if not value:
+            return None
+        try:
+            return int(value[:4])
+        except ValueError:
+            raise QueryError(400, f"参数 {name} 不是有效的年份：{value}")
+
+    sheet = single('sheet')
+    if sheet not in SHEETS:
+        raise QueryError(400, f"参数 sheet 必须是 {', '.join(SHEETS)} 之一")
+    metrics = split('metric')
+    if not metrics:
+        raise QueryError(400, "缺少参数 metric")
+    return {"codes": split('codes'), "sheet": sheet, "metrics": metrics, "start": year('from'), "end": year('to')}
+
 
 class MyHttpRequestHandler(http.server.SimpleHTTPRequestHandler):
+    # 支持长连接，所有响应都带 Content-Length；关闭 Nagle 算法，避免小响应在长连接上等待延迟确认
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    file_cache = FileCache()
+    metrics_index = None
+    chart_payloads = None
+    cache_control = DEFAULT_CACHE_CONTROL
+    compress = True
+
     def end_headers(self):
         # 添加 CORS 头，允许跨域请求
         self.send_header('Access-Control-Allow-Origin', '*')
         super().end_headers()
 
-Handler = MyHttpRequestHandler
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _choose_encoding(self, path, size):
+        if not self.compress or not path.endswith(COMPRESSIBLE_EXTENSIONS) or size < MIN_COMPRESS_SIZE:
+            return None
+        accepted = [part.split(';')[0].strip() for part in self.headers.get('Accept-Encoding', '').split(',')]
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def _not_modified(self, etag, mtime):
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return int(mtime) <= since
+        return False
+
+    def send_head(self):
+        url = urlsplit(self.path)
+        if url.path.startswith('/api/') and self.metrics_index is not None:
+            return self._send_api(url.path, url.query)
+
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            # 目录、重定向和 404 仍由 SimpleHTTPRequestHandler 处理
+            return super().send_head()
+
+        try:
+            encoding = self._choose_encoding(path, os.path.getsize(path))
+            body, etag, mtime = self.file_cache.get(path, encoding)
+        except OSError:
+            self.send_error(404, "File not found")
+            return None
+        return self._send_payload(body, self.guess_type(path), etag, mtime, encoding)
+
+    def _send_api(self, route, query):
+        # 查询接口的响应一般远小于完整文件，只要客户端支持就压缩
+        encoding = self._choose_encoding('.json', MIN_COMPRESS_SIZE)
+        source = self.chart_payloads if route == '/api/charts' else self.metrics_index
+        try:
+            body, etag, mtime = source.response(route, query, encoding)
+        except QueryError as e:
+            body = json.dumps({"error": str(e)}, ensure_ascii=False).encode('utf-8')
+            self.send_response(e.status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            return _BytesBody(body)
+        return self._send_payload(body, 'application/json; charset=utf-8', etag, mtime, encoding)
+
+    def _send_payload(self, body, content_type, etag, mtime, encoding):
+        if self._not_modified(etag, mtime):
+            self.send_response(304)
+            self._send_cache_headers(etag, mtime, encoding)
+            self.end_headers()
+            return None
+
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self._send_cache_headers(etag, mtime, encoding)
+        self.end_headers()
+        return _BytesBody(body)
+
+    def _send_cache_headers(self, etag, mtime, encoding):
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', self.date_time_string(mtime))
+        self.send_header('Cache-Control', self.cache_control)
+        if self.compress:
+            self.send_header('Vary', 'Accept-Encoding')
+
+
+class _BytesBody:
+    """send_head 的返回值，供 SimpleHTTPRequestHandler 的 copyfile 读取"""
+
+    def __init__(self, body):
+        self._body = body
+
+    def read(self, size=-1):
+        body, self._body = self._body, b''
+        return body
+
+    def close(self):
+        pass
+
+
+class ThreadingServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    verbose = True
+    # 网页同时加载多家公司的数据时会并发建立连接，默认的监听队列长度 5 容易溢出导致连接被重置
+    request_queue_size = 128
+
+
+def make_server(port=PORT, directory=BASE_DIR, cache_control=DEFAULT_CACHE_CONTROL, compress=True,
+                legacy=False, verbose=True, data_file=DEFAULT_DATA_FILE, chart_dir=DEFAULT_CHART_DIR):
+    """创建服务器；legacy 为 True 时使用原来的单线程 TCPServer 和 SimpleHTTPRequestHandler
+
+    多线程服务器在 /api/ 下提供查询接口，数据来自 directory 下的 data_file；
+    /api/charts 批量返回 chart_dir 下预先生成的图表数据。
+    """
+    if legacy:
+        class LegacyHandler(http.server.SimpleHTTPRequestHandler):
+            def end_headers(self):
+                self.send_header('Access-Control-Allow-Origin', '*')
+                super().end_headers()
+
+            def log_message(self, format, *args):
+                if verbose:
+                    super().log_message(format, *args)
+
+        socketserver.TCPServer.allow_reuse_address = True
+        return socketserver.TCPServer(("", port), partial(LegacyHandler, directory=directory))
+
+    file_cache = FileCache()
+    handler = type('Handler', (MyHttpRequestHandler,), {
+        'file_cache': file_cache,
+        'metrics_index': MetricsIndex(os.path.join(directory, data_file)),
+        'chart_payloads': ChartPayloads(os.path.join(directory, chart_dir), file_cache),
+        'cache_control': cache_control,
+        'compress': compress
+    })
+    httpd = ThreadingServer(("", port), partial(handler, directory=directory))
+    httpd.verbose = verbose
+    return httpd
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="财务分析网页的静态文件服务器")
+    parser.add_argument('--port', type=int, default=PORT, help="端口号")
+    parser.add_argument('--cache-control', default=DEFAULT_CACHE_CONTROL,
+                        help="Cache-Control 响应头，例如 'public, max-age=300'")
+    parser.add_argument('--data-file', default=DEFAULT_DATA_FILE, help="查询接口使用的 JSON 数据文件")
+    parser.add_argument('--no-compress', action='store_true', help="不压缩响应")
+    parser.add_argument('--legacy', action='store_true', help="使用原来的单线程服务器")
+    parser.add_argument('--quiet', action='store_true', help="不输出访问日志")
+    args = parser.parse_args(argv)
+
+    with make_server(args.port, cache_control=args.cache_control, compress=not args.no_compress,
+                     legacy=args.legacy, verbose=not args.quiet, data_file=args.data_file) as httpd:
+        print(f"服务器启动在端口 {args.port}")
+        print(f"请访问: http://localhost:{args.port}")
+        httpd.serve_forever()
+
 
-with socketserver.TCPServer(("", PORT), Handler) as httpd:
-    print(f"服务器启动在端口 {PORT}")
-    print(f"请访问: http://localhost:{PORT}")
-    httpd.serve_forever() 
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from fetch import to_symbol
+from transform import METRICS, reshape_universe
+from screen import build_cube
+from industry import compute_rollups
+from benchmarks.synthetic import synthetic_codes, make_statement
+
+RECEIVABLE_COLUMNS = ('NOTE_ACCOUNTS_RECE', 'ACCOUNTS_RECE', 'NOTE_RECE')
+METRIC = '应收账款及应收票据占比'
+
+
+def test_company_without_inputs_excluded_from_rollups():
+    """没有任何应收项目的公司不具有应收占比，不计入行业统计（派生计算的 0 不能当作数据）"""
+    codes = synthetic_codes(5)
+    universe = {code: {statement: make_statement(to_symbol(code), statement, years=3, seed=i)
+                       for statement in METRICS} for i, code in enumerate(codes)}
+    lacking = codes[0]
+    for column in RECEIVABLE_COLUMNS:
+        universe[lacking]['balance_yearly'][column] = np.nan
+    cube = build_cube(reshape_universe(universe))
+    mapping = pd.DataFrame({'行业': '行业00', '市值': 1.0}, index=pd.Index(codes, name='股票代码'))
+
+    rollups, _ = compute_rollups(cube, mapping)
+    stats = rollups["industries"]["行业00"]["metrics"][METRIC]
+    k = cube.metric_index[METRIC]
+    assert np.isnan(cube.values[cube.code_index[lacking], :, k]).all()
+    others = cube.values[[cube.code_index[code] for code in codes[1:]], :, k]
+    assert stats["count"] == (~np.isnan(others)).sum(axis=0).astype(float).tolist()
+    assert stats["median"] == [None if np.isnan(v) else round(v, 4) for v in np.nanmedian(others, axis=0)]
+    assert lacking not in cube.screen([(METRIC, '<', 5)]).index
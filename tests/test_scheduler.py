@@ -0,0 +1,63 @@
+import json
+import os
+import datetime
+
+import pytest
+
+import finance
+from cache import StatementCache
+from fetch import to_symbol
+from scheduler import RefreshScheduler, _timestamp
+from benchmarks.synthetic import make_statement
+
+CODES = ['600000', '000001', '600002']
+
+
+def read_json(*parts):
+    with open(os.path.join(*parts), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_update_after_full_run_keeps_all_companies(tmp_path):
+    """全量运行使增量清单失效后，调度器只有一家公司有新报告期时仍输出全部公司"""
+    last_year = {code: 2022 for code in CODES}
+    now = [_timestamp(datetime.date(2023, 3, 1))]
+
+    def fetcher(symbol, statement):
+        return make_statement(symbol, statement, years=5, last_year=last_year[symbol[2:]])
+
+    output_dir = str(tmp_path / 'out')
+    os.makedirs(output_dir)
+    sched = RefreshScheduler(str(tmp_path / 'scheduler.db'), fetcher=fetcher, output_dir=output_dir,
+                             cache=StatementCache(str(tmp_path / 'cache')), clock=lambda: now[0], rate=None)
+    sched.add(CODES)
+    assert sched.run_once()["updated"] == len(CODES)
+
+    # 全量运行改写输出文件，增量清单随之失效
+    finance.process_financial_data(CODES, fetcher=fetcher, rate=None, output_dir=output_dir)
+
+    last_year['600000'] = 2023
+    now[0] = _timestamp(datetime.date(2024, 4, 1))
+    summary = sched.run_once()
+    sched.close()
+    assert summary["updated"] == 1
+
+    full_dir = str(tmp_path / 'full')
+    os.makedirs(full_dir)
+    finance.process_financial_data(CODES, fetcher=fetcher, rate=None, output_dir=full_dir)
+    merged = read_json(output_dir, 'merged_financial_data.json')
+    assert sorted(merged["companies"]) == sorted(CODES)
+    assert merged == read_json(full_dir, 'merged_financial_data.json')
+
+
+def test_update_outputs_rejects_partial_universe_without_manifest(tmp_path):
+    """清单失效时只提供部分公司的报表，不改写任何输出"""
+    def fetched(codes):
+        return ((code, {statement: make_statement(to_symbol(code), statement, years=3)
+                        for statement in finance.STATEMENT_APIS}, None) for code in codes)
+
+    finance.build_outputs(fetched(CODES), output_dir=str(tmp_path))
+    before = read_json(tmp_path, 'merged_financial_data.json')
+    with pytest.raises(ValueError):
+        finance.update_outputs(fetched(CODES[:1]), CODES, output_dir=str(tmp_path))
+    assert read_json(tmp_path, 'merged_financial_data.json') == before
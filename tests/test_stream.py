@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import finance
+from fetch import to_symbol
+from benchmarks.synthetic import synthetic_codes, make_statement
+
+CODES = synthetic_codes(10)
+
+
+def fetched(codes, broken=None):
+    for i, code in enumerate(codes):
+        statements = {statement: make_statement(to_symbol(code), statement, years=3, seed=i)
+                      for statement in finance.STATEMENT_APIS}
+        if code == broken:
+            statements['profit_yearly']['TOTAL_OPERATE_INCOME'] = '未披露'
+        yield code, statements, None
+
+
+def snapshot(output_dir):
+    """输出目录下全部文件的内容"""
+    files = {}
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, output_dir)] = f.read()
+    return files
+
+
+def test_stream_error_keeps_previous_outputs(tmp_path):
+    """流式输出中途出错时，合并文件、列式存储、分片和索引保持上一次的内容，不留下临时文件"""
+    output_dir = str(tmp_path)
+    finance.build_outputs(fetched(CODES), chunk_size=3, output_dir=output_dir, stream=True, shards=True)
+    before = snapshot(output_dir)
+
+    with pytest.raises(ValueError):
+        finance.build_outputs(fetched(CODES, broken=CODES[7]), chunk_size=3, output_dir=output_dir,
+                              stream=True, shards=True)
+    assert snapshot(output_dir) == before
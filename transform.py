@@ -0,0 +1,285 @@
+import numpy as np
+import pandas as pd
+
+from derive import TTM_METRICS, Panel, compute_derived
+from instrument import StageTimer
+from validate import validate
+
+# 定义要提取的指标及其中文名称
+METRICS = {
+    'profit_yearly': {
+        'TOTAL_OPERATE_INCOME': '营业收入',
+        'TOTAL_OPERATE_COST': '营业成本',
+        'OPERATE_COST': '主营业务成本',
+        'RESEARCH_EXPENSE': '研发费用',
+        'OPERATE_TAX_ADD': '附加税',
+        'SALE_EXPENSE': '销售费用',
+        'MANAGE_EXPENSE': '管理费用',
+        'FINANCE_EXPENSE': '财务费用',
+        'FAIRVALUE_CHANGE_INCOME': '公允价值变动损益',
+        'INVEST_INCOME': '投资收益',
+        'ASSET_IMPAIRMENT_INCOME': '资产减值损益',
+        'CREDIT_IMPAIRMENT_INCOME': '信用减值损益',
+        'OTHER_INCOME': '其他收入',
+        'OPERATE_PROFIT': '营业利润',
+        'NONBUSINESS_INCOME': '营业外收入',
+        'NONBUSINESS_EXPENSE': '营业外支出',
+        'TOTAL_PROFIT': '税前利润',
+        'INCOME_TAX': '所得税',
+        'NETPROFIT': '净利润',
+        'CONTINUED_NETPROFIT': '经常性净利润',
+        'PARENT_NETPROFIT': '归属母公司净利润',
+        'MINORITY_INTEREST': '少数股东损益'
+    },
+    'balance_yearly': {
+        'NOTE_ACCOUNTS_RECE': '应收票据及应收账款',
+        'ACCOUNTS_RECE': '应收账款',
+        'NOTE_RECE': '应收票据',
+        'PREPAYMENT': '预付账款',
+        'INVENTORY': '存货',
+        'TOTAL_OTHER_RECE': '其他应收款',
+        'TOTAL_CURRENT_ASSETS': '流动资产',
+        'FIXED_ASSET': '固定资产',
+        'INTANGIBLE_ASSET': '无形资产',
+        'LONG_PREPAID_EXPENSE': '长期待摊费用',
+        'TOTAL_ASSETS': '总资产',                    
+        'SHORT_LOAN': '短期借款',
+        'NOTE_ACCOUNTS_PAYABLE': '应付票据及应付账款',
+        'ACCOUNTS_PAYABLE': '应付账款',
+        'NOTE_PAYABLE': '应付票据',
+        'STAFF_SALARY_PAYABLE': '应付职工薪酬',
+        'TAX_PAYABLE': '应付税费',
+        'CONTRACT_LIAB': '合同负债',
+        'ADVANCE_RECEIVABLES': '预收账款',
+        'TOTAL_OTHER_PAYABLE': '其他应付款',
+        'TOTAL_CURRENT_LIAB': '流动负债',
+        'LEASE_LIAB': '租赁负债',
+        'LONG_LOAN': '长期借款',
+        'LONG_PAYABLE': '长期应付款',
+        'TOTAL_LIABILITIES': '总负债',
+        'SHARE_CAPITAL': '实收资本',
+        'MINORITY_EQUITY': '少数股东权益',
+        'TOTAL_EQUITY': '所有者权益'
+    },
+    'cashflow_yearly': {
+        'SALES_SERVICES': '销售收款',
+        'RECEIVE_OTHER_OPERATE': '其他经营性流入',
+        'TOTAL_OPERATE_INFLOW': '经营活动现金流入总额',
+        'BUY_SERVICES': '采购支出',
+        'PAY_STAFF_CASH': '人工支出',
+        'PAY_ALL_TAX': '税费支出',
+        'PAY_OTHER_OPERATE': '其他经营性流出',
+        'TOTAL_OPERATE_OUTFLOW': '经营活动现金流出总额',
+        'NETCASH_OPERATE': '经营活动现金流量净额',
+        'CONSTRUCT_LONG_ASSET': '固定资产支出',
+        'INVEST_PAY_CASH': '投资支出',
+        'TOTAL_INVEST_OUTFLOW': '投资活动现金流出总额',
+        'ACCEPT_INVEST_CASH': '吸收投资流入',
+        'NETCASH_INVEST': '投资活动现金流量净额',
+        'RECEIVE_LOAN_CASH': '借款流入',
+        'TOTAL_FINANCE_INFLOW': '筹资活动现金流入总额',
+        'PAY_DEBT_CASH': '还款流出',
+        'ASSIGN_DIVIDEND_PORFIT': '分红支出',
+        'TOTAL_FINANCE_OUTFLOW': '筹资活动现金流出总额',
+        'NETCASH_FINANCE': '筹资活动现金流量净额',
+        'CCE_ADD': '现金增加',
+        'END_CCE': '期末现金',
+        'INVENTORY_REDUCE': '存货余额减少',
+        'OPERATE_RECE_REDUCE': '应收余额减少',
+        'OPERATE_PAYABLE_ADD': '应付余额增加'
+    }
+}
+
+# 按报告期（季度）的报表与年报字段相同
+QUARTERLY_STATEMENTS = {
+    'profit_report': 'profit_yearly',
+    'balance_report': 'balance_yearly',
+    'cashflow_report': 'cashflow_yearly'
+}
+
+def _statement_values(statement, df):
+    """取出报表的指标矩阵（行为报告期，列为指标）及对应的中文指标名"""
+    statement = QUARTERLY_STATEMENTS.get(statement, statement)
+    mapping = METRICS[statement]
+    if statement == 'balance_yearly':
+        # 合同负债与预收账款合并为"合同负债"，合并后为 0 的不保留
+        combined = df['CONTRACT_LIAB'].fillna(0) + df['ADVANCE_RECEIVABLES'].fillna(0)
+        columns = [en for en in mapping if en not in ('CONTRACT_LIAB', 'ADVANCE_RECEIVABLES')]
+        values = np.column_stack([combined.where(combined != 0).to_numpy(dtype=float),
+                                  df[columns].to_numpy(dtype=float)])
+        return values, ['合同负债'] + [mapping[en] for en in columns]
+    columns = list(mapping)
+    return df[columns].to_numpy(dtype=float), [mapping[en] for en in columns]
+
+def missing_columns(frames):
+    """返回报表中缺少的指标列"""
+    return [en for statement, df in frames.items()
+            for en in ['SECURITY_NAME_ABBR', 'REPORT_DATE'] + list(METRICS[QUARTERLY_STATEMENTS.get(statement, statement)])
+            if en not in df.columns]
+
+def reshape_universe(universe):
+    """将多家公司的三张宽表报表一次性转换为长表，只保留非空值（向量化实现）
+
+    universe 为 {股票代码: {报表类型: DataFrame}}，报表类型为年报或按报告期（季度）的报表。
+    """
+    codes = np.asarray(list(universe), dtype=object)
+    parts = {'股票代码': [], '公司名称': [], '报表': [], '项目': [], '报告期': [], '金额': []}
+    first = next(iter(universe.values()))
+    for statement in [s for s in (*METRICS, *QUARTERLY_STATEMENTS) if s in first]:
+        frames = [company[statement] for company in universe.values()]
+        wide = pd.concat(frames, ignore_index=True)
+        row_codes = np.repeat(codes, [len(df) for df in frames])
+        values, names = _statement_values(statement, wide)
+
+        # 按行优先顺序取出非空单元格，等价于 stack 后去掉空值
+        rows, cols = np.nonzero(~np.isnan(values))
+        parts['股票代码'].append(row_codes[rows])
+        parts['公司名称'].append(wide['SECURITY_NAME_ABBR'].to_numpy()[rows])
+        parts['报表'].append(np.full(len(rows), statement, dtype=object))
+        parts['项目'].append(np.asarray(names, dtype=object)[cols])
+        parts['报告期'].append(wide['REPORT_DATE'].to_numpy()[rows])
+        parts['金额'].append(values[rows, cols])
+
+    return pd.DataFrame({key: np.concatenate(arrays) for key, arrays in parts.items()})
+
+# 报表类型与 JSON 中报表键名的对应关系
+REPORT_TYPE_MAP = {
+    'profit_yearly': 'profit_sheet',
+    'balance_yearly': 'balance_sheet',
+    'cashflow_yearly': 'cash_flow',
+    'profit_report': 'profit_sheet',
+    'balance_report': 'balance_sheet',
+    'cashflow_report': 'cash_flow'
+}
+
+def build_panel(df, aligned=False):
+    """由长表构建 公司 × 报告期 的对齐面板，同时返回每家公司基础指标的出现顺序
+
+    一次性将全部数据散布到 (项目, 公司, 期) 的数组中，每家公司的报告期按时间顺序左对齐，
+    耗时与数据量成线性关系。aligned 为 True 时（季报）所有公司使用同一条连续的季度轴，
+    缺少的季度为 NaN，向前移动 4 列即为上年同期。
+    """
+    # 公司、报表、项目按首次出现的顺序编码，报告期按时间顺序编码
+    row_companies, companies = pd.factorize(df['股票代码'])
+    row_sheets, sheets = pd.factorize(df['报表'])
+    row_metrics, metric_names = pd.factorize(df['项目'])
+    date_codes, dates = pd.factorize(df['报告期'], sort=True)
+    years_all = np.array([str(date).split()[0] for date in dates], dtype=object)
+
+    # 每家公司具有的报告期，以及每个报告期在该公司序列中的位置
+    if aligned:
+        period_ends = pd.to_datetime(dates)
+        quarters = pd.date_range(period_ends.min(), period_ends.max(), freq='QE')
+        date_codes = quarters.searchsorted(period_ends)[date_codes]
+        years_all = np.array([str(date).split()[0] for date in quarters], dtype=object)
+        has_date = np.ones((len(companies), len(quarters)), dtype=bool)
+    else:
+        has_date = np.zeros((len(companies), len(dates)), dtype=bool)
+        has_date[row_companies, date_codes] = True
+    positions = np.cumsum(has_date, axis=1) - 1
+
+    names = df.drop_duplicates('股票代码').set_index('股票代码')['公司名称'].reindex(companies)
+    panel = Panel(companies, names, [years_all[row].tolist() for row in has_date])
+
+    # 重复的 (指标, 报告期) 取第一条记录：倒序赋值使先出现的值最后写入
+    cube = np.full((len(metric_names), len(companies), panel.width), np.nan)
+    rows = np.arange(len(df))[::-1]
+    cube[row_metrics[rows], row_companies[rows], positions[row_companies[rows], date_codes[rows]]] = \
+        df['金额'].to_numpy(dtype=float)[rows]
+
+    metric_sheets = np.empty(len(metric_names), dtype=int)
+    metric_sheets[row_metrics] = row_sheets
+    for index, name in enumerate(metric_names):
+        sheet = REPORT_TYPE_MAP[sheets[metric_sheets[index]]]
+        panel.add(sheet, name, cube[index], ~np.isnan(cube[index]).all(axis=1))
+
+    # 每家公司基础指标按首次出现的顺序输出：对 (公司, 项目) 组合键按出现顺序去重
+    _, first_rows = np.unique(row_companies.astype(np.int64) * len(metric_names) + row_metrics,
+                              return_index=True)
+    first_rows.sort()
+    key_companies = row_companies[first_rows]
+    order = np.argsort(key_companies, kind='stable')
+    bounds = np.cumsum(np.bincount(key_companies, minlength=len(companies)))[:-1]
+    metric_list = np.asarray(metric_names, dtype=object)[row_metrics[first_rows]]
+    key_order = [metric_list[key_rows].tolist() for key_rows in np.split(order, bounds)]
+    return panel, key_order
+
+def build_json_data(df, timer=None):
+    """由长表构建网页图表使用的 JSON 数据（含派生指标和数据质量问题），timer 为 StageTimer 时记录各步骤耗时"""
+    timer = timer if timer is not None else StageTimer()
+    with timer('build_panel'):
+        panel, key_order = build_panel(df)
+    with timer('validate'):
+        flags = validate(panel)
+    with timer('derive'):
+        derived = compute_derived(panel)
+    with timer('build_json'):
+        return _company_json(panel, key_order, derived, flags)
+
+def _company_json(panel, key_order, derived, flags):
+    """按公司组装 JSON 结构，每家公司先输出基础指标（按原始顺序），再输出有值的派生指标
+
+    quality_flags 为 validate.validate 发现的数据问题，没有问题时为空列表。
+    """
+    json_data = {
+        "companies": {}
+    }
+    for index, company_code in enumerate(panel.codes):
+        years = panel.years[index]
+        company = {
+            "company_name": panel.names[index],
+            "stock_code": company_code,
+            "quality_flags": flags[index],
+            "profit_sheet": {
+                "years": years,
+                "metrics": {}
+            },
+            "balance_sheet": {
+                "years": list(years),
+                "metrics": {}
+            },
+            "cash_flow": {
+                "years": list(years),
+                "metrics": {}
+            }
+        }
+        names = key_order[index] + [name for name in derived if panel.present[name][index]]
+        rows = np.stack([panel.series[name][index] for name in names])[:, :len(years)].tolist()
+        for name, values in zip(names, rows):
+            # NaN 统一输出为 null
+            company[panel.sheets[name]]["metrics"][name] = [None if v != v else v for v in values]
+        json_data["companies"][company_code] = company
+
+    return json_data
+
+def build_quarterly_json(df):
+    """由季报长表构建滚动十二个月（TTM）指标的 JSON 数据
+
+    每家公司只输出从第一期到最后一期有数据的季度，结构与年报 JSON 相同。
+    """
+    panel, _ = build_panel(df, aligned=True)
+    base = list(panel.series)
+    reported = np.logical_or.reduce([~np.isnan(panel.series[name]) for name in base])
+    derived = compute_derived(panel, TTM_METRICS)
+
+    json_data = {
+        "companies": {}
+    }
+    for index, company_code in enumerate(panel.codes):
+        columns = np.flatnonzero(reported[index])
+        start, end = columns[0], columns[-1] + 1
+        years = panel.years[index][start:end]
+        company = {
+            "company_name": panel.names[index],
+            "stock_code": company_code,
+            "profit_sheet": {"years": years, "metrics": {}},
+            "balance_sheet": {"years": list(years), "metrics": {}},
+            "cash_flow": {"years": list(years), "metrics": {}}
+        }
+        for name in derived:
+            if panel.present[name][index]:
+                values = panel.series[name][index, start:end].tolist()
+                company[panel.sheets[name]]["metrics"][name] = [None if v != v else v for v in values]
+        json_data["companies"][company_code] = company
+
+    return json_data
@@ -0,0 +1,151 @@
+import os
+import json
+
+import numpy as np
+
+# 会计恒等式的相对容差：两边之差超过总额的 1% 视为不平
+IDENTITY_TOLERANCE = 0.01
+# 同比跳变阈值：相邻两个报告期的比值超过 10 倍或低于 1/10
+JUMP_FACTOR = 10.0
+
+
+def _series(panel, name):
+    return panel.series[name] if name in panel.series else panel.empty()[0]
+
+
+def identity(total, *parts, tolerance=IDENTITY_TOLERANCE):
+    """total 与 parts 之和的差超过 total 的 tolerance 倍，任一项为空时不检查"""
+    def check(panel):
+        values = _series(panel, total)
+        combined = sum(_series(panel, part) for part in parts)
+        return {total: np.abs(values - combined) > tolerance * np.abs(values)}
+    return check
+
+
+def not_exceeding(part, total, tolerance=IDENTITY_TOLERANCE):
+    """分项 part 超过合计 total"""
+    def check(panel):
+        values = _series(panel, total)
+        return {part: _series(panel, part) > values + tolerance * np.abs(values)}
+    return check
+
+
+def counterpart(base, *required):
+    """base 有值而 required 为空的报告期，按缺少的指标分别标记"""
+    def check(panel):
+        reported = ~np.isnan(_series(panel, base))
+        return {name: reported & np.isnan(_series(panel, name)) for name in required}
+    return check
+
+
+def non_negative(*names):
+    return lambda panel: {name: _series(panel, name) < 0 for name in names}
+
+
+def jump(*names, factor=JUMP_FACTOR):
+    """与上一个报告期相比增长或下降超过 factor 倍（只比较两期均为正数的情况），标记在后一期"""
+    def check(panel):
+        flags = {}
+        for name in names:
+            values = _series(panel, name)
+            current, previous = values[:, 1:], values[:, :-1]
+            both = (current > 0) & (previous > 0)
+            flagged = np.zeros(values.shape, dtype=bool)
+            flagged[:, 1:] = both & ((current > previous * factor) | (current * factor < previous))
+            flags[name] = flagged
+        return flags
+    return check
+
+
+def year_numbers(panel):
+    """各位置报告期的年份矩阵 (公司数, 最大期数)，超出该公司期数的位置为 0"""
+    years = np.zeros((len(panel.codes), panel.width), dtype=int)
+    valid = np.arange(panel.width) < panel.lengths[:, None]
+    years[valid] = [int(year[:4]) for company in panel.years for year in company]
+    return years
+
+
+def missing_year(panel):
+    """相邻两个报告期之间缺少年报，标记在缺口之后的报告期"""
+    years = year_numbers(panel)
+    flagged = np.zeros(years.shape, dtype=bool)
+    flagged[:, 1:] = years[:, 1:] - years[:, :-1] > 1
+    return {None: flagged}
+
+
+# 校验规则注册表：(规则名, 说明, 检查函数)。检查函数对整个面板一次性计算，
+# 返回 {指标名: (公司数, 最大期数) 的布尔矩阵}，True 为有问题的报告期；不针对单个指标的规则指标名为 None
+QUALITY_RULES = []
+
+
+def register(rule, description, check):
+    QUALITY_RULES.append((rule, description, check))
+
+
+register('balance_identity', "总资产与总负债加所有者权益不相等", identity('总资产', '总负债', '所有者权益'))
+register('subtotal_exceeds_total', "流动资产超过总资产", not_exceeding('流动资产', '总资产'))
+register('subtotal_exceeds_total', "流动负债超过总负债", not_exceeding('流动负债', '总负债'))
+register('missing_counterpart', "有营业收入但缺少营业成本", counterpart('营业收入', '营业成本'))
+register('missing_counterpart', "有总资产但缺少总负债或所有者权益", counterpart('总资产', '总负债', '所有者权益'))
+register('negative_value', "按会计惯例不应为负的金额为负",
+         non_negative('营业收入', '营业成本', '总资产', '总负债', '流动资产', '流动负债', '存货', '固定资产',
+                      '期末现金', '销售收款'))
+register('yoy_jump', f"与上年相比增长或下降超过 {JUMP_FACTOR:g} 倍", jump('营业收入', '总资产', '营业成本'))
+register('missing_year', "相邻报告期之间缺少年报，该期的增长率与上一个报告期比较", missing_year)
+
+
+def rule_descriptions():
+    """{规则名: 说明}，同名规则的说明合并"""
+    descriptions = {}
+    for rule, description, _ in QUALITY_RULES:
+        descriptions.setdefault(rule, []).append(description)
+    return {rule: "；".join(texts) for rule, texts in descriptions.items()}
+
+
+def validate(panel):
+    """对面板中的全部公司一次性执行全部校验规则，返回每家公司的问题列表
+
+    每个问题为 {"rule": 规则名, "metric": 指标名或 None, "years": [有问题的报告期]}，
+    按规则注册顺序排列。
+    """
+    flags = [[] for _ in panel.codes]
+    valid = np.arange(panel.width) < panel.lengths[:, None]
+    for rule, _, check in QUALITY_RULES:
+        for metric, flagged in check(panel).items():
+            rows, cols = np.nonzero(flagged & valid)
+            # nonzero 按行优先返回，同一公司的问题连续排列
+            bounds = np.flatnonzero(np.diff(rows)) + 1
+            for start, end in zip(np.r_[0, bounds], np.r_[bounds, len(rows)]):
+                if start == end:
+                    continue
+                company = rows[start]
+                years = panel.years[company]
+                flags[company].append({"rule": rule, "metric": metric,
+                                       "years": [years[col] for col in cols[start:end]]})
+    return flags
+
+
+def write_quality_report(path, companies):
+    """写出数据质量报告：规则说明、按规则统计的公司数和每家公司的问题列表
+
+    companies 为按输出顺序排列的 {股票代码: {"name": 公司名称, "flags": 问题列表}}。
+    """
+    by_rule = {}
+    for company in companies.values():
+        for rule in {flag["rule"] for flag in company["flags"]}:
+            by_rule[rule] = by_rule.get(rule, 0) + 1
+    descriptions = rule_descriptions()
+    report = {
+        "rules": descriptions,
+        "summary": {
+            "companies": len(companies),
+            "flagged": sum(1 for company in companies.values() if company["flags"]),
+            "by_rule": {rule: by_rule[rule] for rule in descriptions if rule in by_rule}
+        },
+        "companies": companies
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+    return report["summary"]